@@ -0,0 +1,251 @@
+"""Offline benchmarks of the client's hot paths.
+
+Everything runs against generated payloads and a local mock server, so no token
+or network access is needed. Results are written as JSON to track regressions
+across versions:
+
+    python -m benchmarks.run --output benchmarks/benchmark.json
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from importlib.metadata import PackageNotFoundError, version
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, Type, cast
+
+from poe_client.client import PoEClient
+from poe_client.events import bus
+from poe_client.mockserver import DEFAULT_POLICIES, MockData, MockServer, Policy, Rule
+from poe_client.rate_limiter import RateLimiter
+from poe_client.schemas import Model, Raw
+from poe_client.schemas.character import Character
+from poe_client.schemas.league import Ladder
+from poe_client.schemas.stash import PublicStash
+
+_MB = 1024 * 1024
+
+# Limits far above anything the benchmarks reach, so they measure the client and
+# not the rate limits.
+_UNLIMITED = {
+    group: Policy(policy.name, (Rule.parse("Account", "1000000:1:1"),))
+    for group, policy in DEFAULT_POLICIES.items()
+}
+
+
+def _version() -> str:
+    try:
+        return version("poe-client")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+def _timings(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "mean": statistics.mean(ordered),
+        "p50": ordered[len(ordered) // 2],
+        "p99": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))],
+    }
+
+
+def _per_mb(build: Callable[[], object], size: int, repeat: int) -> Dict[str, float]:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        build()
+    elapsed = time.perf_counter() - started
+    return {
+        "seconds_per_mb": elapsed / repeat / (size / _MB),
+        "mb_per_second": size * repeat / _MB / elapsed,
+    }
+
+
+def bench_decode_and_build(data: MockData, repeat: int) -> Raw:
+    """JSON decode and model construction throughput, per payload type."""
+    # A full character, with items, rather than the summary in the list.
+    character = cast(Raw, data.character(str(data.characters[0]["name"])))
+    payloads: Dict[str, Tuple[Raw, Type[Model]]] = {
+        "public_stash": (data.public_stash_page("0"), PublicStash),
+        "ladder": (
+            {"total": len(data.ladder), "entries": data.ladder[:500]},
+            Ladder,
+        ),
+        "character": (character, Character),
+    }
+    results: Raw = {}
+    for name, (payload, model) in payloads.items():
+        body = json.dumps(payload)
+        decoded = json.loads(body)
+        results[name] = {
+            "bytes": len(body),
+            "json_decode": _per_mb(lambda: json.loads(body), len(body), repeat),
+            "model_build": _per_mb(lambda: model.parse_obj(decoded), len(body), repeat),
+        }
+    return results
+
+
+async def bench_limiter(calls: int) -> Dict[str, float]:
+    """Overhead of parse_headers plus get_semaphore, per request."""
+    limiter = RateLimiter()
+    headers = {
+        "X-Rate-Limit-Policy": "bench-request-limit",
+        "X-Rate-Limit-Rules": "Account,Ip",
+        "X-Rate-Limit-Account": "1000000:1:1,2000000:60:60",
+        "X-Rate-Limit-Account-State": "0:1:0,0:60:0",
+        "X-Rate-Limit-Ip": "1000000:1:1",
+        "X-Rate-Limit-Ip-State": "0:1:0",
+    }
+    await limiter.parse_headers(headers)
+
+    started = time.perf_counter()
+    for _ in range(calls):
+        await limiter.get_semaphore("bench-request-limit")
+        await limiter.parse_headers(headers)
+    elapsed = time.perf_counter() - started
+    return {"seconds_per_request": elapsed / calls}
+
+
+async def bench_events(calls: int) -> Dict[str, float]:
+    """Limiter overhead per request with no event subscriber, and with one.
+
+    Without a subscriber, events should cost nothing measurable; the difference
+    with a no-op subscriber is what building and dispatching them costs.
+    """
+    disabled = await bench_limiter(calls)
+
+    def ignore(name: str, fields: Raw) -> None:  # noqa: WPS430
+        """Drop events."""
+
+    bus.subscribe(ignore)
+    try:
+        enabled = await bench_limiter(calls)
+    finally:
+        bus.unsubscribe(ignore)
+
+    guard_started = time.perf_counter()
+    for _ in range(calls):
+        if bus.active:
+            bus.emit("never")
+    guard = (time.perf_counter() - guard_started) / calls
+    return {
+        "disabled_seconds_per_request": disabled["seconds_per_request"],
+        "subscribed_seconds_per_request": enabled["seconds_per_request"],
+        "inactive_guard_seconds": guard,
+    }
+
+
+async def _sample(calls: int, request: Callable[[], Awaitable[object]]) -> List[float]:
+    samples = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        await request()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+async def bench_requests(client: PoEClient, calls: int) -> Raw:
+    """Time per _get_json call against the local server, for a tiny response."""
+    await client.get_profile()
+    samples = await _sample(calls, lambda: client._get_json("profile"))  # noqa: WPS437
+    return {"calls": calls, "seconds": _timings(samples)}
+
+
+async def bench_river(client: PoEClient, pages: int) -> Raw:
+    """River pages per second end to end, and peak memory of a single page."""
+    await client.get_public_stash_tabs("0")
+
+    tracemalloc.start()
+    PublicStash.parse_obj(await client.get_public_stash_tabs("1"))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    change_id: Optional[str] = "2"
+    started = time.perf_counter()
+    for _ in range(pages):
+        page = PublicStash.parse_obj(await client.get_public_stash_tabs(change_id))
+        change_id = page.next_change_id
+    elapsed = time.perf_counter() - started
+    return {
+        "pages": pages,
+        "pages_per_second": pages / elapsed,
+        "peak_memory_bytes_per_page": peak,
+    }
+
+
+async def bench_concurrency(
+    client: PoEClient,
+    calls: int,
+    levels: List[int],
+) -> Raw:
+    """Requests per second with different numbers of requests in flight."""
+    await client.get_league_ladder("Standard", limit=200)
+    results: Raw = {}
+    for level in levels:
+        semaphore = asyncio.Semaphore(level)
+
+        async def request(offset: int) -> None:  # noqa: WPS430
+            async with semaphore:
+                await client.get_league_ladder("Standard", offset=offset, limit=200)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(request(call * 200 % 10000) for call in range(calls)))
+        elapsed = time.perf_counter() - started
+        results[str(level)] = {"requests_per_second": calls / elapsed}
+    return results
+
+
+async def run(args: argparse.Namespace) -> Raw:
+    """Run every benchmark."""
+    data = MockData(seed=0, ladder_size=10000)
+    results: Raw = {
+        "decode_and_build": bench_decode_and_build(data, args.repeat),
+        "limiter": await bench_limiter(args.calls * 10),
+        "events": await bench_events(args.calls * 10),
+    }
+    async with MockServer(data=data, policies=_UNLIMITED) as server:
+        client = PoEClient(
+            "poe-client benchmarks",
+            "token",
+            base_url=str(server.url),
+        )
+        async with client:
+            results["requests"] = await bench_requests(client, args.calls)
+            results["river"] = await bench_river(client, args.pages)
+            results["concurrency"] = await bench_concurrency(
+                client,
+                args.calls,
+                [1, 5, 20],
+            )
+    return {
+        "version": _version(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "results": results,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Parse arguments, run the benchmarks and write the results."""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run")
+    parser.add_argument("--output", help="file to write to, defaults to stdout")
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    report = json.dumps(asyncio.run(run(args)), indent=2)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(report)
+    else:
+        sys.stdout.write("{0}\n".format(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Everything the API knows about the account of a token, fetched in one call."""
+
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, TypeVar
+
+from poe_client.client import PoEClient
+from poe_client.schemas.account import Account
+from poe_client.schemas.character import Character
+from poe_client.schemas.league import LeagueAccount
+from poe_client.schemas.stash import StashTab
+
+Result = TypeVar("Result")
+
+
+class AccountSnapshot(object):
+    """The aggregated result of snapshot_account.
+
+    If the snapshot timed out or some requests failed, only part of the fields are
+    filled in. Characters are the summaries from get_characters, replaced by the
+    full character for every get_character request which finished.
+    """
+
+    profile: Optional[Account]
+    characters: Dict[str, Character]
+    stashes: Dict[str, List[StashTab]]
+    league_accounts: Dict[str, LeagueAccount]
+    errors: Dict[str, BaseException]
+    timed_out: List[str]
+
+    def __init__(self) -> None:
+        """Initialize an empty snapshot."""
+        self.profile = None
+        self.characters = {}
+        self.stashes = {}
+        self.league_accounts = {}
+        self.errors = {}
+        self.timed_out = []
+
+    @property
+    def complete(self) -> bool:
+        """Whether every request finished successfully."""
+        return not self.errors and not self.timed_out
+
+
+class _Orchestrator(object):
+    """Runs the requests of a snapshot, starting dependent ones as results arrive."""
+
+    _client: PoEClient
+    _snapshot: AccountSnapshot
+    # Running requests, with the label their errors are reported under.
+    _tasks: Dict["asyncio.Future[None]", str]
+
+    def __init__(self, client: PoEClient) -> None:
+        self._client = client
+        self._snapshot = AccountSnapshot()
+        self._tasks = {}
+
+    async def run(self, timeout: Optional[float]) -> AccountSnapshot:
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+
+        self._spawn("profile", self._client.get_profile(), self._on_profile)
+        self._spawn("characters", self._client.get_characters(), self._on_characters)
+        try:
+            while self._tasks:
+                remaining = None if deadline is None else deadline - loop.time()
+                if remaining is not None and remaining <= 0:
+                    break
+                done, _ = await asyncio.wait(
+                    list(self._tasks),
+                    timeout=remaining,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                for task in done:
+                    label = self._tasks.pop(task)
+                    error = task.exception()
+                    if error is not None:
+                        self._snapshot.errors[label] = error
+        finally:
+            # Whatever is still running timed out, or run itself was cancelled.
+            # Either way, nothing is left running once run returns.
+            pending = list(self._tasks)
+            for task in pending:
+                task.cancel()
+                self._snapshot.timed_out.append(self._tasks[task])
+            await asyncio.gather(*pending, return_exceptions=True)
+        return self._snapshot
+
+    def _spawn(
+        self,
+        label: str,
+        request: Awaitable[Result],
+        on_result: Callable[[Result], None],
+    ) -> None:
+        self._tasks[asyncio.ensure_future(_deliver(request, on_result))] = label
+
+    def _on_profile(self, profile: Account) -> None:
+        self._snapshot.profile = profile
+
+    def _on_characters(self, characters: List[Character]) -> None:
+        for character in characters:
+            self._snapshot.characters[character.name] = character
+            self._spawn(
+                "character/{0}".format(character.name),
+                self._client.get_character(character.name),
+                self._on_character,
+            )
+
+        leagues = sorted(
+            {character.league for character in characters if character.league},
+        )
+        for league in leagues:
+            self._spawn(
+                "stash/{0}".format(league),
+                self._client.get_stashes(league),
+                self._on_stashes(league),
+            )
+            self._spawn(
+                "league-account/{0}".format(league),
+                self._client.get_leage_account(league),
+                self._on_league_account(league),
+            )
+
+    def _on_character(self, character: Character) -> None:
+        self._snapshot.characters[character.name] = character
+
+    def _on_stashes(self, league: str) -> Callable[[List[StashTab]], None]:
+        def on_result(stashes: List[StashTab]) -> None:  # noqa: WPS430
+            self._snapshot.stashes[league] = stashes
+
+        return on_result
+
+    def _on_league_account(self, league: str) -> Callable[[LeagueAccount], None]:
+        def on_result(league_account: LeagueAccount) -> None:  # noqa: WPS430
+            self._snapshot.league_accounts[league] = league_account
+
+        return on_result
+
+
+async def _deliver(
+    request: Awaitable[Result],
+    on_result: Callable[[Result], None],
+) -> None:
+    on_result(await request)
+
+
+async def snapshot_account(
+    client: PoEClient,
+    timeout: Optional[float] = None,
+) -> AccountSnapshot:
+    """Fetch the profile, characters, stashes and league accounts of a token.
+
+    The profile and character list are requested first. Every character, and the
+    stash tabs and league account of every league with a character, are requested
+    as soon as the character list arrives. Independent requests run concurrently,
+    each under the rate limit policy of its endpoint.
+
+    Args:
+        client: The client of the token. It must already be entered.
+        timeout: If set, requests still running after this many seconds are
+            cancelled and the partial snapshot is returned.
+
+    Returns:
+        The snapshot. Failed requests are in its errors, and cancelled ones in its
+        timed_out list.
+    """
+    return await _Orchestrator(client).run(timeout)
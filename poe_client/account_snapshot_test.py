@@ -0,0 +1,129 @@
+import asyncio
+from typing import List
+from unittest import IsolatedAsyncioTestCase, mock
+
+import pytest
+
+from poe_client import client
+from poe_client.account_snapshot import snapshot_account
+from poe_client.schemas.account import Account
+from poe_client.schemas.character import Character
+from poe_client.schemas.league import LeagueAccount
+
+
+def make_character(name: str, league: str, level: int = 1) -> Character:
+    """Build a character."""
+    return Character(
+        id=name,
+        name=name,
+        class_="Witch",
+        league=league,
+        level=level,
+        experience=None,
+        equipment=None,
+        inventory=None,
+        jewels=None,
+        time=None,
+        score=None,
+        depth=None,
+        account=None,
+        passives=None,
+    )
+
+
+class SnapshotAccountTest(IsolatedAsyncioTestCase):
+    """Tests the account snapshot."""
+
+    def setUp(self) -> None:
+        """Sets up the test."""
+        self.client = client.PoEClient("test user agent", "token")
+        self.client.get_profile = mock.AsyncMock(  # type: ignore
+            return_value=Account(
+                uuid=None,
+                name="moowiz",
+                realm=None,
+                guild=None,
+                challenges=None,
+                twitch=None,
+            ),
+        )
+        self.client.get_characters = mock.AsyncMock(  # type: ignore
+            return_value=[
+                make_character("a", "Standard"),
+                make_character("b", "Standard"),
+                make_character("c", "Hardcore"),
+            ],
+        )
+        self.client.get_character = mock.AsyncMock(  # type: ignore
+            side_effect=lambda name: make_character(name, "Standard", 90),
+        )
+        self.client.get_stashes = mock.AsyncMock(return_value=[])  # type: ignore
+        self.client.get_leage_account = mock.AsyncMock(  # type: ignore
+            return_value=LeagueAccount(atlas_passives=None),
+        )
+        return super().setUp()
+
+    async def test_complete(self):
+        """Tests that every request is made and aggregated."""
+        snapshot = await snapshot_account(self.client)
+
+        assert snapshot.complete
+        assert snapshot.profile is not None
+        assert snapshot.profile.name == "moowiz"
+        assert [character.level for character in snapshot.characters.values()] == [
+            90,
+            90,
+            90,
+        ]
+        assert sorted(snapshot.stashes) == ["Hardcore", "Standard"]
+        assert sorted(snapshot.league_accounts) == ["Hardcore", "Standard"]
+        assert self.client.get_stashes.call_count == 2  # type: ignore
+
+    async def test_errors(self):
+        """Tests that failed requests don't fail the snapshot."""
+        self.client.get_profile.side_effect = ValueError("Invalid request")  # type: ignore
+
+        snapshot = await snapshot_account(self.client)
+
+        assert not snapshot.complete
+        assert list(snapshot.errors) == ["profile"]
+        assert len(snapshot.stashes) == 2
+
+    async def test_timeout(self):
+        """Tests that requests still running at the deadline are cancelled."""
+
+        async def slow_character(name):  # noqa: WPS430
+            await asyncio.sleep(10)
+
+        self.client.get_character.side_effect = slow_character  # type: ignore
+
+        snapshot = await snapshot_account(self.client, timeout=0.05)
+
+        assert sorted(snapshot.timed_out) == [
+            "character/a",
+            "character/b",
+            "character/c",
+        ]
+        assert snapshot.characters["a"].level == 1
+        assert len(snapshot.league_accounts) == 2
+
+    async def test_cancel(self):
+        """Tests that cancelling the snapshot cancels every request it started."""
+        cancelled: List[str] = []
+
+        async def slow_character(name):  # noqa: WPS430
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(name)
+                raise
+
+        self.client.get_character.side_effect = slow_character  # type: ignore
+
+        snapshot = asyncio.ensure_future(snapshot_account(self.client))
+        await asyncio.sleep(0.05)
+        snapshot.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await snapshot
+
+        assert sorted(cancelled) == ["a", "b", "c"]
@@ -0,0 +1,128 @@
+"""Cache of built models, keyed by the content of the response they came from."""
+
+import hashlib
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Tuple, Type, cast
+
+from pydantic import BaseModel
+
+CacheKey = Tuple[Hashable, int, bytes]
+
+# Frozen subclasses of the model types, built on first use.
+_frozen_types: Dict[Type[BaseModel], Type[BaseModel]] = {}
+
+
+class ModelCache(object):
+    """Bounded LRU cache of models built from API responses.
+
+    Responses are keyed by a hash of their raw bytes, so a byte-identical response
+    returns the model built the first time without decoding the JSON again. Every
+    caller gets that same model, so it's frozen when it's cached: assigning to a
+    field of it, or of a model nested in it, raises TypeError. Like with pydantic's
+    own frozen models, the lists and dicts in its fields must not be modified.
+    """
+
+    max_entries: int
+    hits: int
+    misses: int
+    _entries: "OrderedDict[CacheKey, object]"
+
+    def __init__(self, max_entries: int = 1024) -> None:
+        """Initialize an empty cache.
+
+        Args:
+            max_entries: Maximum number of models to keep.
+        """
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self) -> int:
+        """Number of cached models."""
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups which were served from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0
+
+    def key(self, namespace: Hashable, body: bytes) -> CacheKey:
+        """Build the key of a response body.
+
+        Args:
+            namespace: Whatever else the built model depends on, like the model
+                type and the result field it was built from.
+            body: The raw response body.
+        """
+        # blake2b is the fastest hash in the standard library; the size is part of
+        # the key to make collisions even less likely.
+        digest = hashlib.blake2b(body, digest_size=16).digest()
+        return namespace, len(body), digest
+
+    def get(self, key: CacheKey) -> Optional[object]:
+        """Get a cached model, counting the lookup as a hit or a miss.
+
+        A cached list of models is returned as a new list of the same models.
+        """
+        cached = self._entries.get(key)
+        if cached is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        if isinstance(cached, list):
+            return list(cached)
+        return cached
+
+    def put(self, key: CacheKey, model: object) -> None:
+        """Freeze a model and cache it, evicting the least recently used if full.
+
+        The model is frozen in place, along with every model nested in it, so the
+        caller shares it with every later hit.
+        """
+        _freeze(model)
+        self._entries[key] = list(model) if isinstance(model, list) else model
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove every cached model and reset the statistics."""
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+def _frozen_type(model_type: Type[BaseModel]) -> Type[BaseModel]:
+    if not model_type.__config__.allow_mutation:
+        return model_type
+    frozen = _frozen_types.get(model_type)
+    if frozen is None:
+        config = type("Config", (model_type.__config__,), {"allow_mutation": False})
+        frozen = cast(
+            Type[BaseModel],
+            type(
+                model_type.__name__,
+                (model_type,),
+                {"Config": config, "__module__": model_type.__module__},
+            ),
+        )
+        _frozen_types[model_type] = frozen
+    return frozen
+
+
+def _freeze(model: object) -> None:
+    # Swapping the class is much cheaper than copying, and the frozen type adds no
+    # fields, so the instance stays the same otherwise.
+    if isinstance(model, BaseModel):
+        for field in model.__dict__.values():
+            _freeze(field)
+        object.__setattr__(model, "__class__", _frozen_type(type(model)))
+    elif isinstance(model, list):
+        for item in model:
+            _freeze(item)
+    elif isinstance(model, dict):
+        for dict_value in model.values():
+            _freeze(dict_value)
@@ -0,0 +1,82 @@
+from typing import List
+from unittest import TestCase
+
+import pytest
+
+from poe_client.cache import ModelCache
+from poe_client.schemas import Model
+
+
+class TagModel(Model):
+    """Test model nested in another."""
+
+    name: str
+
+
+class ItemModel(Model):
+    """Test model with nested models."""
+
+    name: str
+    tags: List[TagModel]
+
+
+class ModelCacheTest(TestCase):
+    """Tests the model cache."""
+
+    def test_lookup(self):
+        """Tests hits, misses and namespaces."""
+        cache = ModelCache()
+        key = cache.key("model", b'{"thing": "1"}')
+
+        assert cache.get(key) is None
+        cache.put(key, "built")
+        assert cache.get(key) == "built"
+        assert cache.get(cache.key("other model", b'{"thing": "1"}')) is None
+        assert (cache.hits, cache.misses) == (1, 2)
+        assert cache.hit_rate == 1 / 3
+
+        cache.clear()
+        assert len(cache) == 0
+        assert cache.hit_rate == 0
+
+    def test_eviction(self):
+        """Tests that the least recently used model is evicted."""
+        cache = ModelCache(max_entries=2)
+        first, second, third = (cache.key("model", body) for body in (b"1", b"2", b"3"))
+        cache.put(first, 1)
+        cache.put(second, 2)
+        cache.get(first)
+        cache.put(third, 3)
+
+        assert cache.get(second) is None
+        assert cache.get(first) == 1
+        assert len(cache) == 2
+
+    def test_frozen(self):
+        """Tests that cached models are frozen, and shared by every hit."""
+        cache = ModelCache()
+        key = cache.key("model", b"{}")
+        built = ItemModel(name="ring", tags=[TagModel(name="jewellery")])
+        cache.put(key, built)
+
+        cached = cache.get(key)
+        assert cached is built
+        assert isinstance(cached, ItemModel)
+        assert cached == ItemModel(name="ring", tags=[TagModel(name="jewellery")])
+        with pytest.raises(TypeError):
+            cached.name = "amulet"
+        with pytest.raises(TypeError):
+            cached.tags[0].name = "gem"
+
+    def test_list(self):
+        """Tests that a cached list of models is copied going in and coming out."""
+        cache = ModelCache()
+        key = cache.key("models", b"[]")
+        built = [TagModel(name="jewellery")]
+        cache.put(key, built)
+        built.append(TagModel(name="gem"))
+        cached = cache.get(key)
+        assert isinstance(cached, list)
+        cached.append(TagModel(name="gem"))
+
+        assert cache.get(key) == [TagModel(name="jewellery")]
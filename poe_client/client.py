@@ -1,20 +1,99 @@
+import asyncio
+import json
 import logging
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
 from types import TracebackType
-from typing import Callable, Dict, List, Optional, Type, TypeVar
+from typing import (
+    AsyncContextManager,
+    AsyncGenerator,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Hashable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+    cast,
+)
 
 import aiohttp
 from yarl import URL
 
-from poe_client.rate_limiter import RateLimiter
-from poe_client.schemas import league
+from poe_client.cache import ModelCache
+from poe_client.concurrency import AdaptiveConcurrency
+from poe_client.events import bus
+from poe_client.metrics import LimiterMetrics
+from poe_client.rate_limiter import DeadlineExceeded, RateLimiter, Reservation
+from poe_client.schemas import Raw, league
 from poe_client.schemas.account import Account, Realm
 from poe_client.schemas.character import Character
 from poe_client.schemas.filter import ItemFilter
-from poe_client.schemas.league import Ladder, League, LeagueAccount, LeagueType
+from poe_client.schemas.league import (
+    Ladder,
+    LadderEntry,
+    League,
+    LeagueAccount,
+    LeagueType,
+)
 from poe_client.schemas.pvp import PvPMatch, PvPMatchLadder, PvPMatchType
-from poe_client.schemas.stash import PublicStash, StashTab
+from poe_client.schemas.stash import StashTab
+from poe_client.stash_filter import StashFilter
+from poe_client.timing import RequestTiming, RequestTimings
+from poe_client.tolerant import Quarantine, parse_ladder
 
 Model = TypeVar("Model")  # the variable return type
+Result = TypeVar("Result")  # what a response gets read into
+
+# Monotonic time requests made in the current context must finish by, if any.
+# Set with Client.deadline, and inherited by tasks created in the context.
+_deadline: "ContextVar[Optional[float]]" = ContextVar("deadline", default=None)
+
+# Reservations used by requests made in the current context, by policy name.
+# Set with Client.reserve.
+_reservations: "ContextVar[Mapping[str, Reservation]]" = ContextVar(
+    "reservations",
+    default={},
+)
+
+
+async def _read_json(resp: aiohttp.ClientResponse) -> object:
+    return await resp.json()
+
+
+async def _read_body(resp: aiohttp.ClientResponse) -> bytes:
+    return await resp.read()
+
+
+def _retry_delay(error: Exception, default: float) -> float:
+    """Seconds to wait before retrying a request, as the server asked if it did."""
+    if isinstance(error, aiohttp.ClientResponseError) and error.headers:
+        try:
+            return float(error.headers["Retry-After"])
+        except (KeyError, ValueError):
+            pass  # noqa: WPS420
+    return default
+
+
+class LadderCrawlError(Exception):
+    """Raised when a ladder page can't be fetched while iterating a ladder.
+
+    The offset of the page which failed is kept, so the crawl can be resumed by
+    passing it to iter_league_ladder.
+    """
+
+    offset: int
+
+    def __init__(self, offset: int) -> None:
+        """Initialize a new error for the page at offset."""
+        super().__init__("Failed to fetch ladder page at offset {0}".format(offset))
+        self.offset = offset
 
 
 class Client(object):
@@ -25,6 +104,11 @@ class Client(object):
     _client: aiohttp.ClientSession
     _user_agent: str
     _limiter: RateLimiter
+    _model_cache: Optional[ModelCache]
+    _owns_session: bool
+    _request_slot: Optional[Callable[[], AsyncContextManager[None]]]
+    _timings: Optional[RequestTimings]
+    _concurrency: Optional[AdaptiveConcurrency]
 
     # Maps "generic" paths to rate limiting policy names.
     # Generic paths are paths with no IDs or unique numbers.
@@ -32,25 +116,72 @@ class Client(object):
     # "/character/" is the equivalent "generic" path.
     _path_to_policy_names: Dict[str, str]
 
-    def __init__(
+    # Leagues seen by iter_leagues or cached get_league calls, keyed by realm and id.
+    _league_cache: Dict[Tuple[Optional[Realm], str], League]
+
+    def __init__(  # noqa: WPS211
         self,
         user_agent: str,
         token: Optional[str] = None,
+        model_cache: Optional[ModelCache] = None,
+        limiter: Optional[RateLimiter] = None,
+        session: Optional[aiohttp.ClientSession] = None,
+        request_slot: Optional[Callable[[], AsyncContextManager[None]]] = None,
+        base_url: Optional[str] = None,
+        timings: Optional[RequestTimings] = None,
+        metrics: Optional[LimiterMetrics] = None,
+        concurrency: Optional[AdaptiveConcurrency] = None,
     ) -> None:
         """Initialize a new PoE client.
 
         Args:
             user_agent: An OAuth user agent. Used when making HTTP requests to the API.
             token: Authorization token to pass to the PoE API. If unset, no auth token is used.
+            model_cache: If set, responses which are byte-identical to a previous one
+                return the model built from that one, skipping JSON decoding and
+                validation. Cached models are shared, and frozen.
+            limiter: Rate limiter to use instead of a new one.
+            session: Session to make requests with. If set, the client can be used
+                without `async with`, and doesn't close the session.
+            request_slot: If set, every request is made inside the context it
+                returns. Requests wait for the rules kept in the limiter's shared
+                limiter in it, and for the other rules before it.
+            base_url: Base URL of the API, like the URL of a mock server. Defaults
+                to the PoE API.
+            timings: If set, the time each request spends in every phase is
+                recorded in it. An injected session must trace with
+                timings.trace_config() for the network phases to be recorded.
+            metrics: If set, rate limit utilization and 429s are counted in it. An
+                injected limiter must be created with the same metrics.
+            concurrency: If set, limits the requests in flight, adapting the limit
+                to latency, 429s and the headroom of the rate limit policies.
         """
         self._token = token
         self._user_agent = user_agent
-        self._limiter = RateLimiter()
+        if limiter is None:
+            limiter = RateLimiter(metrics=metrics)
+            if metrics is not None:
+                metrics.register(limiter, "client")
+        self._limiter = limiter
+        self._owns_session = session is None
+        if session is not None:
+            self._client = session
+        self._request_slot = request_slot
+        if base_url is not None:
+            self._base_url = URL(base_url)
+        self._timings = timings
+        self._concurrency = concurrency
         self._path_to_policy_names = {}
+        self._model_cache = model_cache
+        self._league_cache = {}
 
     async def __aenter__(self) -> "Client":
         """Runs on entering `async with`."""
-        self._client = aiohttp.ClientSession(raise_for_status=True)
+        if self._owns_session:
+            self._client = aiohttp.ClientSession(
+                raise_for_status=True,
+                trace_configs=[self._timings.trace_config()] if self._timings else None,
+            )
         return self
 
     async def __aexit__(
@@ -60,11 +191,110 @@ class Client(object):
         exc_tb: Optional[TracebackType],
     ) -> Optional[bool]:
         """Runs on exiting `async with`."""
-        await self._client.close()
+        if self._owns_session:
+            await self._client.close()
         if exc_val:
             raise exc_val
         return True
 
+    @contextmanager
+    def deadline(self, timeout: float) -> Iterator[None]:
+        """Give the requests made in the context until timeout seconds from now.
+
+        Works with every method, and with the tasks they create. A request the
+        rate limiter predicts can't be admitted in time raises DeadlineExceeded
+        right away, with the predicted wait, instead of waiting. Otherwise the
+        request is cancelled when the deadline passes, raising asyncio.TimeoutError,
+        which DeadlineExceeded is a subclass of. Nested deadlines can only be
+        earlier than the one around them.
+
+            with client.deadline(2):
+                character = await client.get_character("moowiz")
+
+        Args:
+            timeout: Seconds from now the requests must finish in.
+        """
+        deadline = time.monotonic() + timeout
+        outer = _deadline.get()
+        if outer is not None:
+            deadline = min(deadline, outer)
+        token = _deadline.set(deadline)
+        try:
+            yield
+        finally:
+            _deadline.reset(token)
+
+    @property
+    def limiter(self) -> RateLimiter:
+        """The rate limiter of the client."""
+        return self._limiter
+
+    def rate(self, path: str) -> Optional[float]:
+        """Get the sustained requests per second the policies of a generic path allow.
+
+        Args:
+            path: Generic path of the requests, with format args left empty, like
+                "character/" for get_character.
+
+        Returns:
+            The requests per second, or None if the policy of the path isn't known
+            yet.
+        """
+        policy_name = self._path_to_policy_names.get(path)
+        if policy_name is None:
+            return None
+        return self._limiter.rate(policy_name)
+
+    def estimate_wait(self, path: str, count: int = 1) -> Optional[float]:
+        """Estimate the seconds until count requests to a generic path could be made.
+
+        Nothing is requested, so batch jobs can plan around the rate limits
+        instead of blocking on them.
+
+        Args:
+            path: Generic path of the requests, with format args left empty, like
+                "character/" for get_character.
+            count: Number of requests.
+
+        Returns:
+            The seconds from now, or None if the policy of the path isn't known yet.
+        """
+        policy_name = self._path_to_policy_names.get(path)
+        if policy_name is None:
+            return None
+        return self._limiter.estimate_wait(policy_name, count)
+
+    @contextmanager
+    def reserve(self, path: str, count: int) -> Iterator[Reservation]:
+        """Reserve rate limit slots for count requests to a generic path.
+
+        Requests to the path made in the context, and in the tasks it creates,
+        use the slots, so they're admitted ahead of every other request with the
+        same policy. Slots which weren't used are given back when leaving it.
+
+            with client.reserve("character/", len(names)) as reservation:
+                print("done in about", reservation.wait, "seconds")
+                await asyncio.gather(*map(client.get_character, names))
+
+        Args:
+            path: Generic path of the requests, like "character/" for get_character.
+            count: Number of requests to reserve slots for.
+
+        Raises:
+            ValueError: If the policy of the path isn't known yet.
+        """
+        policy_name = self._path_to_policy_names.get(path)
+        if not policy_name:
+            raise ValueError("No rate limit policy known for path {0}".format(path))
+
+        reservation = self._limiter.reserve(policy_name, count)
+        token = _reservations.set({**_reservations.get(), policy_name: reservation})
+        try:
+            yield reservation
+        finally:
+            _reservations.reset(token)
+            reservation.release()
+
     # Type ignore is for args and kwargs, which have unknown types we pass to _get_json
     async def _get(  # type: ignore
         self,
@@ -86,12 +316,14 @@ class Client(object):
         Returns:
             The result, parsed into an instance of the `model` type.
         """
-        json_result = await self._get_json(*args, **kwargs)
-        assert isinstance(json_result, dict)  # noqa: S101
-        if result_field:
-            json_result = json_result[result_field]
 
-        return model(**json_result)
+        def build(json_result: object) -> Model:  # noqa: WPS430
+            assert isinstance(json_result, dict)  # noqa: S101
+            fields = json_result[result_field] if result_field else json_result
+
+            return model(**fields)
+
+        return await self._get_model(build, (model, result_field), *args, **kwargs)
 
     # Type ignore is for args and kwargs, which have unknown types we pass to _get_json
     async def _get_list(  # type: ignore
@@ -114,14 +346,135 @@ class Client(object):
         Returns:
             The result, parsed into a list of the `model` type.
         """
-        json_result = await self._get_json(*args, **kwargs)
 
-        if result_field:
-            assert isinstance(json_result, dict)  # noqa: S101
-            json_result = json_result[result_field]
+        def build(json_result: object) -> List[Model]:  # noqa: WPS430
+            if result_field:
+                assert isinstance(json_result, dict)  # noqa: S101
+                json_result = json_result[result_field]
+
+            assert isinstance(json_result, list)  # noqa: S101
+            return [model(**objitem) for objitem in json_result]
+
+        return await self._get_model(
+            build,
+            (list, model, result_field),
+            *args,
+            **kwargs,
+        )
+
+    async def _get_model(
+        self,
+        build: Callable[[object], Result],
+        cache_namespace: Hashable,
+        *args,
+        **kwargs,
+    ) -> Result:
+        """Make a get request and build the result, using the model cache if set.
+
+        Args:
+            build: Builds the result from the JSON response.
+            cache_namespace: Identifies how the result is built from the response.
+                Cached results are only shared between calls with equal namespaces.
+
+        See _get_json for other args.
 
-        assert isinstance(json_result, list)  # noqa: S101
-        return [model(**objitem) for objitem in json_result]
+        Returns:
+            The built result.
+        """
+        if self._timings is None:
+            return await self._fetch_model(
+                build,
+                cache_namespace,
+                None,
+                *args,
+                **kwargs,
+            )
+
+        timing = RequestTiming()
+        try:
+            return await self._fetch_model(
+                build,
+                cache_namespace,
+                timing,
+                *args,
+                **kwargs,
+            )
+        finally:
+            self._timings.record(timing)
+
+    async def _fetch_model(
+        self,
+        build: Callable[[object], Result],
+        cache_namespace: Hashable,
+        timing: Optional[RequestTiming],
+        *args,
+        **kwargs,
+    ) -> Result:
+        """Make a get request and build the result, timing it if timing is set.
+
+        See _get_model for the args.
+        """
+        if self._model_cache is None:
+            if timing is None:
+                return build(await self._get_json(*args, **kwargs))
+            json_result = await self._request(
+                *args,
+                read=_read_json,
+                timing=timing,
+                **kwargs,
+            )
+            return timing.measure("build", build, json_result)
+
+        body = await self._request(*args, read=_read_body, timing=timing, **kwargs)
+        key = self._model_cache.key(cache_namespace, body)
+        cached = self._model_cache.get(key)
+        if cached is not None:
+            return cast(Result, cached)
+
+        if timing is None:
+            built = build(json.loads(body))
+        else:
+            decoded = timing.measure("decode", json.loads, body)
+            built = timing.measure("build", build, decoded)
+        self._model_cache.put(key, built)
+        return built
+
+    def _generic_path(self, path: str, arg_count: int) -> str:
+        """Get the generic path of a path, with its format args left empty."""
+        return path.format(*("" for _ in range(arg_count)))
+
+    def _headroom(self, path: str, arg_count: int = 0) -> Optional[int]:
+        """Get how many more requests the policies of a path currently allow.
+
+        Returns None if the policy of the path isn't known yet.
+        """
+        policy_name = self._path_to_policy_names.get(
+            self._generic_path(path, arg_count),
+        )
+        if policy_name is None:
+            return None
+        return self._limiter.headroom(policy_name)
+
+    async def get_raw(
+        self,
+        path: str,
+        path_format_args: Optional[List[str]] = None,
+        query: Optional[Dict[str, str]] = None,
+    ) -> bytes:
+        """Make a rate limited request and return the response body undecoded.
+
+        For callers which look at responses before decoding them, like pollers
+        comparing bodies.
+
+        Args:
+            path: The URL path, with non-static parts as format args ("{0}").
+            path_format_args: Values of the format args in the path.
+            query: Query params to add to the request.
+
+        Returns:
+            The response body.
+        """
+        return await self._request(path, path_format_args, query, read=_read_body)
 
     async def _get_json(
         self,
@@ -147,55 +500,232 @@ class Client(object):
             The result of the API request, parsed as JSON.
 
         """
+        return await self._request(path, path_format_args, query, read=_read_json)
+
+    async def _request(
+        self,
+        path: str,
+        path_format_args: Optional[List[str]] = None,
+        query: Optional[Dict[str, str]] = None,
+        *,
+        read: Callable[[aiohttp.ClientResponse], Awaitable[Result]],
+        timing: Optional[RequestTiming] = None,
+    ) -> Result:
+        """Makes a rate limited request to the POE API.
+
+        Args:
+            read: Reads the result out of a successful response.
+            timing: If set, the phases of the request are timed into it, and the
+                caller records it. Otherwise, requests are timed and recorded here
+                if the client has timings.
+
+        See _get_json for other args.
+
+        Returns:
+            The result of read.
+        """
+        deadline = _deadline.get()
+        if deadline is None:
+            return await self._limited(path, path_format_args, query, read, timing)
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded(0)
+        return await asyncio.wait_for(
+            self._limited(path, path_format_args, query, read, timing),
+            remaining,
+        )
+
+    async def _limited(  # noqa: WPS211
+        self,
+        path: str,
+        path_format_args: Optional[List[str]],
+        query: Optional[Dict[str, str]],
+        read: Callable[[aiohttp.ClientResponse], Awaitable[Result]],
+        timing: Optional[RequestTiming],
+    ) -> Result:
+        """Makes the request of _request, within the concurrency limit if any."""
+        if self._concurrency is None:
+            return await self._timed(path, path_format_args, query, read, timing)
+
+        async with self._concurrency.slot():
+            started = time.monotonic()
+            result = await self._timed(path, path_format_args, query, read, timing)
+            self._concurrency.on_success(
+                time.monotonic() - started,
+                self._headroom(path, len(path_format_args or ())),
+            )
+            return result
+
+    async def _timed(  # noqa: WPS211
+        self,
+        path: str,
+        path_format_args: Optional[List[str]],
+        query: Optional[Dict[str, str]],
+        read: Callable[[aiohttp.ClientResponse], Awaitable[Result]],
+        timing: Optional[RequestTiming],
+    ) -> Result:
+        """Makes the request of _request, recording its timing if needed."""
+        if timing is not None or self._timings is None:
+            return await self._send(path, path_format_args, query, read, timing)
+
+        timing = RequestTiming()
+        try:
+            return await self._send(path, path_format_args, query, read, timing)
+        finally:
+            self._timings.record(timing)
+
+    async def _send(  # noqa: WPS211
+        self,
+        path: str,
+        path_format_args: Optional[List[str]],
+        query: Optional[Dict[str, str]],
+        read: Callable[[aiohttp.ClientResponse], Awaitable[Result]],
+        timing: Optional[RequestTiming],
+    ) -> Result:
+        """Makes the request of _request, timing it into timing if set."""
         if not path_format_args:
             path_format_args = []
-        path_with_no_args = path.format(("" for _ in range(len(path_format_args))))
+        path_with_no_args = self._generic_path(path, len(path_format_args))
         policy_name = self._path_to_policy_names.get(path_with_no_args, "")
 
-        kwargs = {
-            "headers": {
-                "User-Agent": self._user_agent,
-            },
-            "params": query,
+        if timing is not None:
+            timing.path = path_with_no_args
+            wait_started = time.perf_counter()
+
+        # We key the policy name off the path with no format args. This presumes
+        # that different requests to the same endpoints with different specific
+        # args use the same rate limiting. For example, /characters/moowiz and
+        # /characters/chris presumably use the same rate limiting policy name.
+        async with self._admitted(policy_name) as raise_for_status:
+            if bus.active:
+                bus.emit(
+                    "request.start",
+                    path=path_with_no_args,
+                    policy=policy_name,
+                    blocking=not raise_for_status,
+                )
+
+            if timing is not None:
+                timing.limiter_wait = time.perf_counter() - wait_started
+
+            async with await self._open(
+                "{0}/{1}".format(self._base_url, path.format(*path_format_args)),
+                self._headers(),
+                query,
+                raise_for_status,
+                timing,
+            ) as resp:
+                return await self._receive(resp, path_with_no_args, read, timing)
+
+    def _headers(self) -> Dict[str, str]:
+        headers = {
+            "User-Agent": self._user_agent,
         }
         if self._token:
-            headers = kwargs["headers"]
-            assert headers  # noqa: S101
             headers["Authorization"] = "Bearer {0}".format(self._token)
+        return headers
 
-        # We key the policy name off the path with no format args. This presumes that
-        # different requests to the same endpoints with different specific args use the
-        # same rate limiting. For example, /characters/moowiz and /characters/chris
-        # presumably use the same rate limiting policy name.
-        if await self._limiter.get_semaphore(policy_name):
-            # We ignore typing in the dict assignment. kwargs only has dicts as values,
-            # but we're assigning booleans here. We can't set the typing inline without
-            # flake8 complaining about overly complex annotation.
-            logging.debug("NOT BLOCKING")
-            kwargs["raise_for_status"] = True  # type: ignore
-        else:
-            logging.debug("BLOCKING")
-            kwargs["raise_for_status"] = False  # type: ignore
-
-        # The types are ignored because for some reason it can't understand
-        # that kwargs isn't a positional arg and won't override a different
-        # positional argument in the function.
-        async with await self._client.get(
-            "{0}/{1}".format(self._base_url, path.format(*path_format_args)),
-            **kwargs,  # type: ignore
-        ) as resp:
-            self._path_to_policy_names[
-                path_with_no_args
-            ] = await self._limiter.parse_headers(resp.headers)
-
-            if resp.status != 200:
-                raise ValueError(
-                    "Invalid request: status code {0}, expected 200".format(
-                        resp.status,
-                    ),
+    async def _receive(
+        self,
+        resp: aiohttp.ClientResponse,
+        path_with_no_args: str,
+        read: Callable[[aiohttp.ClientResponse], Awaitable[Result]],
+        timing: Optional[RequestTiming],
+    ) -> Result:
+        """Update the rate limits from a response, and read it if successful."""
+        if timing is not None:
+            timing.status = resp.status
+        self._path_to_policy_names[
+            path_with_no_args
+        ] = await self._limiter.parse_headers(resp.headers)
+
+        if bus.active:
+            bus.emit(
+                "request.end",
+                path=path_with_no_args,
+                status=resp.status,
+            )
+
+        if resp.status != 200:
+            if resp.status == 429:
+                self._count_throttled(resp.headers)
+            raise ValueError(
+                "Invalid request: status code {0}, expected 200".format(
+                    resp.status,
+                ),
+            )
+
+        if timing is not None:
+            return await timing.read(resp, read)
+        return await read(resp)
+
+    @asynccontextmanager
+    async def _admitted(self, policy_name: str) -> AsyncIterator[bool]:
+        """Hold the request slot, if any, with the request admitted by the limiter.
+
+        Yields whether the limiter knew the policies, so 429s can't be expected.
+        """
+        deadline = _deadline.get()
+        reservation = _reservations.get().get(policy_name)
+        if self._request_slot is None:
+            yield await self._limiter.get_semaphore(policy_name, deadline, reservation)
+            return
+
+        # The rules of the token are waited on before taking a slot, so a throttled
+        # token doesn't hold slots other tokens could use. The slot is taken before
+        # the shared rules admit the request, so the order slots are handed out in
+        # is also the order requests use up the shared rules in.
+        own = await self._limiter.get_semaphore(
+            policy_name,
+            deadline,
+            reservation,
+            shared=False,
+        )
+        async with self._request_slot():
+            shared = await self._limiter.get_semaphore(
+                policy_name,
+                deadline,
+                reservation,
+                shared=True,
+            )
+            yield own and shared
+
+    async def _open(  # noqa: WPS211
+        self,
+        url: str,
+        headers: Dict[str, str],
+        query: Optional[Dict[str, str]],
+        raise_for_status: bool,
+        timing: Optional[RequestTiming],
+    ) -> aiohttp.ClientResponse:
+        """Send a GET request, counting 429s raised by raise_for_status."""
+        try:
+            if timing is None:
+                return await self._client.get(
+                    url,
+                    headers=headers,
+                    params=query,
+                    raise_for_status=raise_for_status,
                 )
-
-            return await resp.json()
+            return await self._client.get(
+                url,
+                headers=headers,
+                params=query,
+                raise_for_status=raise_for_status,
+                trace_request_ctx=timing,
+            )
+        except aiohttp.ClientResponseError as error:
+            if error.status == 429:
+                self._count_throttled(error.headers or {})
+            raise
+
+    def _count_throttled(self, headers: Mapping[str, str]) -> None:
+        if self._concurrency is not None:
+            self._concurrency.on_throttled()
+        metrics = self._limiter.metrics
+        if metrics is not None:
+            metrics.record_throttled(headers.get("X-Rate-Limit-Policy", ""))
 
 
 class _PvPMixin(Client):
@@ -309,33 +839,119 @@ class _LeagueMixin(Client):
             query=query,
         )
 
+    async def iter_leagues(
+        self,
+        realm: Optional[Realm] = None,
+        league_type: Optional[LeagueType] = None,
+        season: str = "",
+        limit: int = 50,
+    ) -> AsyncGenerator[League, None]:
+        """Iterate over every league matching the filters, across all pages.
+
+        The next page is requested before the leagues of the current page are
+        yielded, and iteration stops after the first page shorter than limit. Every
+        league seen is cached for get_league(cached=True).
+
+        See list_leagues for the args.
+
+        Yields:
+            Leagues, in the order the API lists them.
+
+        Raises:
+            ValueError: If limit isn't positive.
+        """
+        if limit <= 0:
+            raise ValueError("limit must be positive.")
+        offset = 0
+        next_page: Optional["asyncio.Future[List[League]]"] = asyncio.ensure_future(
+            self.list_leagues(
+                realm=realm,
+                league_type=league_type,
+                offset=offset,
+                season=season,
+                limit=limit,
+            ),
+        )
+        try:
+            while next_page is not None:
+                page = await next_page
+                offset += len(page)
+                next_page = None
+                if page and len(page) >= limit:
+                    next_page = asyncio.ensure_future(
+                        self.list_leagues(
+                            realm=realm,
+                            league_type=league_type,
+                            offset=offset,
+                            season=season,
+                            limit=limit,
+                        ),
+                    )
+
+                for league in page:
+                    self._league_cache[(realm, league.id)] = league
+                    yield league
+        finally:
+            if next_page is not None:
+                next_page.cancel()
+
     async def get_league(
         self,
         league: str,
         realm: Optional[Realm] = None,
+        cached: bool = False,
     ) -> League:
-        """Get a league based on league id."""
+        """Get a league based on league id.
+
+        If cached is set, leagues seen before by iter_leagues or a cached
+        get_league call are returned without making a request.
+        """
+        if cached and (realm, league) in self._league_cache:
+            return self._league_cache[(realm, league)]
+
         query = {}
         if realm:
             query["realm"] = realm.value
 
-        return await self._get(
+        league_result = await self._get(
             path="league/{0}",
             path_format_args=(league,),
             model=League,
             result_field="league",
             query=query,
         )
+        if cached:
+            self._league_cache[(realm, league)] = league_result
+        return league_result
 
-    async def get_league_ladder(
+    async def get_league_ladder(  # noqa: WPS211
         self,
         league: str,
         realm: Optional[Realm] = None,
+        quarantine: Optional[Quarantine] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
     ) -> Ladder:
-        """Get the ladder of a league based on id."""
+        """Get the ladder of a league based on id.
+
+        If a quarantine is passed, ladder entries are validated one by one and the
+        ones which fail go to the quarantine instead of failing the whole ladder.
+        """
         query = {}
         if realm:
             query["realm"] = realm.value
+        if offset:
+            query["offset"] = str(offset)
+        if limit:
+            query["limit"] = str(limit)
+
+        if quarantine is not None:
+            json_result = await self._get_json(
+                path="league/{0}/ladder",
+                path_format_args=[league],
+                query=query,
+            )
+            return parse_ladder(json_result["ladder"], quarantine)
 
         return await self._get(
             path="league/{0}/ladder",
@@ -345,6 +961,120 @@ class _LeagueMixin(Client):
             query=query,
         )
 
+    async def iter_league_ladder(  # noqa: WPS211, WPS231
+        self,
+        league: str,
+        realm: Optional[Realm] = None,
+        offset: int = 0,
+        page_size: int = 500,
+        max_concurrency: int = 5,
+        retries: int = 2,
+        retry_backoff: float = 1,
+    ) -> AsyncIterator[List[LadderEntry]]:
+        """Iterate over a whole league ladder, one page of entries at a time.
+
+        The first page is fetched alone to learn the ladder total. The remaining
+        pages are fetched concurrently, as many at once as the rate limiter
+        currently has headroom for (up to max_concurrency), and are yielded in
+        rank order. If the server returns fewer entries than asked for, the next
+        pages are fetched from where the short page actually ended.
+
+        Args:
+            league: The league id.
+            realm: The realm of the league.
+            offset: Offset of the first entry to fetch. Use this to resume a crawl.
+            page_size: Number of entries to fetch per request.
+            max_concurrency: Maximum number of pages fetched at once.
+            retries: Number of times a failing page is retried.
+            retry_backoff: Seconds to wait before the first retry of a page,
+                doubling with every retry. A Retry-After sent by the server is
+                used instead.
+
+        Yields:
+            Lists of ladder entries, in rank order.
+
+        Raises:
+            LadderCrawlError: If a page still fails after retrying. Every page
+                before it has been yielded, and the error holds its offset.
+        """
+        first_page = await self._get_ladder_page(
+            league,
+            realm,
+            offset,
+            page_size,
+            retries,
+            retry_backoff,
+        )
+        if not first_page.entries:
+            return
+        yield first_page.entries
+        offset += len(first_page.entries)
+        # The server may return less than asked for per page; use what it returns.
+        page_size = min(page_size, len(first_page.entries))
+
+        while offset < first_page.total:
+            headroom = self._headroom("league/{0}/ladder", 1)
+            width = max(1, min(max_concurrency, headroom or 1))
+            offsets = list(range(offset, first_page.total, page_size))[:width]
+            pages = await asyncio.gather(
+                *(
+                    self._get_ladder_page(
+                        league,
+                        realm,
+                        page_offset,
+                        page_size,
+                        retries,
+                        retry_backoff,
+                    )
+                    for page_offset in offsets
+                ),
+                return_exceptions=True,
+            )
+            for page_offset, page in zip(offsets, pages):
+                if isinstance(page, BaseException):
+                    raise LadderCrawlError(page_offset) from page
+                if not page.entries:
+                    return
+                yield page.entries
+                offset = page_offset + len(page.entries)
+                if len(page.entries) < page_size:
+                    # The rest of the batch was fetched from offsets past the end
+                    # of this page, so it's fetched again from where this ended.
+                    break
+
+    async def _get_ladder_page(  # noqa: WPS211
+        self,
+        league: str,
+        realm: Optional[Realm],
+        offset: int,
+        limit: int,
+        retries: int,
+        backoff: float,
+    ) -> Ladder:
+        """Get a single ladder page, retrying on failure."""
+        attempt = 0
+        while True:  # noqa: WPS457
+            try:
+                return await self.get_league_ladder(
+                    league,
+                    realm=realm,
+                    offset=offset,
+                    limit=limit,
+                )
+            except (aiohttp.ClientError, ValueError) as error:
+                if attempt >= retries:
+                    raise
+                delay = _retry_delay(error, backoff * 2**attempt)
+                attempt += 1
+                logging.info(
+                    "Retrying ladder page at offset {0} of {1} in {2}s".format(
+                        offset,
+                        league,
+                        delay,
+                    ),
+                )
+                await asyncio.sleep(delay)
+
 
 class _AccountMixin(Client):
     """User account methods for the POE API.
@@ -356,7 +1086,7 @@ class _AccountMixin(Client):
         self,
     ) -> Account:
         """Get the account beloning to the token."""
-        return await self._get(path="league", model=Account)
+        return await self._get(path="profile", model=Account)
 
     async def get_characters(
         self,
@@ -396,10 +1126,10 @@ class _AccountMixin(Client):
         self,
         league: str,
         stash_id: str,
-        substash_id: Optional[str],
+        substash_id: Optional[str] = None,
     ) -> StashTab:
         """Get a stash tab based on id."""
-        path = "stash/{0}/{1}".format(league, stash_id)
+        path = "stash/{0}/{1}"
         path_format_args = [league, stash_id]
         if substash_id:
             path += "/{2}"  # noqa: WPS336
@@ -412,6 +1142,82 @@ class _AccountMixin(Client):
             result_field="stash",
         )
 
+    async def snapshot_stashes(
+        self,
+        league: str,
+        previous: Optional[List[StashTab]] = None,
+        unchanged: Optional[Callable[[StashTab, StashTab], bool]] = None,
+        max_concurrency: int = 5,
+    ) -> List[StashTab]:
+        """Get the contents of every stash tab in a league, including sub-tabs.
+
+        Tabs are listed with get_stashes, then every tab and the children of folder
+        tabs (like map and unique tabs) are fetched concurrently.
+
+        Args:
+            league: The league to snapshot.
+            previous: A previous snapshot. Tabs which are unchanged since then are
+                taken from it instead of being fetched again.
+            unchanged: Called with a listed tab and its tab in the previous
+                snapshot, returns whether the previous tab can be reused. Defaults
+                to comparing the metadata of the tab and of its children.
+            max_concurrency: Maximum number of tabs fetched at once.
+
+        Returns:
+            The stash tabs, in the order get_stashes lists them, with their items
+            and children filled in.
+        """
+        previous_tabs = _flatten_tabs(previous or [])
+        is_unchanged = unchanged or _same_metadata
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def fetch_tab(  # noqa: WPS430
+            listed: StashTab,
+            parent_id: Optional[str],
+        ) -> StashTab:
+            previous_tab = previous_tabs.get(listed.id)
+            if previous_tab is not None and is_unchanged(listed, previous_tab):
+                return previous_tab
+
+            async with semaphore:
+                if parent_id:
+                    tab = await self.get_stash(league, parent_id, listed.id)
+                else:
+                    tab = await self.get_stash(league, listed.id)
+
+            if tab.children:
+                children = await asyncio.gather(
+                    *(fetch_tab(child, tab.id) for child in tab.children),
+                )
+                tab = tab.copy(update={"children": list(children)})
+            return tab
+
+        tabs = await self.get_stashes(league)
+        return list(await asyncio.gather(*(fetch_tab(tab, None) for tab in tabs)))
+
+
+def _flatten_tabs(tabs: List[StashTab]) -> Dict[str, StashTab]:
+    """Map the id of every tab in a tree of stash tabs to the tab."""
+    flattened = {}
+    pending = list(tabs)
+    while pending:
+        tab = pending.pop()
+        flattened[tab.id] = tab
+        pending.extend(tab.children or ())
+    return flattened
+
+
+def _same_metadata(listed: StashTab, previous: StashTab) -> bool:
+    """Check whether a tab and all its children have the same metadata as before."""
+    if listed.metadata is None or listed.metadata != previous.metadata:
+        return False
+    previous_children = {child.id: child for child in previous.children or ()}
+    return all(
+        child.id in previous_children
+        and _same_metadata(child, previous_children[child.id])
+        for child in listed.children or ()
+    )
+
 
 class _FilterMixin(Client):
     """Item Filter methods for the POE API.
@@ -451,7 +1257,8 @@ class _PublicStashMixin(Client):
     async def get_public_stash_tabs(
         self,
         next_change_id: Optional[str] = None,
-    ) -> PublicStash:
+        stash_filter: Optional[StashFilter] = None,
+    ) -> Raw:
         """Get the latest public stash tabs.
 
         Args:
@@ -460,6 +1267,8 @@ class _PublicStashMixin(Client):
                             in practice this is required; not setting this value
                             fetches stash tabs from the beginning of the API's
                             availability which is several years in the past.
+            stash_filter: If set, stashes and items it doesn't match are dropped
+                          from the result.
 
         Returns:
             A dict representing a public stash change.
@@ -468,10 +1277,13 @@ class _PublicStashMixin(Client):
         if next_change_id:
             query["id"] = next_change_id
 
-        return await self._get_json(
+        json_result = await self._get_json(
             path="public-stash-tabs",
             query=query,
         )
+        if stash_filter:
+            return stash_filter.apply(json_result)
+        return json_result
 
 
 class _LeagueAccountMixin(Client):
@@ -1,10 +1,19 @@
+import asyncio
+from typing import List
 from unittest import IsolatedAsyncioTestCase, mock
 
+import aiohttp
 import pytest
+from multidict import CIMultiDict
 from yarl import URL
 
 from poe_client import client
-from poe_client.schemas import Model
+from poe_client.cache import ModelCache
+from poe_client.conftest import make_tab
+from poe_client.rate_limiter import DeadlineExceeded
+from poe_client.schemas import Model, Raw
+from poe_client.stash_filter import StashFilter
+from poe_client.tolerant import Quarantine
 
 
 class ModelTest(Model):
@@ -13,6 +22,14 @@ class ModelTest(Model):
     thing: str
 
 
+def make_entry(rank: int) -> Raw:
+    """Build a raw ladder entry."""
+    return {
+        "rank": rank,
+        "character": {"id": str(rank), "name": "moowiz", "class": "Witch", "level": 1},
+    }
+
+
 class ClientTest(IsolatedAsyncioTestCase):
     """Tests the POE client.
 
@@ -118,6 +135,38 @@ class ClientTest(IsolatedAsyncioTestCase):
         )
         assert get_list_result == [ModelTest(thing="12"), ModelTest(thing="98")]
 
+    async def test_model_cache(self):
+        """Tests that identical responses return the cached model."""
+        self.client._model_cache = ModelCache()
+        response_mock = mock.MagicMock()
+        response_mock.status = 200
+        response_mock.headers = {}
+        response_mock.read = mock.AsyncMock(return_value=b'{"model": [{"thing": "1"}]}')
+        self.client._client.get.return_value.__aenter__.return_value = (  # type: ignore
+            response_mock
+        )
+
+        first = await self.client._get_list(
+            model=ModelTest,
+            result_field="model",
+            path="test",
+        )
+        second = await self.client._get_list(
+            model=ModelTest,
+            result_field="model",
+            path="test",
+        )
+
+        assert first == [ModelTest(thing="1")]
+        assert second == first
+        assert self.client._model_cache.hits == 1
+        response_mock.json.assert_not_called()
+
+        # Every caller gets the same frozen models.
+        assert second[0] is first[0]
+        with pytest.raises(TypeError):
+            second[0].thing = "2"
+
     async def test_wrong_status(self):
         """Tests that the client throws an exception with an invalid HTTP status."""
         response_mock = mock.MagicMock()
@@ -133,6 +182,72 @@ class ClientTest(IsolatedAsyncioTestCase):
                 path="test",
             )
 
+    async def test_deadline_rejected(self):
+        """Tests that a request which can't be admitted in time fails up front."""
+        await self.client._limiter.parse_headers(
+            {
+                "X-Rate-Limit-Policy": "test-limit",
+                "X-Rate-Limit-Rules": "Account",
+                "X-Rate-Limit-Account": "5:10:60",
+                "X-Rate-Limit-Account-State": "5:10:0",
+            },
+        )
+        self.client._path_to_policy_names["test"] = "test-limit"
+
+        with self.client.deadline(5):
+            with pytest.raises(DeadlineExceeded) as error:
+                await self.client._get(model=ModelTest, path="test")
+
+        assert error.value.predicted_wait == 11
+        self.client._client.get.assert_not_called()  # type: ignore
+
+    async def test_deadline_in_flight(self):
+        """Tests that a request still in flight at its deadline is cancelled."""
+
+        async def slow_get(*args, **kwargs):  # noqa: WPS430
+            await asyncio.sleep(10)
+
+        self.client._client.get.side_effect = slow_get  # type: ignore
+        with self.client.deadline(0.05):
+            with pytest.raises(asyncio.TimeoutError):
+                await self.client._get(model=ModelTest, path="test")
+
+            with self.client.deadline(10):
+                # The outer deadline has passed already.
+                with pytest.raises(DeadlineExceeded):
+                    await self.client._get(model=ModelTest, path="test")
+
+    async def test_reserve(self):
+        """Tests that requests in a reservation use its slots."""
+        response_mock = mock.MagicMock()
+        response_mock.status = 200
+        response_mock.headers = {
+            "X-Rate-Limit-Policy": "test-limit",
+            "X-Rate-Limit-Rules": "Account",
+            "X-Rate-Limit-Account": "5:10:60",
+            "X-Rate-Limit-Account-State": "1:10:0",
+        }
+        response_mock.json = mock.AsyncMock(return_value={"thing": "1"})
+        self.client._client.get.return_value.__aenter__.return_value = (  # type: ignore
+            response_mock
+        )
+
+        assert self.client.estimate_wait("test") is None
+        with pytest.raises(ValueError):
+            with self.client.reserve("test", 2):
+                pass  # noqa: WPS420
+
+        await self.client._get(model=ModelTest, path="test")
+        assert self.client.estimate_wait("test", 4) == 0
+        with self.client.reserve("test", 4) as reservation:
+            await self.client._get(model=ModelTest, path="test")
+            assert reservation.remaining == 3
+            wait = self.client.estimate_wait("test", 2)
+            assert wait is not None
+            assert wait > 0
+
+        assert self.client.estimate_wait("test", 4) == 0
+
 
 class PublicStashTest(IsolatedAsyncioTestCase):
     """Tests the public stash tab API client."""
@@ -160,3 +275,255 @@ class PublicStashTest(IsolatedAsyncioTestCase):
                 path="public-stash-tabs",
                 query={"id": "1234"},
             )
+
+    async def test_stash_filter(self):
+        """Tests that stash filters are applied to the result."""
+        self.client._get_json.return_value = {  # type: ignore
+            "nextChangeId": "1235",
+            "stashes": [{"id": "a", "league": "Standard"}, {"id": "b"}],
+        }
+        stash_filter = StashFilter(leagues=["Standard"])
+
+        async with self.client:
+            page = await self.client.get_public_stash_tabs(
+                next_change_id="1234",
+                stash_filter=stash_filter,
+            )
+
+        assert page["stashes"] == [{"id": "a", "league": "Standard"}]
+        assert stash_filter.dropped_stashes == 1
+
+
+class LeagueTest(IsolatedAsyncioTestCase):
+    """Tests the league API client."""
+
+    def setUp(self) -> None:
+        """Setup override."""
+        self.client = client.PoEClient("test user agent", "token")
+        self.client._get_json = mock.AsyncMock()  # type: ignore
+        return super().setUp()
+
+    async def test_iter_leagues(self):
+        """Tests that league pages are followed until a short page."""
+        self.client._get_json.side_effect = [  # type: ignore
+            {"leagues": [{"id": "Standard"}, {"id": "Hardcore"}]},
+            {"leagues": [{"id": "Event"}]},
+        ]
+
+        leagues = [league.id async for league in self.client.iter_leagues(limit=2)]
+
+        assert leagues == ["Standard", "Hardcore", "Event"]
+        assert self.client._get_json.call_args.kwargs["query"] == {  # type: ignore
+            "offset": "2",
+            "limit": "2",
+        }
+        league = await self.client.get_league("Event", cached=True)
+        assert league.id == "Event"
+        assert self.client._get_json.call_count == 2  # type: ignore
+
+    async def test_iter_leagues_limit(self):
+        """Tests that leagues can't be iterated without a positive limit."""
+        with pytest.raises(ValueError, match="limit"):
+            await self.client.iter_leagues(limit=0).__anext__()
+        self.client._get_json.assert_not_called()  # type: ignore
+
+    async def test_iter_leagues_break(self):
+        """Tests that the prefetched page is cancelled when iteration stops early."""
+        self.client._get_json.side_effect = [  # type: ignore
+            {"leagues": [{"id": "Standard"}, {"id": "Hardcore"}]},
+            {"leagues": []},
+        ]
+
+        leagues = self.client.iter_leagues(limit=2)
+        first = await leagues.__anext__()
+        await leagues.aclose()
+
+        assert first.id == "Standard"
+        assert self.client._league_cache.keys() == {(None, "Standard")}
+
+    async def test_get_league_cached(self):
+        """Tests that cached league lookups only request once."""
+        self.client._get_json.return_value = {  # type: ignore
+            "league": {"id": "Standard"},
+        }
+
+        await self.client.get_league("Standard", cached=True)
+        await self.client.get_league("Standard", cached=True)
+        await self.client.get_league("Standard")
+
+        assert self.client._get_json.call_count == 2  # type: ignore
+
+    async def test_ladder_quarantine(self):
+        """Tests that invalid ladder entries are quarantined."""
+        self.client._get_json.return_value = {  # type: ignore
+            "ladder": {
+                "total": 2,
+                "entries": [make_entry(1), {"rank": 2}],
+            },
+        }
+        quarantine = Quarantine()
+
+        ladder = await self.client.get_league_ladder("Standard", quarantine=quarantine)
+
+        assert [entry.rank for entry in ladder.entries] == [1]
+        assert quarantine.quarantined == {"LadderEntry": 1}
+        self.client._get_json.assert_called_with(  # type: ignore
+            path="league/{0}/ladder",
+            path_format_args=["Standard"],
+            query={},
+        )
+
+    async def test_iter_ladder(self):
+        """Tests that ladder pages are yielded in rank order."""
+
+        async def get_json(path, path_format_args, query):  # noqa: WPS430
+            offset = int(query.get("offset", 0))
+            limit = int(query["limit"])
+            ranks = range(offset + 1, min(offset + limit, 5) + 1)
+            return {
+                "ladder": {"total": 5, "entries": [make_entry(rank) for rank in ranks]}
+            }
+
+        self.client._get_json.side_effect = get_json  # type: ignore
+
+        pages = [
+            [entry.rank for entry in page]
+            async for page in self.client.iter_league_ladder("Standard", page_size=2)
+        ]
+
+        assert pages == [[1, 2], [3, 4], [5]]
+
+    async def test_iter_ladder_short_page(self):
+        """Tests that a short page moves the next offsets back to where it ended."""
+        total = 7
+
+        async def get_json(path, path_format_args, query):  # noqa: WPS430
+            offset = int(query.get("offset", 0))
+            # The page at offset 2 is cut short.
+            limit = 1 if offset == 2 else int(query["limit"])
+            ranks = range(offset + 1, min(offset + limit, total) + 1)
+            return {
+                "ladder": {
+                    "total": total,
+                    "entries": [make_entry(rank) for rank in ranks],
+                },
+            }
+
+        self.client._get_json.side_effect = get_json  # type: ignore
+
+        pages = [
+            [entry.rank for entry in page]
+            async for page in self.client.iter_league_ladder("Standard", page_size=2)
+        ]
+
+        assert pages == [[1, 2], [3], [4, 5], [6, 7]]
+
+    async def test_iter_ladder_retry(self):
+        """Tests that failing pages are retried after backing off."""
+        throttled = aiohttp.ClientResponseError(
+            mock.Mock(),
+            (),
+            status=429,
+            headers=CIMultiDict({"Retry-After": "5"}),
+        )
+        self.client._get_json.side_effect = [  # type: ignore
+            ValueError("Invalid request"),
+            throttled,
+            {"ladder": {"total": 1, "entries": [make_entry(1)]}},
+        ]
+
+        with mock.patch("asyncio.sleep") as sleep:
+            pages = [
+                page
+                async for page in self.client.iter_league_ladder(
+                    "Standard",
+                    retry_backoff=0.5,
+                )
+            ]
+
+        assert len(pages) == 1
+        assert [call.args[0] for call in sleep.call_args_list] == [0.5, 5]
+
+    async def test_iter_ladder_error(self):
+        """Tests that failing pages raise an error with the offset to resume from."""
+        self.client._get_json.side_effect = [  # type: ignore
+            {"ladder": {"total": 4, "entries": [make_entry(1), make_entry(2)]}},
+            ValueError("Invalid request"),
+            {"ladder": {"total": 4, "entries": [make_entry(3), make_entry(4)]}},
+        ]
+
+        pages = []
+        with pytest.raises(client.LadderCrawlError) as error:
+            async for page in self.client.iter_league_ladder(
+                "Standard",
+                page_size=2,
+                retries=0,
+            ):
+                pages.append(page)
+
+        assert len(pages) == 1
+        assert error.value.offset == 2
+        ranks = [
+            [entry.rank for entry in page]
+            async for page in self.client.iter_league_ladder(
+                "Standard",
+                offset=error.value.offset,
+                page_size=2,
+            )
+        ]
+        assert ranks == [[3, 4]]
+
+
+class StashTest(IsolatedAsyncioTestCase):
+    """Tests the stash API client."""
+
+    def setUp(self) -> None:
+        """Setup override."""
+        self.client = client.PoEClient("test user agent", "token")
+        get_json = mock.AsyncMock(side_effect=self.get_json)
+        self.client._get_json = get_json  # type: ignore
+        self.listed = [make_tab("a", 1), make_tab("maps", 2, [make_tab("m1", 2)])]
+        return super().setUp()
+
+    async def get_json(
+        self,
+        path: str,
+        path_format_args: List[str],
+        **kwargs: object,
+    ) -> Raw:
+        """Serve stash tabs by path."""
+        if path == "stash/{0}":
+            return {"stashes": self.listed}
+        if path == "stash/{0}/{1}":
+            tab = next(tab for tab in self.listed if tab["id"] == path_format_args[1])
+            return {"stash": dict(tab, items=[])}
+        return {"stash": make_tab(path_format_args[2], 2)}
+
+    async def test_get_stash(self):
+        """Tests that stash paths are left generic for policy lookup."""
+        await self.client.get_stash("Standard", "maps", "m1")
+
+        call = self.client._get_json.call_args  # type: ignore
+        assert call.kwargs["path"] == "stash/{0}/{1}/{2}"
+        assert call.kwargs["path_format_args"] == ["Standard", "maps", "m1"]
+
+    async def test_snapshot(self):
+        """Tests that every tab and sub-tab is fetched."""
+        snapshot = await self.client.snapshot_stashes("Standard")
+
+        assert [tab.id for tab in snapshot] == ["a", "maps"]
+        assert snapshot[0].items == []
+        assert [child.id for child in snapshot[1].children or []] == ["m1"]
+        assert self.client._get_json.call_count == 4  # type: ignore
+
+    async def test_snapshot_unchanged(self):
+        """Tests that unchanged tabs are reused from the previous snapshot."""
+        previous = await self.client.snapshot_stashes("Standard")
+        self.client._get_json.reset_mock()  # type: ignore
+        self.listed[0] = make_tab("a", 5)
+
+        snapshot = await self.client.snapshot_stashes("Standard", previous=previous)
+
+        assert snapshot[1] is previous[1]
+        assert snapshot[0] is not previous[0]
+        assert self.client._get_json.call_count == 2  # type: ignore
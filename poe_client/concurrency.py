@@ -0,0 +1,145 @@
+"""Adaptive limit on the number of requests in flight."""
+
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Optional
+
+# Weight of a new latency sample in the baseline latency, when it's higher than
+# the baseline. Lower samples replace the baseline right away.
+_BASELINE_WEIGHT = 0.05
+
+
+class AdaptiveConcurrency(object):
+    """Additive increase, multiplicative decrease (AIMD) limit on requests in flight.
+
+    The limit grows by one after every limit successful requests, as long as their
+    latency stays within latency_tolerance times the baseline latency and the rate
+    limit policies have headroom for more requests than are in flight. It's cut by
+    backoff on a 429, when a policy runs out of headroom, or when latency rises
+    past the tolerance, which is also what happens when the rate limiter starts
+    making requests wait.
+    """
+
+    min_limit: int
+    max_limit: int
+    backoff: float
+    latency_tolerance: float
+    in_flight: int
+    baseline: Optional[float]
+
+    _limit: float
+    _successes: int
+    _since_decrease: int
+    _waiters: "Deque[asyncio.Future[None]]"
+
+    def __init__(  # noqa: WPS211
+        self,
+        initial: int = 5,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        backoff: float = 0.5,
+        latency_tolerance: float = 2,
+    ) -> None:
+        """Initialize a new limit.
+
+        Args:
+            initial: Requests allowed in flight to start with.
+            min_limit: The limit never goes below this.
+            max_limit: The limit never goes above this.
+            backoff: The limit is multiplied by this when cutting back.
+            latency_tolerance: Latency above this many times the baseline latency
+                counts as congestion.
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self.baseline = None
+        self._limit = initial
+        self._successes = 0
+        self._since_decrease = initial
+        self._waiters = deque()
+
+    @property
+    def limit(self) -> int:
+        """Requests currently allowed in flight."""
+        return int(self._limit)
+
+    async def acquire(self) -> None:
+        """Wait until another request is allowed in flight."""
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            return
+
+        waiter = asyncio.get_event_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                self._waiters.remove(waiter)
+            raise
+
+    def release(self) -> None:
+        """Mark a request as done, letting waiting requests in if there's room."""
+        self.in_flight -= 1
+        self._wake()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold a place in flight for the duration of the context."""
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def on_success(self, latency: float, headroom: Optional[int] = None) -> None:
+        """Adapt the limit to a successful request.
+
+        Args:
+            latency: Seconds the request took.
+            headroom: Requests the policies of the request still allow, if known.
+        """
+        self._since_decrease += 1
+        if self.baseline is None or latency < self.baseline:
+            self.baseline = latency
+        else:
+            self.baseline += (latency - self.baseline) * _BASELINE_WEIGHT
+
+        if headroom == 0 or latency > self.baseline * self.latency_tolerance:
+            self._decrease()
+            return
+        if headroom is not None and headroom <= self.in_flight:
+            # Hold: more requests in flight would only wait on the limiter.
+            return
+
+        self._successes += 1
+        if self._successes >= self.limit:
+            self._successes = 0
+            self._limit = min(self._limit + 1, self.max_limit)
+            self._wake()
+
+    def on_throttled(self) -> None:
+        """Cut the limit back after a 429."""
+        self._decrease()
+
+    def _decrease(self) -> None:
+        # Requests already in flight when the limit was cut see the same
+        # congestion, so only cut once per limit's worth of completed requests.
+        if self._since_decrease < self.limit:
+            return
+        self._since_decrease = 0
+        self._successes = 0
+        self._limit = max(self._limit * self.backoff, self.min_limit)
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
@@ -0,0 +1,109 @@
+import asyncio
+from unittest import IsolatedAsyncioTestCase
+
+import aiohttp
+import pytest
+
+from poe_client.client import PoEClient
+from poe_client.concurrency import AdaptiveConcurrency
+from poe_client.mockserver import MockData, MockServer, Policy, Rule
+
+
+class AdaptiveConcurrencyTest(IsolatedAsyncioTestCase):
+    """Tests the adaptive concurrency limit."""
+
+    def test_increase(self):
+        """Tests that the limit grows by one per limit successes."""
+        concurrency = AdaptiveConcurrency(initial=2)
+        for _ in range(2):
+            concurrency.on_success(0.1)
+        assert concurrency.limit == 3
+
+        for _ in range(2):
+            concurrency.on_success(0.1)
+        assert concurrency.limit == 3
+        concurrency.on_success(0.1)
+        assert concurrency.limit == 4
+
+    def test_headroom(self):
+        """Tests holding when there's little headroom, and cutting at none."""
+        concurrency = AdaptiveConcurrency(initial=4)
+        concurrency.in_flight = 3
+        for _ in range(8):
+            concurrency.on_success(0.1, headroom=3)
+        assert concurrency.limit == 4
+
+        concurrency.on_success(0.1, headroom=0)
+        assert concurrency.limit == 2
+
+    def test_decrease(self):
+        """Tests cutting back on 429s and latency, once per limit requests."""
+        concurrency = AdaptiveConcurrency(initial=8, min_limit=2)
+        concurrency.on_throttled()
+        assert concurrency.limit == 4
+        concurrency.on_throttled()
+        assert concurrency.limit == 4
+
+        for _ in range(4):
+            concurrency.on_success(0.1)
+        concurrency.on_success(0.5)
+        assert concurrency.limit == 2
+        assert concurrency.baseline == pytest.approx(0.12)
+
+    async def test_waiters(self):
+        """Tests that requests over the limit wait, and cancelled ones leave."""
+        concurrency = AdaptiveConcurrency(initial=1)
+        await concurrency.acquire()
+        waiting = asyncio.ensure_future(concurrency.acquire())
+        cancelled = asyncio.ensure_future(concurrency.acquire())
+        await asyncio.sleep(0)
+        assert not waiting.done()
+
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        concurrency.release()
+        await asyncio.wait_for(waiting, timeout=1)
+        assert concurrency.in_flight == 1
+        assert not concurrency._waiters  # noqa: WPS437
+
+    async def test_client(self):
+        """Tests that the client adapts to successes and 429s."""
+        server = MockServer(
+            data=MockData(ladder_size=10, stash_tabs=1),
+            policies={
+                "character": Policy(
+                    "character-request-limit",
+                    (Rule.parse("Account", "1000:60:60"),),
+                ),
+            },
+        )
+        url = str(await server.start())
+        concurrency = AdaptiveConcurrency(initial=2, latency_tolerance=100)
+        try:
+            client = PoEClient(
+                "test user agent",
+                "token",
+                base_url=url,
+                concurrency=concurrency,
+            )
+            async with client:
+                await asyncio.gather(*(client.get_characters() for _ in range(10)))
+                assert concurrency.limit > 2
+                assert concurrency.in_flight == 0
+
+                limit = concurrency.limit
+                server.policies["character"] = Policy(
+                    "character-request-limit",
+                    (Rule.parse("Account", "1:60:60"),),
+                )
+                # Use up the new limit, so the client's request gets a 429.
+                async with aiohttp.ClientSession() as session:
+                    await session.get(
+                        "{0}/character/mock_character_0".format(url),
+                        headers={"Authorization": "Bearer token"},
+                    )
+                with pytest.raises(aiohttp.ClientResponseError):
+                    await client.get_character("mock_character_0")
+                assert concurrency.limit < limit
+        finally:
+            await server.stop()
@@ -0,0 +1,79 @@
+"""Builders of models and raw API payloads shared by the tests, for pytest only."""
+
+from typing import Dict, List, Optional
+
+from poe_client.schemas import Raw
+from poe_client.schemas.stash import Item
+
+
+def make_item(**kwargs: object) -> Item:
+    """Build an item with only the required fields set, unless overridden."""
+    fields: Raw = {
+        "verified": False,
+        "w": 1,
+        "h": 1,
+        "icon": "icon.png",
+        "name": "",
+        "type_line": "Ruby Ring",
+        "base_type": "Ruby Ring",
+        "identified": True,
+        "ilvl": 84,
+    }
+    fields.update(kwargs)
+    return Item.parse_obj(fields)
+
+
+def raw_item(item_id: str, note: str = "") -> Raw:
+    """Build a raw item, as found in a river page."""
+    return {
+        "verified": False,
+        "w": 1,
+        "h": 1,
+        "icon": "icon.png",
+        "id": item_id,
+        "name": "",
+        "typeLine": "Ruby Ring",
+        "baseType": "Ruby Ring",
+        "identified": True,
+        "ilvl": 84,
+        "note": note,
+    }
+
+
+def raw_change(stash_id: str, items: List[Raw]) -> Raw:
+    """Build a raw stash change, as found in a river page."""
+    return {
+        "id": stash_id,
+        "public": True,
+        "stashType": "PremiumStash",
+        "league": "Standard",
+        "items": items,
+    }
+
+
+def make_tab(
+    tab_id: str,
+    items: int = 0,
+    children: Optional[List[Raw]] = None,
+    **metadata: object,
+) -> Raw:
+    """Build a raw stash tab, with extra metadata fields from keyword args."""
+    tab: Raw = {
+        "id": tab_id,
+        "name": tab_id,
+        "type": "PremiumStash",
+        "metadata": dict(metadata, items=items),
+    }
+    if children is not None:
+        tab["children"] = children
+    return tab
+
+
+def make_headers(state: str = "1:10:0,1:300:0") -> Dict[str, str]:
+    """Build rate limit headers for a policy with two windows."""
+    return {
+        "X-Rate-Limit-Policy": "character-request-limit",
+        "X-Rate-Limit-Rules": "Account",
+        "X-Rate-Limit-Account": "5:10:60,30:300:300",
+        "X-Rate-Limit-Account-State": state,
+    }
@@ -0,0 +1,165 @@
+"""Item level deltas between successive public stash snapshots.
+
+The river sends the full contents of a stash every time anything in it changes.
+The StashDiffer remembers a fingerprint of every item it has seen, and turns each
+raw stash change into added, removed and modified item events. Items whose
+fingerprint didn't change are skipped before an Item model is ever built.
+"""
+
+import hashlib
+import json
+import shelve
+from collections import OrderedDict
+from enum import Enum
+from typing import Dict, List, NamedTuple, Optional, cast
+
+from poe_client.schemas import Raw
+from poe_client.schemas.stash import Item
+
+# item key -> content fingerprint, for all items of a single stash.
+Fingerprints = Dict[str, int]
+
+
+class ItemEventType(Enum):
+    """Enum to describe how an item changed between snapshots."""
+
+    added = "added"
+    removed = "removed"
+    modified = "modified"
+
+
+class ItemEvent(NamedTuple):
+    """A change to a single item of a stash."""
+
+    type: ItemEventType
+    stash_id: str
+    item_id: str
+    item: Optional[Item]  # noqa: WPS110
+
+
+def fingerprint(raw_item: Raw) -> int:  # noqa: WPS110
+    """Hash the content of a raw item into a 64 bit fingerprint."""
+    encoded = json.dumps(raw_item, sort_keys=True, separators=(",", ":"))
+    digest = hashlib.blake2b(encoded.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+class FingerprintStore(object):
+    """Memory bounded store of the item fingerprints of each stash.
+
+    At most max_stashes stashes are kept in memory. When more are stored, the
+    least recently used stash is evicted: it's written to the spill file if one is
+    configured, and forgotten otherwise. A forgotten stash reports all its items as
+    added the next time it changes.
+    """
+
+    max_stashes: int
+    _stashes: "OrderedDict[str, Fingerprints]"
+    _spill: Optional[shelve.Shelf]  # type: ignore
+
+    def __init__(self, max_stashes: int = 100000, spill_path: Optional[str] = None):
+        """Initialize a new store.
+
+        Args:
+            max_stashes: Maximum number of stashes kept in memory.
+            spill_path: If set, evicted stashes are written to a shelve database at
+                this path instead of being forgotten.
+        """
+        self.max_stashes = max_stashes
+        self._stashes = OrderedDict()
+        self._spill = shelve.open(spill_path) if spill_path else None  # noqa: S301
+
+    def __len__(self) -> int:
+        """Number of stashes held in memory."""
+        return len(self._stashes)
+
+    def get(self, stash_id: str) -> Fingerprints:
+        """Get the fingerprints of a stash, or an empty dict if it's unknown."""
+        fingerprints = self._stashes.get(stash_id)
+        if fingerprints is not None:
+            self._stashes.move_to_end(stash_id)
+            return fingerprints
+        if self._spill is not None and stash_id in self._spill:
+            return self._spill[stash_id]
+        return {}
+
+    def put(self, stash_id: str, fingerprints: Fingerprints) -> None:
+        """Store the fingerprints of a stash. Empty stashes are removed."""
+        if self._spill is not None and stash_id in self._spill:
+            del self._spill[stash_id]  # noqa: WPS420
+        if not fingerprints:
+            self._stashes.pop(stash_id, None)
+            return
+
+        self._stashes[stash_id] = fingerprints
+        self._stashes.move_to_end(stash_id)
+        while len(self._stashes) > self.max_stashes:
+            evicted_id, evicted = self._stashes.popitem(last=False)
+            if self._spill is not None:
+                self._spill[evicted_id] = evicted
+
+    def close(self) -> None:
+        """Close the spill file, if any."""
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+
+
+class StashDiffer(object):
+    """Computes item events from raw public stash changes."""
+
+    store: FingerprintStore
+
+    def __init__(self, store: Optional[FingerprintStore] = None) -> None:
+        """Initialize a new differ.
+
+        Args:
+            store: Where fingerprints are remembered. Uses an in memory store with
+                default bounds if unset.
+        """
+        self.store = store if store is not None else FingerprintStore()
+
+    def diff_page(self, page: Raw) -> List[ItemEvent]:
+        """Diff every stash of a raw river page, as returned by the client."""
+        events = []
+        for change in cast(List[Raw], page["stashes"]):
+            events.extend(self.diff(change))
+        return events
+
+    def diff(self, change: Raw) -> List[ItemEvent]:
+        """Diff a single raw stash change against the stored snapshot.
+
+        Args:
+            change: A stash from the "stashes" field of a raw river page.
+
+        Returns:
+            The item events, with the items built as models. Removed events don't
+            carry an item.
+        """
+        stash_id = str(change["id"])
+        previous = self.store.get(stash_id)
+        current: Fingerprints = {}
+        events = []
+
+        raw_items = cast(Optional[List[Raw]], change.get("items")) or []
+        for position, raw_item in enumerate(raw_items):
+            key = str(raw_item.get("id") or "{0}/{1}".format(stash_id, position))
+            item_fingerprint = fingerprint(raw_item)
+            current[key] = item_fingerprint
+
+            previous_fingerprint = previous.get(key)
+            if previous_fingerprint == item_fingerprint:
+                continue
+            event_type = ItemEventType.added
+            if previous_fingerprint is not None:
+                event_type = ItemEventType.modified
+            events.append(
+                ItemEvent(event_type, stash_id, key, Item.parse_obj(raw_item)),
+            )
+
+        for key in previous:
+            if key not in current:
+                events.append(ItemEvent(ItemEventType.removed, stash_id, key, None))
+
+        self.store.put(stash_id, current)
+        return events
@@ -0,0 +1,69 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from poe_client.conftest import raw_change, raw_item
+from poe_client.delta import FingerprintStore, ItemEventType, StashDiffer
+
+
+class StashDifferTest(TestCase):
+    """Tests the stash differ."""
+
+    def test_events(self):
+        """Only added, modified and removed items produce events."""
+        differ = StashDiffer()
+        first = differ.diff_page(
+            {
+                "nextChangeId": "1",
+                "stashes": [raw_change("a", [raw_item("x"), raw_item("y")])],
+            },
+        )
+        assert [(event.type, event.item_id) for event in first] == [
+            (ItemEventType.added, "x"),
+            (ItemEventType.added, "y"),
+        ]
+        assert first[0].item.base_type == "Ruby Ring"  # type: ignore
+
+        second = differ.diff(
+            raw_change(
+                "a", [raw_item("x"), raw_item("y", "~b/o 1 chaos"), raw_item("z")]
+            ),
+        )
+        assert [(event.type, event.item_id) for event in second] == [
+            (ItemEventType.modified, "y"),
+            (ItemEventType.added, "z"),
+        ]
+
+        third = differ.diff(raw_change("a", [raw_item("z")]))
+        assert [(event.type, event.item_id) for event in third] == [
+            (ItemEventType.removed, "x"),
+            (ItemEventType.removed, "y"),
+        ]
+        assert third[0].item is None
+
+        differ.diff(raw_change("a", []))
+        assert len(differ.store) == 0
+
+    def test_forgotten_stash(self):
+        """Evicted stashes report their items as added again."""
+        differ = StashDiffer(FingerprintStore(max_stashes=1))
+        differ.diff(raw_change("a", [raw_item("x")]))
+        differ.diff(raw_change("b", [raw_item("y")]))
+
+        events = differ.diff(raw_change("a", [raw_item("x")]))
+        assert [event.type for event in events] == [ItemEventType.added]
+
+    def test_spill(self):
+        """Evicted stashes are kept in the spill file when one is configured."""
+        with tempfile.TemporaryDirectory() as directory:
+            store = FingerprintStore(
+                max_stashes=1,
+                spill_path=os.path.join(directory, "fingerprints"),
+            )
+            differ = StashDiffer(store)
+            differ.diff(raw_change("a", [raw_item("x")]))
+            differ.diff(raw_change("b", [raw_item("y")]))
+
+            assert len(store) == 1
+            assert differ.diff(raw_change("a", [raw_item("x")])) == []
+            store.close()
@@ -0,0 +1,90 @@
+"""Structured events from the client and the rate limiter.
+
+Code on the request path emits events instead of debug logging. Call sites check
+`bus.active` before building an event, so when nothing is subscribed an event
+costs one attribute lookup, with no formatting or allocation:
+
+    if bus.active:
+        bus.emit("limiter.acquire", policy=policy_name)
+
+Subscribe with `bus.subscribe`, or call `log_events` to log every event, which is
+what the debug logging used to show.
+"""
+
+import logging
+from typing import Callable, Dict, List, Optional
+
+Subscriber = Callable[[str, Dict[str, object]], None]
+
+# Subscribers under this name receive every event.
+ALL = "*"
+
+
+class EventBus(object):
+    """Dispatches named events to their subscribers."""
+
+    active: bool
+    _subscribers: Dict[str, List[Subscriber]]
+
+    def __init__(self) -> None:
+        """Initialize a bus with no subscribers."""
+        self.active = False
+        self._subscribers = {}
+
+    def subscribe(self, subscriber: Subscriber, name: str = ALL) -> None:
+        """Call subscriber with the name and fields of events.
+
+        Args:
+            subscriber: Called with the event name and a dict of its fields.
+            name: Only pass events with this name. Defaults to every event.
+        """
+        self._subscribers.setdefault(name, []).append(subscriber)
+        self.active = True
+
+    def unsubscribe(self, subscriber: Subscriber, name: str = ALL) -> None:
+        """Stop calling a subscriber."""
+        subscribers = self._subscribers.get(name, [])
+        if subscriber in subscribers:
+            subscribers.remove(subscriber)
+        if not subscribers:
+            self._subscribers.pop(name, None)
+        self.active = bool(self._subscribers)
+
+    def emit(self, name: str, **fields: object) -> None:
+        """Pass an event to its subscribers. Check active before calling this."""
+        for subscriber in self._subscribers.get(name, ()):
+            subscriber(name, fields)
+        for catch_all in self._subscribers.get(ALL, ()):
+            catch_all(name, fields)
+
+
+# The bus of the client and the rate limiter.
+bus = EventBus()
+
+
+def log_events(
+    logger: Optional[logging.Logger] = None,
+    level: int = logging.DEBUG,
+) -> Subscriber:
+    """Log every event, like the debug logging of previous versions.
+
+    Args:
+        logger: Logger to log to. Defaults to the poe_client logger.
+        level: Level to log events at.
+
+    Returns:
+        The subscriber, to pass to bus.unsubscribe to stop logging.
+    """
+    target = logger or logging.getLogger("poe_client")
+
+    def log(name: str, fields: Dict[str, object]) -> None:  # noqa: WPS430
+        if target.isEnabledFor(level):
+            target.log(
+                level,
+                "%s %s",
+                name,
+                " ".join("{0}={1}".format(key, value) for key, value in fields.items()),
+            )
+
+    bus.subscribe(log)
+    return log
@@ -0,0 +1,64 @@
+import logging
+from typing import Dict, List
+from unittest import IsolatedAsyncioTestCase
+
+from poe_client.conftest import make_headers
+from poe_client.events import EventBus, bus, log_events
+from poe_client.rate_limiter import RateLimiter
+
+
+class EventBusTest(IsolatedAsyncioTestCase):
+    """Tests the event bus."""
+
+    def test_subscribe(self):
+        """Tests that events reach subscribers of their name or of every event."""
+        assert not EventBus().active
+        events = EventBus()
+        seen: List[Dict[str, object]] = []
+        every: List[str] = []
+
+        events.subscribe(lambda name, fields: seen.append(fields), "wanted")
+        events.subscribe(lambda name, fields: every.append(name))
+        assert events.active
+
+        events.emit("wanted", hits=1)
+        events.emit("other")
+        assert seen == [{"hits": 1}]
+        assert every == ["wanted", "other"]
+
+    def test_unsubscribe(self):
+        """Tests that the bus is inactive once the last subscriber leaves."""
+        events = EventBus()
+        seen: List[str] = []
+
+        def subscriber(name: str, fields: Dict[str, object]) -> None:  # noqa: WPS430
+            seen.append(name)
+
+        events.subscribe(subscriber)
+        events.unsubscribe(subscriber)
+
+        assert not events.active
+        events.emit("anything")
+        assert not seen
+
+    async def test_limiter_events(self):
+        """Tests the events of the rate limiter, logged like debug logs were."""
+        subscriber = log_events()
+        try:
+            with self.assertLogs("poe_client", logging.DEBUG) as logs:
+                limiter = RateLimiter()
+                await limiter.get_semaphore("")
+                await limiter.parse_headers(make_headers())
+                await limiter.get_semaphore("character-request-limit")
+        finally:
+            bus.unsubscribe(subscriber)
+
+        assert not bus.active
+        assert logs.output[0] == "DEBUG:poe_client:limiter.blocking policy="
+        assert (
+            "DEBUG:poe_client:limiter.acquire policy=character-request-limit/Account"
+            in logs.output
+        )
+        assert "DEBUG:poe_client:policy.update policy=5:10:60 hits=2 restriction=0" in (
+            logs.output
+        )
@@ -0,0 +1,208 @@
+"""In-memory item index over the public stash river.
+
+Every PublicStashChange carries the full contents of a stash, so applying a change
+replaces whatever the index held for that stash. Only the items of the changed
+stash are touched, which keeps updates proportional to the size of the change.
+"""
+
+from collections import defaultdict
+from typing import (
+    DefaultDict,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    TypeVar,
+)
+
+from poe_client.mods import ModParser
+from poe_client.schemas.stash import Item, PublicStash, PublicStashChange
+
+Value = TypeVar("Value")  # an indexed value, like a league or a template id
+
+
+class _Entry(NamedTuple):
+    item: Item  # noqa: WPS110
+    stash_id: str
+    league: Optional[str]
+    account_name: Optional[str]
+    template_ids: FrozenSet[int]
+
+
+class ItemIndex(object):
+    """Holds the items currently listed in public stashes.
+
+    Items are indexed by league, base type, account name and mod template id.
+    Template ids come from the ModParser, which parses implicit, explicit, crafted
+    and fractured mods.
+    """
+
+    _parser: ModParser
+    _entries: Dict[str, _Entry]
+    _stash_keys: Dict[str, List[str]]
+    _by_league: DefaultDict[str, Set[str]]
+    _by_base_type: DefaultDict[str, Set[str]]
+    _by_account: DefaultDict[str, Set[str]]
+    _by_template: DefaultDict[int, Set[str]]
+
+    def __init__(self, mod_parser: Optional[ModParser] = None) -> None:
+        """Initialize an empty index.
+
+        Args:
+            mod_parser: Parser used to index items by mod template. A new one is
+                created if unset.
+        """
+        self._parser = mod_parser or ModParser()
+        self._entries = {}
+        self._stash_keys = {}
+        self._by_league = defaultdict(set)
+        self._by_base_type = defaultdict(set)
+        self._by_account = defaultdict(set)
+        self._by_template = defaultdict(set)
+
+    def __len__(self) -> int:
+        """Number of live items in the index."""
+        return len(self._entries)
+
+    @property
+    def mod_parser(self) -> ModParser:
+        """The parser used to look up mod template ids."""
+        return self._parser
+
+    def apply(self, page: PublicStash) -> None:
+        """Apply every stash change of a river page, in order."""
+        for change in page.stashes:
+            self.apply_change(change)
+
+    def apply_change(self, change: PublicStashChange) -> None:
+        """Replace the contents of a single stash."""
+        self.remove_stash(change.id)
+        if not change.items:
+            return
+
+        keys = []
+        for position, item in enumerate(change.items):
+            key = item.id or "{0}/{1}".format(change.id, position)
+            self._add(key, change, item)
+            keys.append(key)
+        self._stash_keys[change.id] = keys
+
+    def remove_stash(self, stash_id: str) -> None:
+        """Remove every item of a stash from the index."""
+        for key in self._stash_keys.pop(stash_id, ()):
+            entry = self._entries.get(key)
+            # Items which moved to another stash since belong to that stash now.
+            if entry is not None and entry.stash_id == stash_id:
+                self._remove(key, entry)
+
+    def get(self, item_id: str) -> Optional[Item]:
+        """Get a live item by id."""
+        entry = self._entries.get(item_id)
+        return entry.item if entry else None
+
+    def stash_items(self, stash_id: str) -> List[Item]:
+        """Get the live items of a stash."""
+        items = []
+        for key in self._stash_keys.get(stash_id, ()):
+            entry = self._entries.get(key)
+            if entry is not None and entry.stash_id == stash_id:
+                items.append(entry.item)
+        return items
+
+    def query(  # noqa: WPS211
+        self,
+        league: Optional[str] = None,
+        base_type: Optional[str] = None,
+        account_name: Optional[str] = None,
+        mod_templates: Iterable[int] = (),
+        limit: Optional[int] = None,
+    ) -> List[Item]:
+        """Find the items matching every given filter.
+
+        Args:
+            league: Only return items in this league.
+            base_type: Only return items with this base type.
+            account_name: Only return items listed by this account.
+            mod_templates: Only return items having a mod of each of these
+                template ids. See ModParser.template_id.
+            limit: Maximum number of items to return.
+
+        Returns:
+            The matching items, in no particular order.
+        """
+        candidates = []
+        if league is not None:
+            candidates.append(self._by_league.get(league, set()))
+        if base_type is not None:
+            candidates.append(self._by_base_type.get(base_type, set()))
+        if account_name is not None:
+            candidates.append(self._by_account.get(account_name, set()))
+        for template_id in mod_templates:
+            candidates.append(self._by_template.get(template_id, set()))
+
+        keys: Iterable[str]
+        if candidates:
+            # Walk the smallest set and probe the rest, so the cost doesn't depend
+            # on how large the broadest filter is.
+            candidates.sort(key=len)
+            smallest, *others = candidates
+            keys = (key for key in smallest if all(key in other for other in others))
+        else:
+            keys = self._entries.keys()
+
+        items: List[Item] = []
+        for key in keys:
+            if limit is not None and len(items) >= limit:
+                break
+            items.append(self._entries[key].item)
+        return items
+
+    def _add(self, key: str, change: PublicStashChange, item: Item) -> None:
+        previous = self._entries.get(key)
+        if previous is not None:
+            self._remove(key, previous)
+
+        template_ids = frozenset(
+            mod.template_id
+            for mods in self._parser.parse_item(item)
+            for mod in mods  # noqa: WPS361
+        )
+        entry = _Entry(
+            item=item,
+            stash_id=change.id,
+            league=item.league or change.league,
+            account_name=change.account_name,
+            template_ids=template_ids,
+        )
+        self._entries[key] = entry
+
+        if entry.league is not None:
+            self._by_league[entry.league].add(key)
+        self._by_base_type[item.base_type].add(key)
+        if entry.account_name is not None:
+            self._by_account[entry.account_name].add(key)
+        for template_id in template_ids:
+            self._by_template[template_id].add(key)
+
+    def _remove(self, key: str, entry: _Entry) -> None:
+        del self._entries[key]  # noqa: WPS420
+
+        if entry.league is not None:
+            _discard(self._by_league, entry.league, key)
+        _discard(self._by_base_type, entry.item.base_type, key)
+        if entry.account_name is not None:
+            _discard(self._by_account, entry.account_name, key)
+        for template_id in entry.template_ids:
+            _discard(self._by_template, template_id, key)
+
+
+def _discard(index: Dict[Value, Set[str]], value: Value, key: str) -> None:
+    keys = index.get(value)
+    if keys is None:
+        return
+    keys.discard(key)
+    if not keys:
+        del index[value]  # noqa: WPS420
@@ -0,0 +1,107 @@
+from typing import List, Optional
+from unittest import TestCase
+
+from poe_client.conftest import make_item
+from poe_client.index import ItemIndex
+from poe_client.schemas.stash import Item, PublicStash, PublicStashChange
+
+
+def make_change(
+    stash_id: str,
+    items: List[Item],
+    account_name: Optional[str] = "moowiz",
+) -> PublicStashChange:
+    """Build a public stash change for the index."""
+    return PublicStashChange(
+        id=stash_id,
+        public=True,
+        account_name=account_name,
+        last_character_name=None,
+        stash=None,
+        stash_type="PremiumStash",
+        league="Standard",
+        items=items,
+    )
+
+
+class ItemIndexTest(TestCase):
+    """Tests the item index."""
+
+    def setUp(self) -> None:
+        """Sets up the test."""
+        self.index = ItemIndex()
+        self.index.apply(
+            PublicStash(
+                next_change_id="1",
+                stashes=[
+                    make_change(
+                        "a",
+                        [
+                            make_item(id="ring", explicit_mods=["+70 to maximum Life"]),
+                            make_item(id="amulet", base_type="Onyx Amulet"),
+                        ],
+                    ),
+                    make_change(
+                        "b",
+                        [make_item(id="other", base_type="Onyx Amulet")],
+                        account_name="bittermandel",
+                    ),
+                ],
+            ),
+        )
+        return super().setUp()
+
+    def test_query(self):
+        """Queries intersect every given filter."""
+        life = self.index.mod_parser.template_id("# to maximum Life")
+        assert life is not None
+
+        assert len(self.index) == 3
+        assert {item.id for item in self.index.query(base_type="Onyx Amulet")} == {
+            "amulet",
+            "other",
+        }
+        assert [
+            item.id
+            for item in self.index.query(
+                base_type="Onyx Amulet",
+                account_name="bittermandel",
+            )
+        ] == ["other"]
+        assert [item.id for item in self.index.query(mod_templates=[life])] == [
+            "ring",
+        ]
+        assert self.index.query(league="Hardcore") == []
+        assert len(self.index.query(league="Standard", limit=2)) == 2
+
+    def test_replace_stash(self):
+        """Applying a change replaces only the items of that stash."""
+        self.index.apply_change(make_change("a", [make_item(id="new")]))
+
+        assert self.index.get("ring") is None
+        assert [item.id for item in self.index.stash_items("a")] == ["new"]
+        assert [item.id for item in self.index.query(base_type="Onyx Amulet")] == [
+            "other",
+        ]
+
+    def test_empty_stash(self):
+        """Changes without items empty the stash."""
+        self.index.apply_change(make_change("b", []))
+
+        assert self.index.stash_items("b") == []
+        assert self.index.query(account_name="bittermandel") == []
+
+    def test_item_moved(self):
+        """Items which moved stash aren't removed when the old stash changes."""
+        self.index.apply_change(make_change("b", [make_item(id="ring")]))
+        self.index.apply_change(make_change("a", []))
+
+        assert [item.id for item in self.index.stash_items("b")] == ["ring"]
+        assert len(self.index) == 1
+
+    def test_items_without_id(self):
+        """Items without an id are keyed by their position in the stash."""
+        self.index.apply_change(make_change("c", [make_item(), make_item()]))
+
+        assert len(self.index.stash_items("c")) == 2
+        assert len(self.index.query()) == 5
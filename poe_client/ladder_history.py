@@ -0,0 +1,280 @@
+"""Compact history of ladder snapshots.
+
+Each snapshot only keeps (rank, level, experience, dead, retired) per character, in
+typed arrays indexed by a slot assigned to each character id. Snapshots are stored
+as deltas against the previous snapshot, with a full keyframe every few snapshots
+so that rebuilding any snapshot only applies a bounded number of deltas.
+
+Arrays from the array module support the buffer protocol, so LadderState columns
+can be handed to NumPy without copying if it's available.
+"""
+
+from array import array
+from bisect import bisect_right
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, cast
+
+from poe_client.schemas import Raw
+from poe_client.schemas.league import Ladder
+
+_DEAD = 1
+_RETIRED = 2
+
+# (character id, rank, level, experience, flags)
+_Row = Tuple[str, int, int, int, int]
+
+
+class LadderState(NamedTuple):
+    """Columns of a single snapshot, indexed by character slot.
+
+    A rank of 0 means the character wasn't on the ladder in that snapshot.
+    """
+
+    rank: "array[int]"
+    level: "array[int]"
+    experience: "array[int]"
+    flags: "array[int]"
+
+
+class _Delta(NamedTuple):
+    slots: "array[int]"
+    state: LadderState
+
+
+def _empty_state(size: int = 0) -> LadderState:
+    return LadderState(
+        rank=array("l", bytes(size * array("l").itemsize)),
+        level=array("H", bytes(size * array("H").itemsize)),
+        experience=array("q", bytes(size * array("q").itemsize)),
+        flags=array("B", bytes(size)),
+    )
+
+
+def _copy_state(state: LadderState) -> LadderState:
+    return LadderState(*(array(column.typecode, column) for column in state))
+
+
+def _raw_row(entry: Raw) -> _Row:
+    character = cast(Raw, entry["character"])
+    return (
+        str(character["id"]),
+        cast(int, entry["rank"]),
+        cast(int, character["level"]),
+        cast(int, character.get("experience") or 0),
+        (_DEAD if entry.get("dead") else 0) | (_RETIRED if entry.get("retired") else 0),
+    )
+
+
+def _grow(state: LadderState, size: int) -> None:
+    missing = size - len(state.rank)
+    if missing > 0:
+        for column in state:
+            column.extend(array(column.typecode, bytes(missing * column.itemsize)))
+
+
+class LadderHistory(object):
+    """Snapshots of a ladder over time, keyed by character id."""
+
+    keyframe_interval: int
+    _slots: Dict[str, int]
+    _character_ids: List[str]
+    _times: List[datetime]
+    _keyframes: List[LadderState]
+    _deltas: List[Optional[_Delta]]
+    _latest: LadderState
+
+    def __init__(self, keyframe_interval: int = 32) -> None:
+        """Initialize an empty history.
+
+        Args:
+            keyframe_interval: Every this many snapshots, a full copy is stored
+                instead of a delta.
+        """
+        self.keyframe_interval = keyframe_interval
+        self._slots = {}
+        self._character_ids = []
+        self._times = []
+        self._keyframes = []
+        self._deltas = []
+        self._latest = _empty_state()
+
+    def __len__(self) -> int:
+        """Number of snapshots."""
+        return len(self._times)
+
+    @property
+    def times(self) -> List[datetime]:
+        """When each snapshot was taken."""
+        return list(self._times)
+
+    @property
+    def character_ids(self) -> List[str]:
+        """Character ids, where the position is the character slot."""
+        return list(self._character_ids)
+
+    def add(self, ladder: Ladder, taken_at: Optional[datetime] = None) -> None:
+        """Add a snapshot from a ladder model.
+
+        Args:
+            ladder: The ladder. It may be a single page or a whole ladder.
+            taken_at: When the snapshot was taken. Defaults to the ladder's
+                cached_since, or now if that's unset.
+        """
+        rows = (
+            (
+                entry.character.id,
+                entry.rank,
+                entry.character.level,
+                entry.character.experience or 0,
+                (_DEAD if entry.dead else 0) | (_RETIRED if entry.retired else 0),
+            )
+            for entry in ladder.entries
+        )
+        self._add_rows(rows, taken_at or ladder.cached_since or datetime.now())
+
+    def add_raw(self, ladder: Raw, taken_at: datetime) -> None:
+        """Add a snapshot from a raw ladder, without building any model."""
+        rows = (_raw_row(entry) for entry in cast(List[Raw], ladder["entries"]))
+        self._add_rows(rows, taken_at)
+
+    def state(self, index: int) -> LadderState:
+        """Rebuild the columns of a snapshot. Negative indexes count from the end.
+
+        The columns are a copy, which can be modified without changing the history.
+        """
+        if index < 0:
+            index += len(self._times)
+        if not 0 <= index < len(self._times):
+            raise IndexError(index)
+        if index == len(self._times) - 1:
+            return _copy_state(self._latest)
+
+        keyframe = index // self.keyframe_interval
+        state = _copy_state(self._keyframes[keyframe])
+        _grow(state, len(self._character_ids))
+        for delta in self._deltas[keyframe * self.keyframe_interval + 1 : index + 1]:
+            if delta is None:
+                continue
+            for column, changed in zip(state, delta.state):
+                for position, slot in enumerate(delta.slots):
+                    column[slot] = changed[position]
+        return state
+
+    def index_at(self, when: datetime) -> int:
+        """Get the index of the latest snapshot taken at or before a time."""
+        index = bisect_right(self._times, when) - 1
+        if index < 0:
+            raise IndexError("No snapshot at or before {0}".format(when))
+        return index
+
+    def xp_per_hour(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Dict[str, float]:
+        """Experience gained per hour between two snapshots.
+
+        Only characters on the ladder in both snapshots are included. Unset bounds
+        default to the first and the latest snapshot.
+        """
+        first, last = self._window(start, end)
+        hours = (self._times[last] - self._times[first]).total_seconds() / 3600
+        if hours <= 0:
+            return {}
+        before, after = self.state(first), self.state(last)
+        return {
+            self._character_ids[slot]: (after.experience[slot] - experience) / hours
+            for slot, experience in enumerate(before.experience)
+            if before.rank[slot] and after.rank[slot]
+        }
+
+    def rank_delta(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Dict[str, int]:
+        """Ranks gained between two snapshots. Positive means the character climbed.
+
+        Only characters on the ladder in both snapshots are included.
+        """
+        first, last = self._window(start, end)
+        before, after = self.state(first), self.state(last)
+        return {
+            self._character_ids[slot]: rank - after.rank[slot]
+            for slot, rank in enumerate(before.rank)
+            if rank and after.rank[slot]
+        }
+
+    def newly_dead(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> List[str]:
+        """Characters which are dead at the end, but weren't dead at the start."""
+        first, last = self._window(start, end)
+        before, after = self.state(first), self.state(last)
+        _grow(before, len(after.rank))
+        return [
+            self._character_ids[slot]
+            for slot, flags in enumerate(after.flags)
+            if after.rank[slot] and flags & _DEAD and not before.flags[slot] & _DEAD
+        ]
+
+    def _window(
+        self,
+        start: Optional[datetime],
+        end: Optional[datetime],
+    ) -> Tuple[int, int]:
+        if not self._times:
+            raise IndexError("No snapshots")
+        first = self.index_at(start) if start else 0
+        last = self.index_at(end) if end else len(self._times) - 1
+        return first, last
+
+    def _add_rows(self, rows: Iterable[_Row], taken_at: datetime) -> None:
+        if self._times and taken_at < self._times[-1]:
+            raise ValueError("Snapshots must be added in time order.")
+
+        current = _empty_state(len(self._character_ids))
+        for character_id, rank, level, experience, flags in rows:
+            slot = self._slots.get(character_id)
+            if slot is None:
+                slot = len(self._character_ids)
+                self._slots[character_id] = slot
+                self._character_ids.append(character_id)
+                _grow(current, slot + 1)
+            current.rank[slot] = rank
+            current.level[slot] = level
+            current.experience[slot] = experience
+            current.flags[slot] = flags
+
+        index = len(self._times)
+        if index % self.keyframe_interval == 0:
+            self._keyframes.append(current)
+            self._deltas.append(None)
+        else:
+            self._deltas.append(self._delta(current))
+        self._times.append(taken_at)
+        self._latest = current
+
+    def _delta(self, current: LadderState) -> _Delta:
+        previous = self._latest
+        _grow(previous, len(current.rank))
+        slots = array(
+            "l",
+            (
+                slot
+                for slot in range(len(current.rank))
+                if current.rank[slot] != previous.rank[slot]
+                or current.experience[slot] != previous.experience[slot]
+                or current.level[slot] != previous.level[slot]
+                or current.flags[slot] != previous.flags[slot]
+            ),
+        )
+        changed = LadderState(
+            *(
+                array(column.typecode, (column[slot] for slot in slots))
+                for column in current
+            )
+        )
+        return _Delta(slots, changed)
@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta
+from typing import Tuple
+from unittest import TestCase
+
+import pytest
+
+from poe_client.ladder_history import LadderHistory
+from poe_client.schemas import Raw
+from poe_client.schemas.league import Ladder
+
+START = datetime(2022, 6, 19, 12)
+
+
+def make_ladder(*entries: Tuple[str, int, bool]) -> Raw:
+    """Build a raw ladder from (character id, experience, dead) tuples, in rank order."""
+    return {
+        "total": len(entries),
+        "entries": [
+            {
+                "rank": rank,
+                "dead": dead,
+                "character": {
+                    "id": character_id,
+                    "name": character_id,
+                    "class": "Witch",
+                    "level": 90,
+                    "experience": experience,
+                },
+            }
+            for rank, (character_id, experience, dead) in enumerate(entries, start=1)
+        ],
+    }
+
+
+class LadderHistoryTest(TestCase):
+    """Tests the ladder history."""
+
+    def setUp(self) -> None:
+        """Sets up the test with three snapshots an hour apart."""
+        self.history = LadderHistory(keyframe_interval=2)
+        self.history.add_raw(
+            make_ladder(("a", 1000, False), ("b", 500, False)),
+            START,
+        )
+        self.history.add_raw(
+            make_ladder(("b", 3000, False), ("a", 1500, False), ("c", 10, False)),
+            START + timedelta(hours=1),
+        )
+        self.history.add(
+            Ladder.parse_obj(make_ladder(("b", 5000, True), ("a", 3500, False))),
+            START + timedelta(hours=2),
+        )
+        return super().setUp()
+
+    def test_queries(self):
+        """Tests the queries over the whole history."""
+        assert len(self.history) == 3
+        assert self.history.xp_per_hour() == {"a": 1250, "b": 2250}
+        assert self.history.rank_delta() == {"a": -1, "b": 1}
+        assert self.history.newly_dead() == ["b"]
+
+    def test_window(self):
+        """Tests the queries over part of the history."""
+        end = START + timedelta(minutes=90)
+
+        assert self.history.xp_per_hour(end=end) == {"a": 500, "b": 2500}
+        assert self.history.newly_dead(end=end) == []
+        assert self.history.rank_delta(start=end) == {"a": 0, "b": 0}
+        assert self.history.xp_per_hour(start=end) == {"a": 2000, "b": 2000}
+        assert self.history.xp_per_hour(start=end, end=end) == {}
+
+    def test_state(self):
+        """Tests that snapshots are rebuilt from keyframes and deltas."""
+        state = self.history.state(1)
+        slots = self.history.character_ids
+
+        assert slots == ["a", "b", "c"]
+        assert list(state.rank) == [2, 1, 3]
+        assert list(state.experience) == [1500, 3000, 10]
+        assert list(self.history.state(-1).rank) == [2, 1, 0]
+        assert list(self.history.state(0).rank) == [1, 2, 0]
+        with pytest.raises(IndexError):
+            self.history.state(3)
+
+    def test_state_copy(self):
+        """Tests that changing the columns of a snapshot doesn't change history."""
+        self.history.state(-1).rank[0] = 99
+        self.history.state(0).rank[0] = 99
+
+        assert list(self.history.state(-1).rank) == [2, 1, 0]
+        assert list(self.history.state(0).rank) == [1, 2, 0]
+
+    def test_time_order(self):
+        """Tests that snapshots can't be added out of order."""
+        with pytest.raises(ValueError, match="time order"):
+            self.history.add_raw(make_ladder(), START)
+        with pytest.raises(IndexError):
+            self.history.index_at(START - timedelta(hours=1))
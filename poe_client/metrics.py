@@ -0,0 +1,280 @@
+"""Rate limit utilization metrics, as snapshots or in the Prometheus text format."""
+
+import time
+from bisect import bisect_left
+from collections import Counter, deque
+from typing import TYPE_CHECKING, Deque, Dict, List, Literal, Tuple, TypedDict
+
+from aiohttp import web
+
+if TYPE_CHECKING:
+    from poe_client.rate_limiter import RateLimiter  # noqa: F401
+
+# Upper bounds of the limiter wait time histogram buckets, in seconds.
+WAIT_BUCKETS = (0.001, 0.01, 0.1, 1, 10, 60, float("inf"))
+
+# Requests admitted per second are averaged over this many seconds.
+_RATE_WINDOW = 60
+
+
+class WindowSnapshot(TypedDict):
+    """Utilization of one window of a policy."""
+
+    limiter: str
+    policy: str
+    period: int
+    hits: int
+    max_hits: int
+    utilization: float
+    resets_in: float
+    restricted_for: float
+
+
+class WaitSnapshot(TypedDict):
+    """A wait time histogram, with cumulative buckets."""
+
+    buckets: List[Tuple[float, int]]
+    sum: float
+    count: int
+
+
+class PolicySnapshot(TypedDict):
+    """Request counters and waits of one policy name."""
+
+    admitted: int
+    admitted_per_second: float
+    throttled: int
+    wait_seconds: WaitSnapshot
+
+
+class Snapshot(TypedDict):
+    """Utilization of every window, and the counters of every policy name."""
+
+    windows: List[WindowSnapshot]
+    policies: Dict[str, PolicySnapshot]
+
+
+class WaitHistogram(object):
+    """Histogram of how long requests waited on the limiter."""
+
+    counts: List[int]
+    total: float
+    count: int
+
+    def __init__(self) -> None:
+        """Initialize an empty histogram."""
+        self.counts = [0] * len(WAIT_BUCKETS)
+        self.total = 0
+        self.count = 0
+
+    def add(self, waited: float) -> None:
+        """Count a wait."""
+        self.counts[bisect_left(WAIT_BUCKETS, waited)] += 1
+        self.total += waited
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[float, int]]:
+        """(upper bound, waits up to it) for every bucket, like Prometheus."""
+        buckets = []
+        running = 0
+        for bound, count in zip(WAIT_BUCKETS, self.counts):
+            running += count
+            buckets.append((bound, running))
+        return buckets
+
+
+class LimiterMetrics(object):
+    """Utilization of the rate limit policies of one or more limiters.
+
+    Limiters report every request they admit and how long it waited, and clients
+    report every 429 they get. Current hits, windows and restrictions are read
+    from the limiters when a snapshot is taken, so they cost nothing in between.
+    """
+
+    admitted: "Counter[str]"
+    throttled: "Counter[str]"
+    waits: Dict[str, WaitHistogram]
+
+    _limiters: List[Tuple[str, "RateLimiter"]]
+    _recent: Dict[str, Deque[float]]
+
+    def __init__(self) -> None:
+        """Initialize metrics with no limiters."""
+        self.admitted = Counter()
+        self.throttled = Counter()
+        self.waits = {}
+        self._limiters = []
+        self._recent = {}
+
+    def register(self, limiter: "RateLimiter", label: str) -> None:
+        """Include the policies of a limiter in snapshots, under a label."""
+        self._limiters.append((label, limiter))
+
+    def unregister(self, limiter: "RateLimiter") -> None:
+        """Leave a limiter out of snapshots from now on."""
+        self._limiters = [
+            (label, registered)
+            for label, registered in self._limiters
+            if registered is not limiter
+        ]
+
+    def record_admitted(self, policy_name: str, waited: float) -> None:
+        """Count a request admitted by a limiter after waiting for some seconds."""
+        policy_name = policy_name or "unknown"
+        self.admitted[policy_name] += 1
+        histogram = self.waits.get(policy_name)
+        if histogram is None:
+            histogram = WaitHistogram()
+            self.waits[policy_name] = histogram
+        histogram.add(waited)
+
+        now = time.monotonic()
+        recent = self._recent.get(policy_name)
+        if recent is None:
+            recent = deque()
+            self._recent[policy_name] = recent
+        recent.append(now)
+        while recent[0] < now - _RATE_WINDOW:
+            recent.popleft()
+
+    def record_throttled(self, policy_name: str) -> None:
+        """Count a 429 response."""
+        self.throttled[policy_name or "unknown"] += 1
+
+    def admitted_per_second(self, policy_name: str) -> float:
+        """Requests admitted per second over the last minute."""
+        recent = self._recent.get(policy_name)
+        if not recent:
+            return 0
+        since = time.monotonic() - _RATE_WINDOW
+        while recent and recent[0] < since:
+            recent.popleft()
+        return len(recent) / _RATE_WINDOW
+
+    def snapshot(self) -> Snapshot:
+        """Current utilization of every window, and the request counters.
+
+        Returns:
+            A dict with "windows", one entry per limiter, policy, rule and window,
+            and "policies", the counters and wait histogram of each policy name.
+        """
+        now = time.monotonic()
+        windows: List[WindowSnapshot] = []
+        for label, limiter in self._limiters:
+            for policy_id, policy in limiter.policies.items():
+                for limit in policy.values():
+                    windows.append(
+                        {
+                            "limiter": label,
+                            "policy": policy_id,
+                            "period": limit.period,
+                            "hits": limit.state.current_hits,
+                            "max_hits": limit.max_hits,
+                            "utilization": limit.state.current_hits / limit.max_hits,
+                            "resets_in": limit.resets_in(now),
+                            "restricted_for": limit.restricted_for(now),
+                        },
+                    )
+
+        policies: Dict[str, PolicySnapshot] = {}
+        for policy_name in sorted(set(self.admitted) | set(self.throttled)):
+            histogram = self.waits.get(policy_name, WaitHistogram())
+            policies[policy_name] = {
+                "admitted": self.admitted[policy_name],
+                "admitted_per_second": self.admitted_per_second(policy_name),
+                "throttled": self.throttled[policy_name],
+                "wait_seconds": {
+                    "buckets": histogram.cumulative(),
+                    "sum": histogram.total,
+                    "count": histogram.count,
+                },
+            }
+        return {"windows": windows, "policies": policies}
+
+
+_WindowField = Literal["hits", "max_hits", "resets_in", "restricted_for"]
+_PolicyField = Literal["admitted", "throttled"]
+
+
+def _labels(**labels: object) -> str:
+    escaped = (
+        '{0}="{1}"'.format(
+            name,
+            str(label_value).replace("\\", "\\\\").replace('"', '\\"'),
+        )
+        for name, label_value in labels.items()
+    )
+    return "{{{0}}}".format(",".join(escaped))
+
+
+def render_prometheus(snapshot: Snapshot) -> str:
+    """Format a snapshot in the Prometheus text exposition format."""
+    lines = []
+    window_metrics: Tuple[Tuple[_WindowField, str, str], ...] = (
+        ("hits", "poe_rate_limit_hits", "Hits in the current window."),
+        ("max_hits", "poe_rate_limit_max_hits", "Hits allowed per window."),
+        ("resets_in", "poe_rate_limit_resets_in_seconds", "Until the window frees."),
+        ("restricted_for", "poe_rate_limit_restricted_seconds", "Restriction left."),
+    )
+    for field, metric, description in window_metrics:
+        lines.append("# HELP {0} {1}".format(metric, description))
+        lines.append("# TYPE {0} gauge".format(metric))
+        for window in snapshot["windows"]:
+            labels = _labels(
+                limiter=window["limiter"],
+                policy=window["policy"],
+                period=window["period"],
+            )
+            lines.append("{0}{1} {2}".format(metric, labels, window[field]))
+
+    counters: Tuple[Tuple[_PolicyField, str, str], ...] = (
+        ("admitted", "poe_requests_admitted_total", "Requests admitted."),
+        ("throttled", "poe_requests_throttled_total", "Responses with status 429."),
+    )
+    for counter, metric, description in counters:  # noqa: WPS440
+        lines.append("# HELP {0} {1}".format(metric, description))
+        lines.append("# TYPE {0} counter".format(metric))
+        for policy_name, policy in snapshot["policies"].items():
+            labels = _labels(policy=policy_name)
+            lines.append("{0}{1} {2}".format(metric, labels, policy[counter]))
+
+    metric = "poe_rate_limit_wait_seconds"
+    lines.append("# HELP {0} Time requests waited on the limiter.".format(metric))
+    lines.append("# TYPE {0} histogram".format(metric))
+    for policy_name, policy in snapshot["policies"].items():  # noqa: WPS440
+        waits = policy["wait_seconds"]
+        for bound, count in waits["buckets"]:
+            labels = _labels(
+                policy=policy_name,
+                le="+Inf" if bound == float("inf") else bound,
+            )
+            lines.append("{0}_bucket{1} {2}".format(metric, labels, count))
+        labels = _labels(policy=policy_name)
+        lines.append("{0}_sum{1} {2}".format(metric, labels, waits["sum"]))
+        lines.append("{0}_count{1} {2}".format(metric, labels, waits["count"]))
+    return "{0}\n".format("\n".join(lines))
+
+
+async def serve_prometheus(
+    metrics: LimiterMetrics,
+    host: str = "127.0.0.1",
+    port: int = 9464,
+) -> web.AppRunner:
+    """Serve the metrics at /metrics for Prometheus to scrape.
+
+    Returns:
+        The runner of the server. Call its cleanup method to stop serving.
+    """
+
+    async def handle(request: web.Request) -> web.Response:  # noqa: WPS430
+        return web.Response(
+            body=render_prometheus(metrics.snapshot()).encode(),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        )
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -0,0 +1,110 @@
+from unittest import IsolatedAsyncioTestCase
+
+import aiohttp
+import pytest
+
+from poe_client.client import PoEClient
+from poe_client.metrics import LimiterMetrics, serve_prometheus
+from poe_client.mockserver import MockData, MockServer, Policy, Rule
+
+
+class LimiterMetricsTest(IsolatedAsyncioTestCase):
+    """Tests rate limit metrics against the mock server."""
+
+    async def asyncSetUp(self) -> None:
+        """Starts a server with little data."""
+        self.server = MockServer(
+            data=MockData(ladder_size=10, stash_tabs=1),
+            policies={
+                "character": Policy(
+                    "character-request-limit",
+                    (Rule.parse("Account", "10:60:60"),),
+                ),
+            },
+        )
+        self.url = str(await self.server.start())
+        self.metrics = LimiterMetrics()
+        self.client = PoEClient(
+            "test user agent",
+            "token",
+            base_url=self.url,
+            metrics=self.metrics,
+        )
+        await self.client.__aenter__()
+        return await super().asyncSetUp()
+
+    async def asyncTearDown(self) -> None:
+        """Stops the server."""
+        await self.client.__aexit__(None, None, None)
+        await self.server.stop()
+        return await super().asyncTearDown()
+
+    async def test_snapshot(self):
+        """Tests the utilization of windows and the request counters."""
+        for _ in range(3):
+            await self.client.get_characters()
+
+        snapshot = self.metrics.snapshot()
+        assert snapshot["windows"] == [
+            {
+                "limiter": "client",
+                "policy": "character-request-limit/Account",
+                "period": 60,
+                "hits": 3,
+                "max_hits": 10,
+                "utilization": 0.3,
+                "resets_in": pytest.approx(60, abs=1),
+                "restricted_for": 0,
+            },
+        ]
+        # The first request is made before the policy is known.
+        assert snapshot["policies"]["unknown"]["admitted"] == 1
+        character = snapshot["policies"]["character-request-limit"]
+        assert character["admitted"] == 2
+        assert character["admitted_per_second"] == 2 / 60
+        assert character["throttled"] == 0
+        assert character["wait_seconds"]["count"] == 2
+        assert character["wait_seconds"]["buckets"][-1] == (float("inf"), 2)
+
+    async def test_throttled(self):
+        """Tests that 429s are counted, and restrictions reported."""
+        async with aiohttp.ClientSession() as session:
+            for _ in range(11):
+                await session.get(
+                    "{0}/character".format(self.url),
+                    headers={"Authorization": "Bearer token"},
+                )
+
+        with pytest.raises(ValueError, match="429"):
+            await self.client.get_characters()
+
+        snapshot = self.metrics.snapshot()
+        assert snapshot["policies"]["character-request-limit"]["throttled"] == 1
+        assert snapshot["windows"][0]["restricted_for"] == pytest.approx(60, abs=1)
+
+    async def test_prometheus(self):
+        """Tests the Prometheus exporter."""
+        await self.client.get_characters()
+        await self.client.get_characters()
+        runner = await serve_prometheus(self.metrics, port=0)
+        try:
+            async with aiohttp.ClientSession() as session:
+                url = "http://127.0.0.1:{0}/metrics".format(runner.addresses[0][1])
+                async with session.get(url) as resp:
+                    content_type = resp.headers["Content-Type"]
+                    text = await resp.text()
+        finally:
+            await runner.cleanup()
+
+        assert content_type.startswith("text/plain; version=0.0.4")
+        assert text.startswith("# HELP poe_rate_limit_hits ")
+        assert (
+            'poe_rate_limit_hits{limiter="client",'
+            + 'policy="character-request-limit/Account",period="60"} 2'
+        ) in text
+        assert (
+            'poe_requests_admitted_total{policy="character-request-limit"} 1'
+        ) in text
+        assert (
+            'poe_rate_limit_wait_seconds_bucket{policy="unknown",le="+Inf"} 1'
+        ) in text
@@ -0,0 +1,18 @@
+"""A local mock of the PoE API, for load testing the client offline.
+
+Run it with `python -m poe_client.mockserver`, or start a MockServer from Python.
+"""
+
+from poe_client.mockserver.limits import Limit, Policy, Rule, Tracker
+from poe_client.mockserver.payloads import MockData
+from poe_client.mockserver.server import DEFAULT_POLICIES, MockServer
+
+__all__ = [
+    "DEFAULT_POLICIES",
+    "Limit",
+    "MockData",
+    "MockServer",
+    "Policy",
+    "Rule",
+    "Tracker",
+]
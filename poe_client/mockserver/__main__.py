@@ -0,0 +1,82 @@
+"""Run the mock PoE API server: `python -m poe_client.mockserver --help`."""
+
+import argparse
+import logging
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+from poe_client.mockserver.limits import Policy, Rule
+from poe_client.mockserver.payloads import MockData
+from poe_client.mockserver.server import DEFAULT_POLICIES, MockServer
+
+
+def parse_policies(specs: List[str]) -> Dict[str, Policy]:
+    """Parse --policy arguments like "ladder=Client=10:5:60;Ip=15:5:60,60:60:120".
+
+    The policy keeps the name of the default policy of its group.
+    """
+    policies = {}
+    for spec in specs:
+        group, rules = spec.split("=", 1)
+        if group not in DEFAULT_POLICIES:
+            raise ValueError(
+                "Unknown endpoint group {0}, expected one of {1}".format(
+                    group,
+                    ", ".join(DEFAULT_POLICIES),
+                ),
+            )
+        policies[group] = Policy(
+            DEFAULT_POLICIES[group].name,
+            tuple(Rule.parse(*rule.split("=", 1)) for rule in rules.split(";")),
+        )
+    return policies
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Parse arguments and serve until interrupted."""
+    parser = argparse.ArgumentParser(
+        prog="python -m poe_client.mockserver",
+        description="Serve a mock of the PoE API with emulated rate limits.",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0,
+        help="seconds to wait before answering each request",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--ladder-size", type=int, default=15000)
+    parser.add_argument("--stash-tabs", type=int, default=20)
+    parser.add_argument("--items-per-tab", type=int, default=30)
+    parser.add_argument(
+        "--policy",
+        action="append",
+        default=[],
+        help=(
+            "override the policy of an endpoint group, like "
+            '"ladder=Client=10:5:60;Ip=15:5:60". Groups: {0}'.format(
+                ", ".join(DEFAULT_POLICIES),
+            )
+        ),
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    server = MockServer(
+        data=MockData(
+            seed=args.seed,
+            ladder_size=args.ladder_size,
+            stash_tabs=args.stash_tabs,
+            items_per_tab=args.items_per_tab,
+        ),
+        policies=parse_policies(args.policy),
+        latency=args.latency,
+    )
+    web.run_app(server.app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""Rate limit policies enforced by the mock server, the way the PoE API does."""
+
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+
+class Limit(NamedTuple):
+    """A single window of a rule: at most max_hits requests per period seconds.
+
+    Going over the limit restricts the rule for restriction seconds.
+    """
+
+    max_hits: int
+    period: int
+    restriction: int
+
+    @classmethod
+    def parse(cls, limit: str) -> "Limit":
+        """Parse a limit in the header format, "max_hits:period:restriction"."""
+        max_hits, period, restriction = limit.split(":")
+        return cls(int(max_hits), int(period), int(restriction))
+
+    def __str__(self) -> str:
+        """Format the limit like the API does in headers."""
+        return "{0}:{1}:{2}".format(self.max_hits, self.period, self.restriction)
+
+
+class Rule(NamedTuple):
+    """Limits counted per scope, like per account, client or IP address."""
+
+    name: str
+    limits: Tuple[Limit, ...]
+
+    @classmethod
+    def parse(cls, name: str, limits: str) -> "Rule":
+        """Parse a rule from its name and comma separated limits."""
+        return cls(name, tuple(Limit.parse(limit) for limit in limits.split(",")))
+
+
+class Policy(NamedTuple):
+    """Rules which apply together to a group of endpoints."""
+
+    name: str
+    rules: Tuple[Rule, ...]
+
+
+class Decision(NamedTuple):
+    """The outcome of a request against a policy."""
+
+    allowed: bool
+    retry_after: int
+    headers: Dict[str, str]
+
+
+class _Window(object):
+    hits: Deque[float]
+    restricted_until: float
+
+    def __init__(self) -> None:
+        self.hits = deque()
+        self.restricted_until = 0
+
+    def current_hits(self, now: float, period: int) -> int:
+        while self.hits and self.hits[0] <= now - period:
+            self.hits.popleft()
+        return len(self.hits)
+
+    def frees_in(self, now: float, period: int) -> int:
+        # Seconds until the oldest hit leaves the window, making room for another.
+        if not self.hits:
+            return period
+        return max(1, int(self.hits[0] + period - now + 0.999))  # noqa: WPS432
+
+    def restricted_for(self, now: float) -> int:
+        remaining = self.restricted_until - now
+        return int(remaining + 0.999) if remaining > 0 else 0  # noqa: WPS432
+
+
+class Tracker(object):
+    """Counts requests against policies, and decides whether they're allowed.
+
+    Requests which hit a restricted rule, or which would go over a limit, are
+    rejected and restrict the limit they went over, like the PoE API does. Going
+    over a limit without a restriction is rejected until a hit leaves its window.
+    Rejected requests don't count as hits.
+    """
+
+    _windows: Dict[Tuple[str, str, str, Limit], _Window]
+    _clock: Callable[[], float]
+
+    def __init__(self, clock: Optional[Callable[[], float]] = None) -> None:
+        """Initialize a tracker with no requests.
+
+        Args:
+            clock: Returns the current time in seconds. Defaults to time.monotonic.
+        """
+        self._windows = {}
+        self._clock = clock or time.monotonic
+
+    def hit(self, policy: Policy, scopes: Dict[str, str]) -> Decision:
+        """Count a request against a policy.
+
+        Args:
+            policy: The policy of the requested endpoint.
+            scopes: Maps lower case rule names to the key the rule is counted by,
+                like the token for "account" or the address for "ip".
+
+        Returns:
+            Whether the request is allowed, and the rate limit headers to respond with.
+        """
+        now = self._clock()
+        windows: List[Tuple[Rule, Limit, _Window]] = []
+        for rule in policy.rules:
+            scope = scopes.get(rule.name.lower(), "")
+            for limit in rule.limits:
+                window_key = (policy.name, rule.name, scope, limit)
+                window = self._windows.get(window_key)
+                if window is None:
+                    window = _Window()
+                    self._windows[window_key] = window
+                windows.append((rule, limit, window))
+
+        retry_after = max(window.restricted_for(now) for _, _, window in windows)
+        if not retry_after:
+            for _, limit, window in windows:
+                if window.current_hits(now, limit.period) < limit.max_hits:
+                    continue
+                if limit.restriction:
+                    window.restricted_until = now + limit.restriction
+                    retry_after = max(retry_after, limit.restriction)
+                else:
+                    frees_in = window.frees_in(now, limit.period)
+                    retry_after = max(retry_after, frees_in)
+        if not retry_after:
+            for _, _, window in windows:
+                window.hits.append(now)
+
+        return Decision(
+            allowed=not retry_after,
+            retry_after=retry_after,
+            headers=self._headers(policy, windows, now),
+        )
+
+    def _headers(
+        self,
+        policy: Policy,
+        windows: List[Tuple[Rule, Limit, _Window]],
+        now: float,
+    ) -> Dict[str, str]:
+        headers = {
+            "X-Rate-Limit-Policy": policy.name,
+            "X-Rate-Limit-Rules": ",".join(rule.name for rule in policy.rules),
+        }
+        for rule in policy.rules:
+            states = [
+                "{0}:{1}:{2}".format(
+                    window.current_hits(now, limit.period),
+                    limit.period,
+                    window.restricted_for(now),
+                )
+                for window_rule, limit, window in windows
+                if window_rule is rule
+            ]
+            headers["X-Rate-Limit-{0}".format(rule.name)] = ",".join(
+                str(limit) for limit in rule.limits
+            )
+            headers["X-Rate-Limit-{0}-State".format(rule.name)] = ",".join(states)
+        return headers
@@ -0,0 +1,78 @@
+from unittest import TestCase
+
+from poe_client.mockserver.limits import Limit, Policy, Rule, Tracker
+
+
+class TrackerTest(TestCase):
+    """Tests counting requests against policies."""
+
+    def setUp(self) -> None:
+        """Sets up the test with a clock that only moves when told to."""
+        self.now = 0.0
+        self.tracker = Tracker(clock=lambda: self.now)
+        self.policy = Policy(
+            "test-policy",
+            (Rule.parse("Account", "2:10:60"), Rule.parse("Ip", "5:10:30")),
+        )
+        return super().setUp()
+
+    def test_parse(self):
+        """Tests parsing limits in the header format."""
+        assert Limit.parse("2:10:60") == Limit(2, 10, 60)
+        assert str(Limit(2, 10, 60)) == "2:10:60"
+
+    def test_headers(self):
+        """Tests the rate limit headers of an allowed request."""
+        decision = self.tracker.hit(self.policy, {"account": "a", "ip": "1"})
+
+        assert decision.allowed
+        assert decision.headers == {
+            "X-Rate-Limit-Policy": "test-policy",
+            "X-Rate-Limit-Rules": "Account,Ip",
+            "X-Rate-Limit-Account": "2:10:60",
+            "X-Rate-Limit-Account-State": "1:10:0",
+            "X-Rate-Limit-Ip": "5:10:30",
+            "X-Rate-Limit-Ip-State": "1:10:0",
+        }
+
+    def test_restriction(self):
+        """Tests that going over a limit restricts it, per scope."""
+        self.tracker.hit(self.policy, {"account": "a", "ip": "1"})
+        self.tracker.hit(self.policy, {"account": "a", "ip": "1"})
+        rejected = self.tracker.hit(self.policy, {"account": "a", "ip": "1"})
+
+        assert not rejected.allowed
+        assert rejected.retry_after == 60
+        assert rejected.headers["X-Rate-Limit-Account-State"] == "2:10:60"
+        assert self.tracker.hit(self.policy, {"account": "b", "ip": "1"}).allowed
+
+        self.now = 30
+        assert self.tracker.hit(self.policy, {"account": "a", "ip": "1"}).retry_after
+        self.now = 61
+        assert self.tracker.hit(self.policy, {"account": "a", "ip": "1"}).allowed
+
+    def test_window(self):
+        """Tests that hits older than the period stop counting."""
+        self.tracker.hit(self.policy, {"account": "a"})
+        self.now = 5
+        self.tracker.hit(self.policy, {"account": "a"})
+        self.now = 10
+        decision = self.tracker.hit(self.policy, {"account": "a"})
+
+        assert decision.allowed
+        assert decision.headers["X-Rate-Limit-Account-State"] == "2:10:0"
+
+    def test_no_restriction(self):
+        """Tests that a full window without a restriction rejects until it frees."""
+        policy = Policy("test-policy", (Rule.parse("Account", "2:10:0"),))
+        self.tracker.hit(policy, {"account": "a"})
+        self.now = 4
+        self.tracker.hit(policy, {"account": "a"})
+        self.now = 7
+        rejected = self.tracker.hit(policy, {"account": "a"})
+
+        assert not rejected.allowed
+        assert rejected.retry_after == 3
+        assert rejected.headers["X-Rate-Limit-Account-State"] == "2:10:0"
+        self.now = 10
+        assert self.tracker.hit(policy, {"account": "a"}).allowed
@@ -0,0 +1,269 @@
+"""Generated payloads for the mock server, shaped like PoE API responses."""
+
+import random
+from typing import List, Optional, cast
+
+from poe_client.schemas import Raw
+
+_CLASSES = ("Witch", "Marauder", "Ranger", "Duelist", "Templar", "Shadow")
+_BASE_TYPES = ("Ruby Ring", "Vaal Regalia", "Hubris Circlet", "Stygian Vise")
+_MODS = (
+    "+{0} to maximum Life",
+    "+{0}% to Fire Resistance",
+    "+{0}% to Cold Resistance",
+    "{0}% increased Attack Speed",
+)
+_EQUIPMENT_SLOTS = 12
+_JEWELS = 3
+_ALLOCATED_PASSIVES = 120
+
+
+class MockData(object):
+    """Deterministic data for every endpoint of the mock server.
+
+    Everything is generated from a seed, so two servers with the same arguments
+    serve the same responses.
+    """
+
+    account_name: str
+    leagues: List[Raw]
+    characters: List[Raw]
+    ladder: List[Raw]
+    stashes: List[Raw]
+    item_filters: List[Raw]
+    pvp_matches: List[Raw]
+
+    _random: random.Random
+    _items_per_tab: int
+    _stashes_per_page: int
+
+    def __init__(  # noqa: WPS211
+        self,
+        seed: int = 0,
+        leagues: int = 4,
+        characters: int = 10,
+        ladder_size: int = 15000,
+        stash_tabs: int = 20,
+        items_per_tab: int = 30,
+        stashes_per_page: int = 50,
+    ) -> None:
+        """Generate the data.
+
+        Args:
+            seed: Seed of the generated data.
+            leagues: Number of leagues.
+            characters: Number of characters of the token's account.
+            ladder_size: Number of entries in the ladder of every league.
+            stash_tabs: Number of stash tabs of the token's account. Every tenth tab
+                is a folder with two sub-tabs.
+            items_per_tab: Number of items in each stash tab.
+            stashes_per_page: Number of stashes in each public stash page.
+        """
+        self._random = random.Random(seed)
+        self._items_per_tab = items_per_tab
+        self._stashes_per_page = stashes_per_page
+        self.account_name = "mock_account"
+        self.leagues = [self._league(index) for index in range(leagues)]
+        self.characters = [
+            self._character("mock_character_{0}".format(index), self._league_id)
+            for index in range(characters)
+        ]
+        self.ladder = [self._ladder_entry(rank) for rank in range(1, ladder_size + 1)]
+        self.stashes = [self._stash_tab(index) for index in range(stash_tabs)]
+        self.item_filters = [
+            {
+                "id": "filter{0}".format(index),
+                "filter_name": "Filter {0}".format(index),
+                "realm": "pc",
+                "description": "",
+                "version": "1.0",
+                "public": False,
+            }
+            for index in range(3)
+        ]
+        self.pvp_matches = [
+            {
+                "id": "match{0}".format(index),
+                "realm": "pc",
+                "description": "Mock match {0}".format(index),
+                "glickoRatings": False,
+                "pvp": True,
+                "style": "blitz",
+            }
+            for index in range(3)
+        ]
+
+    def profile(self) -> Raw:
+        """The account of the token."""
+        return {"uuid": "00000000-mock", "name": self.account_name, "realm": "pc"}
+
+    def league_account(self) -> Raw:
+        """The league account of the token."""
+        return {"atlas_passives": {"hashes": [1, 2, 3]}}
+
+    def character(self, name: str) -> Optional[Raw]:
+        """A character with its items and passives, or None if it doesn't exist.
+
+        Characters are listed without those; they're generated from the name, so
+        every call returns the same ones.
+        """
+        for summary in self.characters:
+            if summary["name"] != name:
+                continue
+            character_random = random.Random(name)
+            return dict(
+                summary,
+                equipment=[
+                    self._item(character_random) for _ in range(_EQUIPMENT_SLOTS)
+                ],
+                inventory=[
+                    self._item(character_random) for _ in range(self._items_per_tab)
+                ],
+                jewels=[self._item(character_random) for _ in range(_JEWELS)],
+                passives={
+                    "hashes": sorted(
+                        character_random.sample(range(1, 2**16), _ALLOCATED_PASSIVES),
+                    ),
+                    "hashes_ex": [],
+                    "jewel_data": {},
+                },
+            )
+        return None
+
+    def public_stash_page(self, change_id: Optional[str]) -> Raw:
+        """A page of the public stash river.
+
+        Change ids are numbers, each page leading to the next one.
+        """
+        page = int(change_id) if change_id and change_id.isdigit() else 0
+        page_random = random.Random(page)
+        return {
+            "next_change_id": str(page + 1),
+            "stashes": [
+                {
+                    "id": "public{0}".format(page_random.randrange(10**6)),
+                    "public": True,
+                    "accountName": "account{0}".format(page_random.randrange(1000)),
+                    "stash": "~price 1 chaos",
+                    "stashType": "PremiumStash",
+                    "league": self._league_id,
+                    "items": [
+                        self._item(page_random) for _ in range(self._items_per_tab)
+                    ],
+                }
+                for _ in range(self._stashes_per_page)
+            ],
+        }
+
+    def stash_tab(
+        self,
+        stash_id: str,
+        substash_id: Optional[str] = None,
+    ) -> Optional[Raw]:
+        """The contents of a stash tab, or None if it doesn't exist."""
+        for tab in self.stashes:
+            if tab["id"] != stash_id:
+                continue
+            if substash_id is None:
+                return tab
+            for child in cast(List[Raw], tab.get("children") or []):
+                if child["id"] == substash_id:
+                    return child
+        return None
+
+    def listed_stashes(self) -> List[Raw]:
+        """Stash tabs as they're listed, without their items."""
+        return [_without_items(tab) for tab in self.stashes]
+
+    @property
+    def _league_id(self) -> str:
+        # Characters, ladders and public stashes are all in the first league.
+        return str(self.leagues[0]["id"])
+
+    def _league(self, index: int) -> Raw:
+        return {
+            "id": "Mock League {0}".format(index) if index else "Standard",
+            "realm": "pc",
+            "description": "A mock league",
+            "event": False,
+        }
+
+    def _character(self, name: str, league: str) -> Raw:
+        level = self._random.randint(1, 100)
+        return {
+            "id": "{0:064x}".format(self._random.getrandbits(256)),
+            "name": name,
+            "class": self._random.choice(_CLASSES),
+            "league": league,
+            "level": level,
+            "experience": level * 1000000,
+        }
+
+    def _ladder_entry(self, rank: int) -> Raw:
+        return {
+            "rank": rank,
+            "dead": self._random.random() < 0.1,  # noqa: WPS432
+            "character": self._character(
+                "ladder_character_{0}".format(rank),
+                self._league_id,
+            ),
+            "account": {"name": "ladder_account_{0}".format(rank)},
+        }
+
+    def _stash_tab(self, index: int) -> Raw:
+        tab_id = "{0:010x}".format(self._random.getrandbits(40))
+        tab: Raw = {
+            "id": tab_id,
+            "name": "Tab {0}".format(index),
+            "type": "PremiumStash",
+            "index": index,
+        }
+        if index % 10 == 9:  # noqa: WPS432
+            tab["type"] = "MapStash"
+            tab["metadata"] = {"folder": True, "colour": "ffffff"}
+            tab["children"] = [
+                {
+                    "id": "{0}{1}".format(tab_id, child),
+                    "parent": tab_id,
+                    "name": "",
+                    "type": "MapStash",
+                    "metadata": {"items": self._items_per_tab},
+                    "items": self._items(),
+                }
+                for child in range(2)
+            ]
+        else:
+            tab["metadata"] = {"items": self._items_per_tab, "colour": "ffffff"}
+            tab["items"] = self._items()
+        return tab
+
+    def _items(self) -> List[Raw]:
+        return [self._item(self._random) for _ in range(self._items_per_tab)]
+
+    def _item(self, item_random: random.Random) -> Raw:
+        base_type = item_random.choice(_BASE_TYPES)
+        return {
+            "verified": False,
+            "w": 1,
+            "h": 1,
+            "icon": "https://web.poecdn.com/image/mock.png",
+            "id": "{0:064x}".format(item_random.getrandbits(256)),
+            "name": "",
+            "typeLine": base_type,
+            "baseType": base_type,
+            "identified": True,
+            "ilvl": item_random.randint(1, 86),
+            "explicitMods": [
+                mod.format(item_random.randint(1, 100))
+                for mod in item_random.sample(_MODS, 2)
+            ],
+            "frameType": 2,
+        }
+
+
+def _without_items(tab: Raw) -> Raw:
+    listed = {key: tab_value for key, tab_value in tab.items() if key != "items"}
+    if "children" in tab:
+        children = cast(List[Raw], tab["children"])
+        listed["children"] = [_without_items(child) for child in children]
+    return listed
@@ -0,0 +1,268 @@
+"""A local aiohttp server mimicking the PoE API, rate limits included."""
+
+import asyncio
+from collections import Counter
+from types import TracebackType
+from typing import Awaitable, Callable, Dict, Optional, Type
+
+from aiohttp import web
+from yarl import URL
+
+from poe_client.mockserver.limits import Policy, Rule, Tracker
+from poe_client.mockserver.payloads import MockData
+from poe_client.schemas import Raw
+
+# Builds the body of a response to a request.
+PayloadHandler = Callable[[web.Request], Awaitable[Raw]]
+Handler = Callable[[web.Request], Awaitable[web.StreamResponse]]
+
+_ACCOUNT_RULES = (
+    Rule.parse("Account", "30:60:60,100:1800:600"),
+    Rule.parse("Ip", "45:60:120,180:1800:600"),
+)
+
+# Policies of each group of endpoints, named like the ones the PoE API uses.
+DEFAULT_POLICIES: Dict[str, Policy] = {
+    "profile": Policy("account-request-limit", _ACCOUNT_RULES),
+    "character": Policy("character-request-limit", _ACCOUNT_RULES),
+    "stash": Policy("stash-request-limit", _ACCOUNT_RULES),
+    "item-filter": Policy("item-filter-request-limit", _ACCOUNT_RULES),
+    "league-account": Policy("league-account-request-limit", _ACCOUNT_RULES),
+    "league": Policy(
+        "league-request-limit",
+        (Rule.parse("Client", "20:5:60"), Rule.parse("Ip", "30:5:60")),
+    ),
+    "ladder": Policy(
+        "ladder-request-limit",
+        (Rule.parse("Client", "10:5:60"), Rule.parse("Ip", "15:5:60")),
+    ),
+    "pvp": Policy("pvp-request-limit", (Rule.parse("Ip", "10:5:60"),)),
+    "public-stash": Policy(
+        "public-stash-request-limit",
+        (Rule.parse("Client", "1:1:60"), Rule.parse("Ip", "2:1:60")),
+    ),
+}
+
+_MAX_LADDER_LIMIT = 500
+_MAX_LEAGUE_LIMIT = 50
+
+
+class MockServer(object):
+    """Serves every endpoint the client calls, with generated data.
+
+    Every response carries the rate limit headers of its endpoint's policy, and
+    requests over a limit get a 429 with Retry-After, like the PoE API. Account
+    rules are counted per Authorization header, IP rules per remote address and
+    client rules per User-Agent.
+    """
+
+    data: MockData
+    policies: Dict[str, Policy]
+    latency: float
+    host: str
+    port: int
+    app: web.Application
+    tracker: Tracker
+    # Requests and rejected requests, by policy name.
+    requests: "Counter[str]"
+    throttled: "Counter[str]"
+
+    _runner: Optional[web.AppRunner]
+
+    def __init__(  # noqa: WPS211
+        self,
+        data: Optional[MockData] = None,
+        policies: Optional[Dict[str, Policy]] = None,
+        latency: float = 0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        """Initialize a new server.
+
+        Args:
+            data: Data to serve. Defaults to MockData().
+            policies: Overrides the policies of groups of endpoints, keyed like
+                DEFAULT_POLICIES.
+            latency: Seconds to wait before answering each request.
+            host: Host to listen on.
+            port: Port to listen on. 0 picks a free port.
+        """
+        self.data = data if data is not None else MockData()
+        self.policies = {**DEFAULT_POLICIES, **(policies or {})}
+        self.latency = latency
+        self.host = host
+        self.port = port
+        self.tracker = Tracker()
+        self.requests = Counter()
+        self.throttled = Counter()
+        self._runner = None
+        self.app = self._make_app()
+
+    @property
+    def url(self) -> URL:
+        """Base URL of the server, to pass to the client."""
+        return URL.build(scheme="http", host=self.host, port=self.port)
+
+    async def start(self) -> URL:
+        """Start listening, returning the base URL."""
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+        return self.url
+
+    async def stop(self) -> None:
+        """Stop listening."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self) -> "MockServer":
+        """Runs on entering `async with`."""
+        await self.start()
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[TracebackType],
+    ) -> None:
+        """Runs on exiting `async with`."""
+        await self.stop()
+
+    def _make_app(self) -> web.Application:
+        app = web.Application()
+        routes = (
+            ("/profile", "profile", self._profile),
+            ("/character", "character", self._characters),
+            ("/character/{name}", "character", self._character),
+            ("/stash/{league}", "stash", self._stashes),
+            ("/stash/{league}/{stash_id}", "stash", self._stash),
+            ("/stash/{league}/{stash_id}/{substash_id}", "stash", self._stash),
+            ("/league", "league", self._leagues),
+            ("/league/{league}", "league", self._league),
+            ("/league/{league}/ladder", "ladder", self._ladder),
+            ("/league-account/{league}", "league-account", self._league_account),
+            ("/item-filter", "item-filter", self._item_filters),
+            ("/item-filter/{filter_id}", "item-filter", self._item_filter),
+            ("/pvp-match", "pvp", self._pvp_matches),
+            ("/pvp-match/{match}", "pvp", self._pvp_match),
+            ("/pvp-match/{match}/ladder", "pvp", self._pvp_match_ladder),
+            ("/public-stash-tabs", "public-stash", self._public_stash_tabs),
+        )
+        for path, group, handler in routes:
+            app.router.add_get(path, self._limited(group, handler))
+        return app
+
+    def _limited(self, group: str, handler: PayloadHandler) -> Handler:
+        async def limited(request: web.Request) -> web.Response:  # noqa: WPS430
+            policy = self.policies[group]
+            decision = self.tracker.hit(
+                policy,
+                {
+                    "account": request.headers.get("Authorization", ""),
+                    "ip": request.remote or "",
+                    "client": request.headers.get("User-Agent", ""),
+                },
+            )
+            self.requests[policy.name] += 1
+            if self.latency:
+                await asyncio.sleep(self.latency)
+
+            headers = dict(decision.headers)
+            if not decision.allowed:
+                self.throttled[policy.name] += 1
+                headers["Retry-After"] = str(decision.retry_after)
+                return web.json_response(
+                    {"error": {"code": 3, "message": "Rate limit exceeded"}},
+                    status=429,
+                    headers=headers,
+                )
+            try:
+                body = await handler(request)
+            except web.HTTPException as error:
+                error.headers.update(headers)
+                raise
+            return web.json_response(body, headers=headers)
+
+        return limited
+
+    async def _profile(self, request: web.Request) -> Raw:
+        return self.data.profile()
+
+    async def _characters(self, request: web.Request) -> Raw:
+        return {"characters": self.data.characters}
+
+    async def _character(self, request: web.Request) -> Raw:
+        character = self.data.character(request.match_info["name"])
+        if character is None:
+            raise web.HTTPNotFound()
+        return {"character": character}
+
+    async def _stashes(self, request: web.Request) -> Raw:
+        return {"stashes": self.data.listed_stashes()}
+
+    async def _stash(self, request: web.Request) -> Raw:
+        tab = self.data.stash_tab(
+            request.match_info["stash_id"],
+            request.match_info.get("substash_id"),
+        )
+        if tab is None:
+            raise web.HTTPNotFound()
+        return {"stash": tab}
+
+    async def _leagues(self, request: web.Request) -> Raw:
+        offset = int(request.query.get("offset", 0))
+        limit = min(
+            int(request.query.get("limit", _MAX_LEAGUE_LIMIT)), _MAX_LEAGUE_LIMIT
+        )
+        return {"leagues": self.data.leagues[offset : offset + limit]}
+
+    async def _league(self, request: web.Request) -> Raw:
+        league = request.match_info["league"]
+        for found in self.data.leagues:
+            if found["id"] == league:
+                return {"league": found}
+        raise web.HTTPNotFound()
+
+    async def _ladder(self, request: web.Request) -> Raw:
+        offset = int(request.query.get("offset", 0))
+        limit = min(int(request.query.get("limit", 20)), _MAX_LADDER_LIMIT)
+        return {
+            "ladder": {
+                "total": len(self.data.ladder),
+                "entries": self.data.ladder[offset : offset + limit],
+            },
+        }
+
+    async def _league_account(self, request: web.Request) -> Raw:
+        return {"league_account": self.data.league_account()}
+
+    async def _item_filters(self, request: web.Request) -> Raw:
+        return {"filters": self.data.item_filters}
+
+    async def _item_filter(self, request: web.Request) -> Raw:
+        filter_id = request.match_info["filter_id"]
+        for item_filter in self.data.item_filters:
+            if item_filter["id"] == filter_id:
+                return {"filter": item_filter}
+        raise web.HTTPNotFound()
+
+    async def _pvp_matches(self, request: web.Request) -> Raw:
+        return {"matches": self.data.pvp_matches}
+
+    async def _pvp_match(self, request: web.Request) -> Raw:
+        match = request.match_info["match"]
+        for found in self.data.pvp_matches:
+            if found["id"] == match:
+                return {"match": found}
+        raise web.HTTPNotFound()
+
+    async def _pvp_match_ladder(self, request: web.Request) -> Raw:
+        found = await self._pvp_match(request)
+        return {**found, "ladder": {"total": 0, "entries": []}}
+
+    async def _public_stash_tabs(self, request: web.Request) -> Raw:
+        return self.data.public_stash_page(request.query.get("id"))
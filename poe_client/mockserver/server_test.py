@@ -0,0 +1,104 @@
+from unittest import IsolatedAsyncioTestCase
+
+import aiohttp
+import pytest
+
+from poe_client.client import PoEClient
+from poe_client.mockserver import (
+    DEFAULT_POLICIES,
+    MockData,
+    MockServer,
+    Policy,
+    Rule,
+)
+
+
+class MockServerTest(IsolatedAsyncioTestCase):
+    """Tests the client against the mock server."""
+
+    async def asyncSetUp(self) -> None:
+        """Starts a server with little data and generous limits."""
+        self.server = MockServer(
+            data=MockData(ladder_size=30, stash_tabs=10, items_per_tab=2),
+            policies={
+                group: Policy(policy.name, (Rule.parse("Account", "100:10:60"),))
+                for group, policy in DEFAULT_POLICIES.items()
+            },
+        )
+        url = await self.server.start()
+        self.client = PoEClient("test user agent", "token", base_url=str(url))
+        await self.client.__aenter__()
+        return await super().asyncSetUp()
+
+    async def asyncTearDown(self) -> None:
+        """Stops the server."""
+        await self.client.__aexit__(None, None, None)
+        await self.server.stop()
+        return await super().asyncTearDown()
+
+    async def test_endpoints(self):
+        """Tests that the client parses what every endpoint serves."""
+        profile = await self.client.get_profile()
+        assert profile.name == "mock_account"
+
+        characters = await self.client.get_characters()
+        character = await self.client.get_character(characters[0].name)
+        assert character.id == characters[0].id
+        assert character.equipment and character.passives
+
+        leagues = await self.client.list_leagues()
+        league = await self.client.get_league(leagues[1].id)
+        assert league == leagues[1]
+
+        ladder = await self.client.get_league_ladder("Standard", limit=20)
+        assert ladder.total == 30
+        assert [entry.rank for entry in ladder.entries] == list(range(1, 21))
+
+        tabs = await self.client.snapshot_stashes("Standard")
+        assert len(tabs) == 10
+        children = tabs[9].children
+        assert children is not None
+        assert len(children) == 2
+        assert len(children[0].items or ()) == 2
+
+        filters = await self.client.get_item_filters()
+        assert await self.client.get_item_filter(filters[0].id) == filters[0]
+
+        matches = await self.client.get_pvp_matches()
+        assert await self.client.get_pvp_match(matches[0].id) == matches[0]
+
+        await self.client.get_leage_account("Standard")
+
+        page = await self.client.get_public_stash_tabs("5")
+        assert page["next_change_id"] == "6"
+
+        assert not self.server.throttled
+        assert self.server.requests["stash-request-limit"] == 13
+
+    async def test_rate_limit(self):
+        """Tests that requests over the limit get a 429 with Retry-After."""
+        self.server.policies["league"] = Policy(
+            "league-request-limit",
+            (Rule.parse("Client", "1:60:120"),),
+        )
+        await self.client.get_league("Standard")
+
+        async with aiohttp.ClientSession() as session:
+            async with session.get(
+                "{0}/league/Standard".format(self.server.url),
+                headers={"User-Agent": "test user agent"},
+            ) as resp:
+                assert resp.status == 429
+                assert resp.headers["Retry-After"] == "120"
+                assert resp.headers["X-Rate-Limit-Client-State"] == "1:60:120"
+
+        assert self.client._headroom("league/{0}", 1) == 0  # noqa: WPS437
+        assert self.server.throttled["league-request-limit"] == 1
+
+    async def test_not_found(self):
+        """Tests that unknown ids are a 404."""
+        await self.client.get_characters()
+        with pytest.raises(aiohttp.ClientResponseError) as error:
+            await self.client.get_character("nobody")
+        assert error.value.status == 404
+        assert self.server.requests["character-request-limit"] == 2
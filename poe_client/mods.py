@@ -0,0 +1,158 @@
+"""Parsing of item mod lines into templates and numeric values.
+
+A mod line such as "Adds 12 to 24 Fire Damage" is split into its template
+("Adds # to # Fire Damage") and its values ((12, 24)). Signs and thousands
+separators belong to the values, so "+1,200 to Armour" and "-30 to Armour" share
+the template "# to Armour". Templates are interned
+into small integer ids so downstream code can group and index on them cheaply.
+"""
+
+import re
+from functools import _CacheInfo, lru_cache  # noqa: WPS450
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+from poe_client.schemas.stash import Item
+
+# Template id returned for unknown templates when the parser isn't learning.
+UNKNOWN_TEMPLATE = -1
+
+# The Item fields holding mod lines, in the order they're reported by ItemMods.
+MOD_FIELDS = ("implicit_mods", "explicit_mods", "crafted_mods", "fractured_mods")
+
+# A single capture group makes re.split alternate text and number parts. A sign
+# directly after a digit is a range, like "1-4", not the sign of the next number.
+_NUMBER = re.compile(r"((?<!\d)[+-]?(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?)")
+_INTEGER = re.compile(r"[+-]?\d+")
+
+ModValue = Union[int, float]
+
+
+class ParsedMod(NamedTuple):
+    """A mod line reduced to its template id and numeric values."""
+
+    template_id: int
+    values: Tuple[ModValue, ...]  # noqa: WPS110
+
+
+class ItemMods(NamedTuple):
+    """The parsed mods of a single item, grouped by the Item field they came from."""
+
+    implicit_mods: List[ParsedMod]
+    explicit_mods: List[ParsedMod]
+    crafted_mods: List[ParsedMod]
+    fractured_mods: List[ParsedMod]
+
+
+def _to_number(text: str) -> ModValue:
+    text = text.replace(",", "")
+    if _INTEGER.fullmatch(text):
+        return int(text)
+    return float(text)
+
+
+class ModParser(object):
+    """Turns mod lines into (template id, values) pairs.
+
+    Signs are part of the values, so "+12 to maximum Life" has the template
+    "# to maximum Life" and the value 12. Parsed lines are memoized in an LRU
+    cache keyed on the exact line, since the same handful of mod lines make up
+    most of the items seen on the river.
+    """
+
+    _template_ids: Dict[str, int]
+    _templates: List[str]
+    _learn: bool
+
+    def __init__(
+        self,
+        templates: Iterable[str] = (),
+        learn: bool = True,
+        cache_size: Optional[int] = 1 << 16,
+    ) -> None:
+        """Initialize a new mod parser.
+
+        Args:
+            templates: Known templates, using "#" for each number. These get
+                assigned ids in order, starting at 0.
+            learn: If set, templates which haven't been seen before are assigned
+                a new id. Otherwise they're parsed with UNKNOWN_TEMPLATE.
+            cache_size: Maximum number of lines to memoize. None means unbounded.
+        """
+        self._template_ids = {}
+        self._templates = []
+        self._learn = learn
+        for template in templates:
+            self._add(template)
+        self._parse_line = lru_cache(maxsize=cache_size)(self._parse_uncached)
+
+    def register(self, template: str) -> int:
+        """Add a template to the index, returning its id."""
+        if template not in self._template_ids and not self._learn:
+            # Lines matching this template may be cached as UNKNOWN_TEMPLATE.
+            self._parse_line.cache_clear()
+        return self._add(template)
+
+    def template(self, template_id: int) -> str:
+        """Get the template text for an id."""
+        if template_id == UNKNOWN_TEMPLATE:
+            raise KeyError(template_id)
+        return self._templates[template_id]
+
+    def template_id(self, template: str) -> Optional[int]:
+        """Get the id of a template, or None if it isn't indexed."""
+        return self._template_ids.get(template)
+
+    @property
+    def templates(self) -> List[str]:
+        """All indexed templates, where the position is the template id."""
+        return list(self._templates)
+
+    def parse(self, line: str) -> ParsedMod:
+        """Parse a single mod line."""
+        return self._parse_line(line)
+
+    def parse_lines(self, lines: Optional[Iterable[str]]) -> List[ParsedMod]:
+        """Parse several mod lines. A missing list parses as an empty one."""
+        if not lines:
+            return []
+        parse_line = self._parse_line
+        return [parse_line(line) for line in lines]
+
+    def parse_item(self, item: Item) -> ItemMods:
+        """Parse all mod lines of an item."""
+        return ItemMods(
+            implicit_mods=self.parse_lines(item.implicit_mods),
+            explicit_mods=self.parse_lines(item.explicit_mods),
+            crafted_mods=self.parse_lines(item.crafted_mods),
+            fractured_mods=self.parse_lines(item.fractured_mods),
+        )
+
+    def parse_items(self, items: Iterable[Item]) -> List[ItemMods]:
+        """Parse the mods of a batch of items, in order."""
+        return [self.parse_item(item) for item in items]
+
+    def cache_info(self) -> _CacheInfo:
+        """Hit and miss statistics of the line cache. See functools.lru_cache."""
+        return self._parse_line.cache_info()
+
+    def _add(self, template: str) -> int:
+        template_id = self._template_ids.get(template)
+        if template_id is None:
+            template_id = len(self._templates)
+            self._template_ids[template] = template_id
+            self._templates.append(template)
+        return template_id
+
+    def _parse_uncached(self, line: str) -> ParsedMod:
+        parts = _NUMBER.split(line)
+        template = "#".join(parts[::2])
+        template_id = self._template_ids.get(template)
+        if template_id is None:
+            if self._learn:
+                template_id = self._add(template)
+            else:
+                template_id = UNKNOWN_TEMPLATE
+        return ParsedMod(
+            template_id=template_id,
+            values=tuple(_to_number(part) for part in parts[1::2]),
+        )
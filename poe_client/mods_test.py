@@ -0,0 +1,76 @@
+from unittest import TestCase
+
+import pytest
+
+from poe_client.conftest import make_item
+from poe_client.mods import UNKNOWN_TEMPLATE, ModParser, ParsedMod
+
+
+class ModParserTest(TestCase):
+    """Tests the mod parser."""
+
+    def setUp(self) -> None:
+        """Sets up the test."""
+        self.parser = ModParser(templates=["Adds # to # Fire Damage"])
+        return super().setUp()
+
+    def test_known_template(self):
+        """Known templates keep the id they were registered with."""
+        assert self.parser.parse("Adds 12 to 24 Fire Damage") == ParsedMod(0, (12, 24))
+
+    def test_learns_templates(self):
+        """Unknown templates get new ids, and keep their sign and decimals."""
+        parsed = self.parser.parse("+1.5% to Critical Strike Chance")
+        assert parsed == ParsedMod(1, (1.5,))
+        assert self.parser.template(1) == "#% to Critical Strike Chance"
+        assert self.parser.parse("+2% to Critical Strike Chance").template_id == 1
+
+    def test_signs_and_separators(self):
+        """Signs and thousands separators are part of the values."""
+        assert self.parser.parse("-30% to Fire Resistance") == ParsedMod(1, (-30,))
+        assert self.parser.parse("+12% to Fire Resistance") == ParsedMod(1, (12,))
+        assert self.parser.parse("+1,200 to Armour") == ParsedMod(2, (1200,))
+        assert self.parser.template(2) == "# to Armour"
+        # A dash between numbers is a range, not a sign.
+        parsed = self.parser.parse("Adds 1-4 Fire Damage")
+        assert parsed == ParsedMod(3, (1, 4))
+        assert self.parser.template(3) == "Adds #-# Fire Damage"
+
+    def test_no_learning(self):
+        """Unknown templates aren't indexed when learning is disabled."""
+        parser = ModParser(learn=False)
+        assert parser.parse("+70 to maximum Life").template_id == UNKNOWN_TEMPLATE
+        assert parser.template_id("# to maximum Life") is None
+
+        template_id = parser.register("# to maximum Life")
+        assert parser.parse("+70 to maximum Life") == ParsedMod(template_id, (70,))
+        with pytest.raises(KeyError):
+            parser.template(UNKNOWN_TEMPLATE)
+
+    def test_memoized(self):
+        """Repeated lines are served from the cache."""
+        self.parser.parse("Adds 1 to 2 Fire Damage")
+        self.parser.parse("Adds 1 to 2 Fire Damage")
+        assert self.parser.cache_info().hits == 1
+
+    def test_parse_items(self):
+        """Batches return one ItemMods per item, grouped by mod field."""
+        items = [
+            make_item(
+                implicit_mods=["Adds 1 to 4 Fire Damage"],
+                explicit_mods=["+70 to maximum Life", "Adds 3 to 7 Fire Damage"],
+            ),
+            make_item(crafted_mods=["+70 to maximum Life"]),
+        ]
+        first, second = self.parser.parse_items(items)
+        life = self.parser.template_id("# to maximum Life")
+        assert life is not None
+
+        assert first.implicit_mods == [ParsedMod(0, (1, 4))]
+        assert first.explicit_mods == [ParsedMod(life, (70,)), ParsedMod(0, (3, 7))]
+        assert first.crafted_mods == []
+        assert second.crafted_mods == [ParsedMod(life, (70,))]
+        assert self.parser.templates == [
+            "Adds # to # Fire Damage",
+            "# to maximum Life",
+        ]
@@ -0,0 +1,208 @@
+"""Passive trees of many characters as bitsets, for comparing builds.
+
+Node hashes are mapped to dense indices as they're seen, and the allocated nodes of
+each character are stored as a single int with one bit per index. Comparing two
+trees is then a bitwise and plus a popcount, instead of set operations on lists of
+hashes.
+"""
+
+import heapq
+import sys
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from poe_client.schemas.character import Character, Passives
+
+if sys.version_info >= (3, 10):
+
+    def _popcount(bits: int) -> int:
+        return bits.bit_count()
+
+else:
+
+    def _popcount(bits: int) -> int:
+        return bin(bits).count("1")
+
+
+class NodeIndex(object):
+    """Maps passive node hashes to dense bit indices."""
+
+    _indices: Dict[int, int]
+    _hashes: List[int]
+
+    def __init__(self) -> None:
+        """Initialize an empty index."""
+        self._indices = {}
+        self._hashes = []
+
+    def __len__(self) -> int:
+        """Number of indexed nodes."""
+        return len(self._hashes)
+
+    def index(self, node_hash: int) -> int:
+        """Get the bit index of a node, assigning the next one if it's new."""
+        found = self._indices.get(node_hash)
+        if found is None:
+            found = len(self._hashes)
+            self._indices[node_hash] = found
+            self._hashes.append(node_hash)
+        return found
+
+    def copy(self) -> "NodeIndex":
+        """Get an independent copy of the index."""
+        copied = NodeIndex()
+        copied._indices = dict(self._indices)  # noqa: WPS437
+        copied._hashes = list(self._hashes)  # noqa: WPS437
+        return copied
+
+    def node_hash(self, index: int) -> int:
+        """Get the node hash of a bit index."""
+        return self._hashes[index]
+
+    def encode(self, hashes: Iterable[int]) -> int:
+        """Pack node hashes into a bitset."""
+        bits = 0
+        for node_hash in hashes:
+            bits |= 1 << self.index(node_hash)
+        return bits
+
+    def decode(self, bits: int) -> List[int]:
+        """Unpack a bitset into node hashes, in index order."""
+        hashes = []
+        while bits:
+            lowest = bits & -bits
+            hashes.append(self._hashes[lowest.bit_length() - 1])
+            bits ^= lowest
+        return hashes
+
+
+def jaccard(first: int, second: int) -> float:
+    """Jaccard similarity of two bitsets: shared nodes over nodes in either."""
+    union = _popcount(first | second)
+    if not union:
+        return 0
+    return _popcount(first & second) / union
+
+
+class PassiveTrees(object):
+    """Passive trees of many characters, keyed by a name like the character id."""
+
+    nodes: NodeIndex
+    _keys: List[str]
+    _positions: Dict[str, int]
+    _bits: List[int]
+    _sizes: List[int]
+
+    def __init__(self, nodes: Optional[NodeIndex] = None) -> None:
+        """Initialize an empty set of trees.
+
+        Args:
+            nodes: Node index to share with other sets of trees, so their bitsets can
+                be compared with each other.
+        """
+        self.nodes = nodes if nodes is not None else NodeIndex()
+        self._keys = []
+        self._positions = {}
+        self._bits = []
+        self._sizes = []
+
+    def __len__(self) -> int:
+        """Number of trees."""
+        return len(self._keys)
+
+    def __contains__(self, key: object) -> bool:
+        """Whether there's a tree for a key."""
+        return key in self._positions
+
+    def add(self, key: str, hashes: Iterable[int]) -> int:
+        """Add or replace the tree for a key.
+
+        Returns:
+            The bitset of the tree.
+        """
+        bits = self.nodes.encode(hashes)
+        position = self._positions.get(key)
+        if position is None:
+            self._positions[key] = len(self._keys)
+            self._keys.append(key)
+            self._bits.append(bits)
+            self._sizes.append(_popcount(bits))
+        else:
+            self._bits[position] = bits
+            self._sizes[position] = _popcount(bits)
+        return bits
+
+    def add_passives(self, key: str, passives: Passives) -> int:
+        """Add the tree of a Passives model, including cluster jewel nodes."""
+        return self.add(key, [*passives.hashes, *passives.hashes_ex])
+
+    def add_character(self, character: Character) -> Optional[int]:
+        """Add the tree of a character keyed by its id, if it has passives."""
+        if character.passives is None:
+            return None
+        return self.add_passives(character.id, character.passives)
+
+    def bits(self, key: str) -> int:
+        """Get the bitset of the tree for a key."""
+        return self._bits[self._positions[key]]
+
+    def hashes(self, key: str) -> List[int]:
+        """Get the allocated node hashes of the tree for a key."""
+        return self.nodes.decode(self.bits(key))
+
+    def node_frequency(self) -> Dict[int, int]:
+        """Count how many trees allocate each node, keyed by node hash."""
+        counts = [0] * len(self.nodes)
+        for bits in self._bits:
+            while bits:
+                lowest = bits & -bits
+                counts[lowest.bit_length() - 1] += 1
+                bits ^= lowest
+        return {
+            self.nodes.node_hash(index): count
+            for index, count in enumerate(counts)
+            if count
+        }
+
+    def similarity(self, first: str, second: str) -> float:
+        """Jaccard similarity of the trees for two keys."""
+        return jaccard(self.bits(first), self.bits(second))
+
+    def most_similar(
+        self,
+        key: Optional[str] = None,
+        hashes: Optional[Iterable[int]] = None,
+        limit: int = 10,
+    ) -> List[Tuple[str, float]]:
+        """Find the trees most similar to a tree, by Jaccard similarity.
+
+        Args:
+            key: Compare against the tree for this key. It's left out of the results.
+            hashes: Compare against a tree of these node hashes instead.
+            limit: Maximum number of results.
+
+        Returns:
+            (key, similarity) pairs, most similar first.
+        """
+        if key is not None:
+            target = self.bits(key)
+        elif hashes is not None:
+            # Nodes no tree has are indexed in a copy, leaving the shared index as
+            # it is. They still count towards the size of the target.
+            target = self.nodes.copy().encode(hashes)
+        else:
+            raise ValueError("Either key or hashes must be set")
+        target_size = _popcount(target)
+
+        scores = []
+        for position, bits in enumerate(self._bits):
+            other = self._keys[position]
+            if other == key:
+                continue
+            shared = _popcount(target & bits)
+            # |a | b| is |a| + |b| - |a & b|, so only one popcount is needed per tree.
+            union = target_size + self._sizes[position] - shared
+            scores.append((shared / union if union else 0, other))
+        return [
+            (other, score)
+            for score, other in heapq.nlargest(limit, scores, key=lambda pair: pair[0])
+        ]
@@ -0,0 +1,109 @@
+from unittest import TestCase
+
+import pytest
+
+from poe_client.passives import NodeIndex, PassiveTrees, jaccard
+from poe_client.schemas.character import Character, Passives
+
+
+class NodeIndexTest(TestCase):
+    """Tests the node index."""
+
+    def test_round_trip(self):
+        """Tests that hashes are packed into bits and back."""
+        nodes = NodeIndex()
+        bits = nodes.encode([500, 12, 9000])
+
+        assert bits == 0b111
+        assert nodes.encode([12]) == 0b010
+        assert nodes.decode(bits) == [500, 12, 9000]
+        assert len(nodes) == 3
+
+    def test_jaccard(self):
+        """Tests the similarity of bitsets."""
+        assert jaccard(0b0111, 0b1110) == 0.5
+        assert jaccard(0, 0) == 0
+
+
+class PassiveTreesTest(TestCase):
+    """Tests sets of passive trees."""
+
+    def setUp(self) -> None:
+        """Sets up the test."""
+        self.trees = PassiveTrees()
+        self.trees.add("witch", [1, 2, 3, 4])
+        self.trees.add("witch clone", [1, 2, 3, 5])
+        self.trees.add("marauder", [7, 8, 9, 1])
+        return super().setUp()
+
+    def test_node_frequency(self):
+        """Tests counting how many trees allocate each node."""
+        assert self.trees.node_frequency() == {
+            1: 3,
+            2: 2,
+            3: 2,
+            4: 1,
+            5: 1,
+            7: 1,
+            8: 1,
+            9: 1,
+        }
+
+    def test_most_similar(self):
+        """Tests top-k similarity queries."""
+        assert self.trees.similarity("witch", "witch clone") == 0.6
+        assert self.trees.most_similar("witch", limit=1) == [("witch clone", 0.6)]
+        assert self.trees.most_similar(hashes=[7, 8, 9]) == [
+            ("marauder", 0.75),
+            ("witch", 0),
+            ("witch clone", 0),
+        ]
+        with pytest.raises(ValueError):
+            self.trees.most_similar()
+
+        # Nodes no tree has count, but aren't added to the shared index.
+        nodes = len(self.trees.nodes)
+        assert self.trees.most_similar(hashes=[7, 8, 9, 100], limit=1) == [
+            ("marauder", 0.6),
+        ]
+        assert len(self.trees.nodes) == nodes
+
+    def test_replace(self):
+        """Tests that adding a key again replaces its tree."""
+        self.trees.add("witch", [9])
+
+        assert len(self.trees) == 3
+        assert self.trees.hashes("witch") == [9]
+        assert self.trees.similarity("witch", "marauder") == 0.25
+
+    def test_add_character(self):
+        """Tests adding the passives of a character, with cluster jewel nodes."""
+        character = Character(
+            id="abc",
+            name="moowiz",
+            class_="Witch",
+            league=None,
+            level=90,
+            experience=None,
+            equipment=None,
+            inventory=None,
+            jewels=None,
+            time=None,
+            score=None,
+            depth=None,
+            account=None,
+            passives=None,
+        )
+        assert self.trees.add_character(character) is None
+
+        character.passives = Passives(
+            hashes=[1, 2],
+            hashes_ex=[60000],
+            bandit_choice=None,
+            pantheon_major=None,
+            pantheon_minor=None,
+            jewel_data={},
+        )
+        self.trees.add_character(character)
+        assert "abc" in self.trees
+        assert self.trees.hashes("abc") == [1, 2, 60000]
@@ -0,0 +1,217 @@
+"""Many tokens sharing one connection pool and the client and IP rate limits."""
+
+import asyncio
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from functools import partial
+from types import TracebackType
+from typing import AsyncIterator, Deque, Dict, Hashable, Optional, Type
+
+import aiohttp
+
+from poe_client.cache import ModelCache
+from poe_client.client import PoEClient
+from poe_client.metrics import LimiterMetrics
+from poe_client.rate_limiter import RateLimiter
+from poe_client.timing import RequestTimings
+
+
+class FairScheduler(object):
+    """Limits requests in flight, taking turns between keys when it's full.
+
+    Waiting requests are queued per key, and freed slots go to the keys in round
+    robin order, so a key with many queued requests can't starve the others.
+    """
+
+    max_concurrency: int
+    _available: int
+    _queues: "OrderedDict[Hashable, Deque[asyncio.Future[None]]]"
+
+    def __init__(self, max_concurrency: int = 10) -> None:
+        """Initialize a new scheduler.
+
+        Args:
+            max_concurrency: Maximum number of requests in flight over every key.
+        """
+        self.max_concurrency = max_concurrency
+        self._available = max_concurrency
+        self._queues = OrderedDict()
+
+    @property
+    def waiting(self) -> int:
+        """Number of requests waiting for a slot."""
+        return sum(len(queue) for queue in self._queues.values())
+
+    async def acquire(self, key: Hashable) -> None:
+        """Wait for a slot for key."""
+        if self._available > 0 and not self._queues:
+            self._available -= 1
+            return
+
+        waiter = asyncio.get_event_loop().create_future()
+        self._queues.setdefault(key, deque()).append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the wait was cancelled.
+                self.release()
+            else:
+                self._forget(key, waiter)
+            raise
+
+    def release(self) -> None:
+        """Free a slot, handing it to the next key waiting for one."""
+        while self._queues:
+            key, queue = next(iter(self._queues.items()))
+            waiter = queue.popleft()
+            if queue:
+                self._queues.move_to_end(key)
+            else:
+                del self._queues[key]  # noqa: WPS420
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._available += 1
+
+    @asynccontextmanager
+    async def slot(self, key: Hashable) -> AsyncIterator[None]:
+        """Hold a slot for key for the duration of the context."""
+        await self.acquire(key)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def _forget(self, key: Hashable, waiter: "asyncio.Future[None]") -> None:
+        queue = self._queues.get(key)
+        if queue is None:
+            return
+        try:
+            queue.remove(waiter)
+        except ValueError:
+            return
+        if not queue:
+            del self._queues[key]  # noqa: WPS420
+
+
+class ClientPool(object):
+    """Hands out clients for many tokens which share one connection pool.
+
+    Every client keeps its own state for account scoped rate limit rules, while the
+    state of client and IP scoped rules is shared between all of them, as the API
+    counts those against every token alike. Requests in flight are capped over the
+    whole pool, with tokens taking turns when the cap is reached.
+    """
+
+    user_agent: str
+    scheduler: FairScheduler
+    limiter: RateLimiter
+
+    _model_cache: Optional[ModelCache]
+    _base_url: Optional[str]
+    _timings: Optional[RequestTimings]
+    _metrics: Optional[LimiterMetrics]
+    _connection_limit: int
+    _session: Optional[aiohttp.ClientSession]
+    _clients: Dict[str, PoEClient]
+    _created: int
+
+    def __init__(  # noqa: WPS211
+        self,
+        user_agent: str,
+        max_concurrency: int = 10,
+        connection_limit: int = 100,
+        model_cache: Optional[ModelCache] = None,
+        base_url: Optional[str] = None,
+        timings: Optional[RequestTimings] = None,
+        metrics: Optional[LimiterMetrics] = None,
+    ) -> None:
+        """Initialize a new pool.
+
+        Args:
+            user_agent: An OAuth user agent, used by every client of the pool.
+            max_concurrency: Maximum number of requests in flight over every token.
+            connection_limit: Maximum number of open connections.
+            model_cache: If set, shared by every client of the pool.
+            base_url: Base URL of the API. Defaults to the PoE API.
+            timings: If set, records the phase timings of every client's requests.
+            metrics: If set, counts the rate limit utilization of every client. The
+                shared limiter is labelled "shared", and clients "token-<n>" in the
+                order they're created, to keep tokens out of the metrics.
+        """
+        self.user_agent = user_agent
+        self.scheduler = FairScheduler(max_concurrency)
+        self.limiter = RateLimiter(metrics=metrics)
+        if metrics is not None:
+            metrics.register(self.limiter, "shared")
+        self._created = 0
+        self._model_cache = model_cache
+        self._base_url = base_url
+        self._timings = timings
+        self._metrics = metrics
+        self._connection_limit = connection_limit
+        self._session = None
+        self._clients = {}
+
+    def __len__(self) -> int:
+        """Number of tokens with a client."""
+        return len(self._clients)
+
+    async def __aenter__(self) -> "ClientPool":
+        """Runs on entering `async with`."""
+        self._session = aiohttp.ClientSession(
+            raise_for_status=True,
+            connector=aiohttp.TCPConnector(limit=self._connection_limit),
+            trace_configs=[self._timings.trace_config()] if self._timings else None,
+        )
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[TracebackType],
+    ) -> Optional[bool]:
+        """Runs on exiting `async with`."""
+        if self._session is not None:
+            await self._session.close()
+        self._session = None
+        self._clients.clear()
+        if exc_val:
+            raise exc_val
+        return True
+
+    def client(self, token: str) -> PoEClient:
+        """Get the client of a token, creating it on first use.
+
+        The client is ready to use as is, without `async with`, until the pool is
+        exited.
+        """
+        if self._session is None:
+            raise RuntimeError("ClientPool must be entered before getting clients")
+
+        pooled = self._clients.get(token)
+        if pooled is None:
+            limiter = RateLimiter(shared=self.limiter, metrics=self._metrics)
+            self._created += 1
+            if self._metrics is not None:
+                self._metrics.register(limiter, "token-{0}".format(self._created))
+            pooled = PoEClient(
+                self.user_agent,
+                token,
+                model_cache=self._model_cache,
+                limiter=limiter,
+                session=self._session,
+                request_slot=partial(self.scheduler.slot, token),
+                base_url=self._base_url,
+                timings=self._timings,
+            )
+            self._clients[token] = pooled
+        return pooled
+
+    def remove(self, token: str) -> None:
+        """Forget the client of a token, like when it's revoked."""
+        pooled = self._clients.pop(token, None)
+        if pooled is not None and self._metrics is not None:
+            self._metrics.unregister(pooled.limiter)
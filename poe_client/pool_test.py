@@ -0,0 +1,126 @@
+import asyncio
+from typing import List, Optional
+from unittest import IsolatedAsyncioTestCase, mock
+
+import pytest
+
+from poe_client.conftest import make_headers
+from poe_client.mockserver import MockData, MockServer
+from poe_client.pool import ClientPool, FairScheduler
+
+
+class FairSchedulerTest(IsolatedAsyncioTestCase):
+    """Tests the fair scheduler."""
+
+    async def test_round_robin(self):
+        """Tests that freed slots go to waiting keys in turns."""
+        scheduler = FairScheduler(max_concurrency=1)
+        order = []
+
+        async def request(key: str) -> None:  # noqa: WPS430
+            async with scheduler.slot(key):
+                order.append(key)
+                await asyncio.sleep(0)
+
+        await scheduler.acquire("blocker")
+        tasks = [
+            asyncio.ensure_future(request(key))
+            for key in ("a", "a", "a", "b", "c", "b")
+        ]
+        await asyncio.sleep(0)
+        assert scheduler.waiting == 6
+
+        scheduler.release()
+        await asyncio.gather(*tasks)
+        assert order == ["a", "b", "c", "a", "b", "a"]
+        assert scheduler.waiting == 0
+
+    async def test_cancelled_waiter(self):
+        """Tests that a cancelled waiter gives up its place and its slot."""
+        scheduler = FairScheduler(max_concurrency=1)
+        await scheduler.acquire("a")
+        waiter = asyncio.ensure_future(scheduler.acquire("b"))
+        await asyncio.sleep(0)
+
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert scheduler.waiting == 0
+
+        scheduler.release()
+        await asyncio.wait_for(scheduler.acquire("c"), timeout=1)
+
+
+class ClientPoolTest(IsolatedAsyncioTestCase):
+    """Tests the client pool."""
+
+    async def test_clients(self):
+        """Tests that clients share the session and the shared limiter."""
+        async with ClientPool("test user agent") as pool:
+            first = pool.client("first token")
+            second = pool.client("second token")
+
+            assert pool.client("first token") is first
+            assert len(pool) == 2
+            assert first._client is second._client  # noqa: WPS437
+            assert first.limiter is not second.limiter
+            assert first.limiter.shared is pool.limiter
+            assert second.limiter.shared is pool.limiter
+
+            pool.remove("first token")
+            assert pool.client("first token") is not first
+
+        assert not pool
+
+    async def test_slot_between_rules(self):
+        """Tests that requests take a slot after their token's rules admit them.
+
+        The shared rules only count them once they hold the slot.
+        """
+        free_slots: List[int] = []
+
+        async def get_semaphore(  # noqa: WPS430
+            *args: object,
+            shared: Optional[bool] = None,
+        ) -> bool:
+            free_slots.append(pool.scheduler._available)  # noqa: WPS437
+            if shared:
+                raise RuntimeError("Stop before sending")
+            return True
+
+        async with ClientPool("test user agent", max_concurrency=1) as pool:
+            pooled = pool.client("token")
+            with mock.patch.object(pooled.limiter, "get_semaphore", get_semaphore):
+                with pytest.raises(RuntimeError):
+                    await pooled.get_profile()
+
+        assert free_slots == [1, 0]
+        assert pool.scheduler._available == 1  # noqa: WPS437
+
+    async def test_throttled_token(self):
+        """Tests that a token waiting on its own rules leaves the slots to others."""
+        data = MockData(ladder_size=10, stash_tabs=1)
+        async with MockServer(data=data) as server:
+            async with ClientPool(
+                "test user agent",
+                max_concurrency=1,
+                base_url=str(server.url),
+            ) as pool:
+                throttled = pool.client("throttled token")
+                await throttled.limiter.parse_headers(make_headers("5:10:0,5:300:0"))
+                waiting = asyncio.ensure_future(throttled.get_profile())
+                await asyncio.sleep(0.01)
+
+                other = pool.client("other token")
+                profile = await asyncio.wait_for(other.get_profile(), timeout=1)
+                assert profile.name == "mock_account"
+                assert pool.scheduler._available == 1  # noqa: WPS437
+
+                waiting.cancel()
+                with pytest.raises(asyncio.CancelledError):
+                    await waiting
+
+    async def test_not_entered(self):
+        """Tests that clients can't be made before entering the pool."""
+        with pytest.raises(RuntimeError):
+            ClientPool("test user agent").client("token")
@@ -1,27 +1,65 @@
 import asyncio
 import logging
+import time
 from datetime import datetime
-from typing import Dict
+from typing import Awaitable, Dict, FrozenSet, Iterator, List, Optional, Tuple
+
+from poe_client.events import bus
+from poe_client.metrics import LimiterMetrics
+
+# Rules which limit the client or IP address rather than the account of a token.
+# Their state is the same for every token, so a pool of clients shares it.
+SHARED_RULES = frozenset(("client", "ip"))
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """Raised when a request can't be admitted before its deadline.
+
+    The limiter raises it up front, instead of waiting, when the policies of a
+    request already predict a longer wait than the time left.
+    """
+
+    predicted_wait: float
+
+    def __init__(self, predicted_wait: float) -> None:
+        """Initialize a new error for a request predicted to wait some seconds."""
+        super().__init__(
+            "Request can't be admitted in time, predicted wait {0:.1f}s".format(
+                predicted_wait,
+            ),
+        )
+        self.predicted_wait = predicted_wait
 
 
 class PolicyState(object):
     """Stores state information about a policy."""
 
     current_hits: int
+    # Hits in the last state reported by the API, without the ones counted since.
+    reported_hits: int
     restriction: int
     last_request: datetime
+    # Monotonic times of the first hit of the current window, and of the last update.
+    window_started: Optional[float]
+    updated_at: float
 
     def __init__(self, current_hits, restriction) -> None:
         """State of a single policy."""
         self.current_hits = current_hits
+        self.reported_hits = current_hits
         self.restriction = restriction
         self.last_request = datetime.now()
+        self.window_started = time.monotonic() if current_hits else None
+        self.updated_at = time.monotonic()
 
     def reset(self) -> None:
         """Reset to default values."""
         self.restriction = 0
         self.current_hits = 0
+        self.reported_hits = 0
         self.last_request = datetime.now()
+        self.window_started = None
+        self.updated_at = time.monotonic()
 
 
 class Policy(object):
@@ -32,6 +70,8 @@ class Policy(object):
     period: int
     restriction: int
     state: PolicyState
+    # Hits reserved ahead of time by reservations which haven't been used yet.
+    reserved: int
 
     mutex: asyncio.Lock
 
@@ -42,24 +82,114 @@ class Policy(object):
         self.period = period
         self.restriction = restriction
         self.state = PolicyState(current_hits=0, restriction=0)
+        self.reserved = 0
         self.mutex = asyncio.Lock()
 
-    async def update_state(self, current_hits: int, restriction: int):
-        """Update the state of the policy."""
+    async def update_state(
+        self,
+        current_hits: int,
+        restriction: int,
+        reported: bool = True,
+    ):
+        """Update the state of the policy.
+
+        Args:
+            current_hits: The hits in the current window.
+            restriction: The seconds the policy is restricted for.
+            reported: Whether the state was reported by the API, rather than
+                counted locally. Only a drop in the reported hits starts a new
+                window.
+        """
         async with self.mutex:
-            logging.debug(
-                "Updating state[{0}] to {1} hits, {2} restriction".format(
-                    self.name,
-                    current_hits,
-                    restriction,
+            if bus.active:
+                bus.emit(
+                    "policy.update",
+                    policy=self.name,
+                    hits=current_hits,
+                    restriction=restriction,
                 )
-            )
+            now = time.monotonic()
+            if not current_hits:
+                self.state.window_started = None
+            elif self.state.window_started is None or (
+                reported and current_hits < self.state.reported_hits
+            ):
+                # Hits only drop once a window passed, so a new one started.
+                self.state.window_started = now
             self.state.current_hits = current_hits
+            if reported:
+                self.state.reported_hits = current_hits
             self.state.restriction = restriction
+            self.state.updated_at = now
+
+    def resets_in(self, now: float) -> float:
+        """Estimate the seconds until the current window frees up.
 
-    async def get_semaphore(self) -> bool:
-        """Check state to see if request is allowed."""
-        logging.debug("{0} = {1}".format(self.name, self.state.__dict__))
+        The API doesn't say when a window started, so it's taken to start with the
+        first hit seen in it, or when the reported hits drop.
+        """
+        if self.state.window_started is None:
+            return 0
+        return max(self.state.window_started + self.period - now, 0)
+
+    def restricted_for(self, now: float) -> float:
+        """Seconds left of the restriction last reported by the API."""
+        if not self.state.restriction:
+            return 0
+        return max(self.state.updated_at + self.state.restriction - now, 0)
+
+    def predicted_wait(self, reservation: Optional["Reservation"] = None) -> float:
+        """Seconds get_semaphore would sleep before allowing a request now."""
+        if self.state.restriction:
+            return self.state.restriction + 1
+        if self._taken(reservation) >= self.max_hits:
+            return self.period + 1
+        return 0
+
+    def estimate_wait(self, count: int, now: float) -> float:
+        """Estimate the seconds until count more requests could all be admitted.
+
+        Hits reserved ahead of time count as taken. Windows after the current one
+        are assumed to free up a period apart.
+        """
+        if self.state.restriction:
+            start = self.restricted_for(now)
+            free = self.max_hits - self.reserved
+            next_window = start + self.period
+        else:
+            start = 0
+            free = self.max_hits - self._taken(None)
+            next_window = self.resets_in(now) or self.period
+        if count <= free:
+            return start
+        over = count - max(free, 0)
+        return next_window + (over - 1) // self.max_hits * self.period
+
+    def release(self) -> None:
+        """Give back the hit of a request which was cancelled before being sent."""
+        if self.state.current_hits:
+            self.state.current_hits -= 1
+
+    async def get_semaphore(
+        self,
+        counted: Optional[List["Policy"]] = None,
+        reservation: Optional["Reservation"] = None,
+    ) -> bool:
+        """Check state to see if request is allowed.
+
+        Args:
+            counted: If set, the policy is appended to it once the request counts
+                as a hit, so the hit can be released if the request is cancelled.
+            reservation: The reservation of the request, if any, so the slots it
+                reserved don't hold it back.
+        """
+        if bus.active:
+            bus.emit(
+                "policy.check",
+                policy=self.name,
+                hits=self.state.current_hits,
+                restriction=self.state.restriction,
+            )
 
         # If last request was restricted, wait and allow
         if self.state.restriction:
@@ -71,7 +201,7 @@ class Policy(object):
             await asyncio.sleep(self.state.restriction + 1)
             return True
 
-        if self.state.current_hits >= self.max_hits:
+        if self._taken(reservation) >= self.max_hits:
             logging.info(
                 "Rate limiter max hits reached. Sleeping for {0} seconds".format(
                     self.period
@@ -81,24 +211,107 @@ class Policy(object):
             return True
 
         # If we haven't reached the quota, increase and allow
-        if self.state.current_hits < self.max_hits:
-            await self.update_state(self.state.current_hits + 1, self.state.restriction)
+        if self._taken(reservation) < self.max_hits:
+            await self.update_state(
+                self.state.current_hits + 1,
+                self.state.restriction,
+                reported=False,
+            )
+            if counted is not None:
+                counted.append(self)
             return True
 
         # Don't allow by default
         return False
 
+    def _taken(self, reservation: Optional["Reservation"]) -> int:
+        # Hits counting against the quota of a request. Reserved hits are only
+        # available to the requests of the reservation holding them.
+        taken = self.state.current_hits + self.reserved
+        if reservation is not None:
+            taken -= reservation.held(self)
+        return taken
+
+
+class Reservation(object):
+    """Rate limit slots reserved ahead of time for a number of requests.
+
+    Until they're used or released, reserved slots count as taken for every other
+    request, so the requests of the reservation are admitted first.
+    """
+
+    policy_name: str
+    remaining: int
+    # Estimated seconds until every reserved request could be admitted, from when
+    # the slots were reserved, or None if no policy was known.
+    wait: Optional[float]
+
+    _limits: List[Policy]
+
+    def __init__(
+        self,
+        policy_name: str,
+        count: int,
+        limits: List[Policy],
+        wait: Optional[float],
+    ) -> None:
+        """Reserve count slots in every limit."""
+        self.policy_name = policy_name
+        self.remaining = count
+        self.wait = wait
+        self._limits = limits
+        for limit in limits:
+            limit.reserved += count
+
+    def held(self, limit: Policy) -> int:
+        """Get the slots the reservation still holds in a limit."""
+        if limit in self._limits:
+            return self.remaining
+        return 0
+
+    def use(self) -> None:
+        """Use up a slot, once its request was admitted."""
+        if not self.remaining:
+            return
+        self.remaining -= 1
+        for limit in self._limits:
+            limit.reserved -= 1
+
+    def release(self) -> None:
+        """Give back the slots which weren't used."""
+        for limit in self._limits:
+            limit.reserved -= self.remaining
+        self.remaining = 0
+
 
 class RateLimiter(object):
     """Class for supporting the PoE API rate limitation."""
 
     policies: Dict[str, Dict[str, Policy]]
     mutex: asyncio.Lock
-
-    def __init__(self):
-        """Initialize a new RateLimiter."""
+    shared: Optional["RateLimiter"]
+    shared_rules: FrozenSet[str]
+    metrics: Optional[LimiterMetrics]
+
+    def __init__(
+        self,
+        shared: Optional["RateLimiter"] = None,
+        shared_rules: FrozenSet[str] = SHARED_RULES,
+        metrics: Optional[LimiterMetrics] = None,
+    ):
+        """Initialize a new RateLimiter.
+
+        Args:
+            shared: If set, the state of rules named in shared_rules is kept in this
+                limiter instead, so it's shared with every other limiter using it.
+            shared_rules: Lower case names of the rules kept in the shared limiter.
+            metrics: If set, every admitted request and its wait are counted in it.
+        """
         self.policies = {}
         self.mutex = asyncio.Lock()
+        self.shared = shared
+        self.shared_rules = shared_rules
+        self.metrics = metrics
 
     async def parse_headers(self, headers) -> str:
         """Parse response headers into policies.
@@ -114,17 +327,18 @@ class RateLimiter(object):
         rule_names = headers["X-Rate-Limit-Rules"].split(",")
         for rule_name in rule_names:
             policy_id = "{0}/{1}".format(policy_name, rule_name)
+            owner = self._owner(rule_name)
 
-            if policy_id not in self.policies.keys():
-                async with self.mutex:
-                    self.policies[policy_id] = {}
+            if policy_id not in owner.policies.keys():
+                async with owner.mutex:
+                    owner.policies[policy_id] = {}
 
             for rule in headers["X-Rate-Limit-{0}".format(rule_name)].split(","):
                 hits, period, restriction = rule.split(":")
 
-                if period not in self.policies[policy_id].keys():
-                    async with self.mutex:
-                        self.policies[policy_id][period] = Policy(
+                if period not in owner.policies[policy_id].keys():
+                    async with owner.mutex:
+                        owner.policies[policy_id][period] = Policy(
                             rule,
                             int(hits),
                             int(period),
@@ -135,29 +349,236 @@ class RateLimiter(object):
                 ",",
             ):
                 hits, period, restriction = state.split(":")
-                await self.policies[policy_id][period].update_state(
+                await owner.policies[policy_id][period].update_state(
                     int(hits),
                     int(restriction),
                 )
 
         return policy_name
 
-    async def get_semaphore(self, policy_name: str) -> bool:
-        """Get a semaphore to make a request."""
-        async with self.mutex:
-            if not self.policies:
-                logging.debug("No policies, do a blocking request")
-                return False
+    def headroom(self, policy_name: str) -> Optional[int]:
+        """Get how many more requests the policies for a name currently allow.
+
+        Returns the smallest number of hits left across every rule of the policy,
+        0 if any rule is restricted, or None if no matching policies are known yet.
+        Hits reserved ahead of time count as taken.
+        """
+        remaining = None
+        for _, policy in self._matching(policy_name):
+            for limit in policy.values():
+                taken = limit.state.current_hits + limit.reserved
+                left = max(limit.max_hits - taken, 0)
+                if limit.state.restriction:
+                    left = 0
+                if remaining is None or left < remaining:
+                    remaining = left
+        if remaining is None:
+            return None
+        return max(remaining, 0)
+
+    def rate(self, policy_name: str) -> Optional[float]:
+        """Get the sustained requests per second the policies for a name allow.
+
+        This is the tightest max_hits / period across every rule of the policy, or
+        None if no matching policies are known yet.
+        """
+        rates = [
+            limit.max_hits / limit.period
+            for _, policy in self._matching(policy_name)
+            for limit in policy.values()  # noqa: WPS361
+        ]
+        return min(rates) if rates else None
+
+    def predicted_wait(
+        self,
+        policy_name: str,
+        reservation: Optional[Reservation] = None,
+    ) -> float:
+        """Get the seconds a request with a policy name would wait to be admitted now.
+
+        This is the longest sleep across every rule of the policy. Requests already
+        waiting ahead of it can make the actual wait longer. Slots held by the
+        reservation, if given, are free for the request.
+        """
+        waits = [
+            limit.predicted_wait(reservation) for limit in self._limits(policy_name)
+        ]
+        return max(waits, default=0)
+
+    def estimate_wait(self, policy_name: str, count: int = 1) -> Optional[float]:
+        """Estimate the seconds until count more requests could be admitted.
+
+        The estimate comes from the last known state of every rule of the policy,
+        and counts slots reserved with reserve as taken. Each window is estimated
+        on its own and the longest wait wins, so it can be low when several
+        windows are nearly full at once.
+
+        Returns:
+            The seconds from now, or None if no matching policies are known yet.
+        """
+        limits = self._limits(policy_name)
+        if not limits:
+            return None
+        now = time.monotonic()
+        return max(limit.estimate_wait(count, now) for limit in limits)
 
-            semaphores = []
-            for name, policy in self.policies.items():
-                if not name.startswith(policy_name):
-                    continue
+    def reserve(self, policy_name: str, count: int) -> Reservation:
+        """Reserve slots for count requests with a policy name ahead of time.
 
-                logging.debug("getting semaphore {0}".format(name))
-                for limit in policy.values():
-                    semaphores.append(limit.get_semaphore())
+        Pass the reservation to get_semaphore with each of the requests, and
+        release the slots which weren't used once done.
 
-            if semaphores:
-                await asyncio.gather(*semaphores)
+        Returns:
+            The reservation, with the estimated wait for all of its requests.
+        """
+        wait = self.estimate_wait(policy_name, count)
+        return Reservation(policy_name, count, self._limits(policy_name), wait)
+
+    async def get_semaphore(
+        self,
+        policy_name: str,
+        deadline: Optional[float] = None,
+        reservation: Optional[Reservation] = None,
+        shared: Optional[bool] = None,
+    ) -> bool:
+        """Get a semaphore to make a request.
+
+        Args:
+            policy_name: Rate limit policy of the request.
+            deadline: If set, the monotonic time the request must be admitted by.
+                If the policies predict a longer wait, DeadlineExceeded is raised
+                right away instead of waiting.
+            reservation: If set and it has slots left, the request uses one.
+            shared: If set, only the rules kept in the shared limiter (True) or in
+                this one (False) admit the request, so it can wait on them
+                separately. The reservation is only used by the shared ones.
+        """
+        if self.metrics is None:
+            return await self._get_semaphore(
+                policy_name,
+                deadline,
+                reservation,
+                shared,
+            )
+
+        started = time.monotonic()
+        admitted = await self._get_semaphore(
+            policy_name,
+            deadline,
+            reservation,
+            shared,
+        )
+        self.metrics.record_admitted(policy_name, time.monotonic() - started)
+        return admitted
+
+    async def _get_semaphore(
+        self,
+        policy_name: str,
+        deadline: Optional[float],
+        reservation: Optional[Reservation],
+        shared: Optional[bool],
+    ) -> bool:
+        self._check_deadline(policy_name, deadline, reservation, shared)
+
+        async with self.mutex:
+            if self._blocking(policy_name):
+                return False
+
+            # The state may have changed while waiting for the mutex.
+            self._check_deadline(policy_name, deadline, reservation, shared)
+            await self._acquire(policy_name, reservation, shared)
+            if reservation is not None and shared is not False:
+                reservation.use()
             return True
+
+    def _blocking(self, policy_name: str) -> bool:
+        # Until a response told the policies, there's nothing to wait on.
+        if self.policies or (self.shared and self.shared.policies):
+            return False
+        if bus.active:
+            bus.emit("limiter.blocking", policy=policy_name)
+        return True
+
+    async def _acquire(
+        self,
+        policy_name: str,
+        reservation: Optional[Reservation],
+        shared: Optional[bool],
+    ) -> None:
+        # Wait until every matching window admits the request.
+        counted: List[Policy] = []
+        try:
+            await asyncio.gather(
+                *self._semaphores(policy_name, reservation, shared, counted),
+            )
+        except asyncio.CancelledError:
+            # The request won't be sent, so its hits are free again.
+            for limit in counted:
+                limit.release()
+            raise
+
+    def _semaphores(
+        self,
+        policy_name: str,
+        reservation: Optional[Reservation],
+        shared: Optional[bool],
+        counted: List[Policy],
+    ) -> List[Awaitable[bool]]:
+        semaphores: List[Awaitable[bool]] = []
+        for name, policy in self._matching(policy_name, shared):
+            if bus.active:
+                bus.emit("limiter.acquire", policy=name)
+            for limit in policy.values():
+                semaphores.append(limit.get_semaphore(counted, reservation))
+        return semaphores
+
+    def _check_deadline(
+        self,
+        policy_name: str,
+        deadline: Optional[float],
+        reservation: Optional[Reservation],
+        shared: Optional[bool],
+    ) -> None:
+        if deadline is None:
+            return
+        waits = [
+            limit.predicted_wait(reservation)
+            for _, policy in self._matching(policy_name, shared)
+            for limit in policy.values()  # noqa: WPS361
+        ]
+        predicted = max(waits, default=0)
+        if predicted and time.monotonic() + predicted > deadline:
+            if bus.active:
+                bus.emit("limiter.reject", policy=policy_name, predicted_wait=predicted)
+            raise DeadlineExceeded(predicted)
+
+    def _owner(self, rule_name: str) -> "RateLimiter":
+        # The limiter keeping the state of a rule.
+        if self.shared is not None and rule_name.lower() in self.shared_rules:
+            return self.shared
+        return self
+
+    def _matching(
+        self,
+        policy_name: str,
+        shared: Optional[bool] = None,
+    ) -> Iterator[Tuple[str, Dict[str, Policy]]]:
+        # Policies for a name, from this limiter and then the shared one, or only
+        # from the shared one or this one if shared is set.
+        limiters: List[RateLimiter] = []
+        if not shared:
+            limiters.append(self)
+        if shared is not False and self.shared is not None:
+            limiters.append(self.shared)
+        for limiter in limiters:
+            for name, policy in limiter.policies.items():
+                if name.startswith(policy_name):
+                    yield name, policy
+
+    def _limits(self, policy_name: str) -> List[Policy]:
+        # Every window of every rule matching a name.
+        return [
+            limit
+            for _, policy in self._matching(policy_name)
+            for limit in policy.values()  # noqa: WPS361
+        ]
@@ -0,0 +1,207 @@
+import asyncio
+import time
+from unittest import IsolatedAsyncioTestCase
+
+import pytest
+
+from poe_client.conftest import make_headers
+from poe_client.rate_limiter import DeadlineExceeded, RateLimiter
+
+
+class RateLimiterTest(IsolatedAsyncioTestCase):
+    """Tests the rate limiter."""
+
+    def setUp(self) -> None:
+        """Sets up the test."""
+        self.limiter = RateLimiter()
+        return super().setUp()
+
+    async def test_parse_headers(self):
+        """Tests that every window of a rule becomes a policy."""
+        policy_name = await self.limiter.parse_headers(make_headers())
+
+        assert policy_name == "character-request-limit"
+        windows = self.limiter.policies["character-request-limit/Account"]
+        assert sorted(windows) == ["10", "300"]
+        assert windows["10"].max_hits == 5
+        assert windows["10"].state.current_hits == 1
+
+    async def test_headroom(self):
+        """Tests that headroom is the smallest number of hits left."""
+        assert self.limiter.headroom("character-request-limit") is None
+
+        await self.limiter.parse_headers(make_headers("3:10:0,28:300:0"))
+        assert self.limiter.headroom("character-request-limit") == 2
+
+        await self.limiter.parse_headers(make_headers("1:10:0,1:300:300"))
+        assert self.limiter.headroom("character-request-limit") == 0
+
+    async def test_rate(self):
+        """Tests that the rate is the tightest of all windows."""
+        assert self.limiter.rate("character-request-limit") is None
+
+        await self.limiter.parse_headers(make_headers())
+        assert self.limiter.rate("character-request-limit") == 0.1
+
+    async def test_shared_rules(self):
+        """Tests that client and IP rules are kept in the shared limiter."""
+        shared = RateLimiter()
+        first = RateLimiter(shared=shared)
+        second = RateLimiter(shared=shared)
+        headers = make_headers("3:10:0,3:300:0")
+        headers["X-Rate-Limit-Rules"] = "Account,Client"
+        headers["X-Rate-Limit-Client"] = "10:10:60"
+        headers["X-Rate-Limit-Client-State"] = "9:10:0"
+
+        await first.parse_headers(headers)
+
+        assert list(first.policies) == ["character-request-limit/Account"]
+        assert list(shared.policies) == ["character-request-limit/Client"]
+        assert first.headroom("character-request-limit") == 1
+        # The second limiter hasn't seen its account rule yet, only the shared one.
+        assert second.headroom("character-request-limit") == 1
+        assert await second.get_semaphore("character-request-limit")
+        assert second.headroom("character-request-limit") == 0
+        assert first.headroom("character-request-limit") == 0
+
+    async def test_windows(self):
+        """Tests estimating when windows free up and restrictions end."""
+        await self.limiter.parse_headers(make_headers("3:10:0,28:300:300"))
+        windows = self.limiter.policies["character-request-limit/Account"]
+        now = windows["10"].state.updated_at
+
+        assert windows["10"].resets_in(now + 4) == pytest.approx(6)
+        assert windows["10"].restricted_for(now) == 0
+        assert windows["300"].restricted_for(now + 100) == pytest.approx(200)
+
+        await self.limiter.parse_headers(make_headers("0:10:0,0:300:0"))
+        assert windows["10"].resets_in(now) == 0
+
+    async def test_window_restart(self):
+        """Tests that a window restarts when the reported hits drop."""
+        await self.limiter.parse_headers(make_headers("3:10:0,3:300:0"))
+        window = self.limiter.policies["character-request-limit/Account"]["10"]
+        window.state.window_started = window.state.updated_at - 8
+
+        await self.limiter.parse_headers(make_headers("4:10:0,4:300:0"))
+        assert window.resets_in(window.state.updated_at) == pytest.approx(2, abs=0.1)
+
+        await self.limiter.parse_headers(make_headers("1:10:0,5:300:0"))
+        assert window.resets_in(window.state.updated_at) == pytest.approx(10)
+
+    async def test_window_counted_hits(self):
+        """Tests that hits counted locally don't restart a window when reported."""
+        await self.limiter.parse_headers(make_headers("1:10:0,1:300:0"))
+        window = self.limiter.policies["character-request-limit/Account"]["10"]
+        window.state.window_started = window.state.updated_at - 8
+        for _ in range(3):
+            assert await self.limiter.get_semaphore("character-request-limit")
+        assert window.state.current_hits == 4
+
+        # Responses to the earlier requests report fewer hits than were counted.
+        await self.limiter.parse_headers(make_headers("2:10:0,2:300:0"))
+        assert window.resets_in(window.state.updated_at) == pytest.approx(2, abs=0.1)
+
+    async def test_deadline(self):
+        """Tests rejecting requests which can't be admitted before a deadline."""
+        await self.limiter.parse_headers(make_headers("5:10:0,5:300:0"))
+        assert self.limiter.predicted_wait("character-request-limit") == 11
+
+        with pytest.raises(DeadlineExceeded) as error:
+            await self.limiter.get_semaphore(
+                "character-request-limit",
+                time.monotonic() + 5,
+            )
+        assert error.value.predicted_wait == 11
+
+        await self.limiter.parse_headers(make_headers("1:10:0,1:300:0"))
+        assert self.limiter.predicted_wait("character-request-limit") == 0
+        assert await self.limiter.get_semaphore(
+            "character-request-limit",
+            time.monotonic() + 5,
+        )
+
+    async def test_cancel_releases_hits(self):
+        """Tests that a request cancelled while waiting gives back its hits."""
+        await self.limiter.parse_headers(make_headers("1:10:0,30:300:0"))
+        windows = self.limiter.policies["character-request-limit/Account"]
+
+        waiting = asyncio.create_task(
+            self.limiter.get_semaphore("character-request-limit"),
+        )
+        await asyncio.sleep(0.01)
+        # The 10 second window counted the request, the 300 second one is full.
+        assert windows["10"].state.current_hits == 2
+
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert windows["10"].state.current_hits == 1
+        assert not self.limiter.mutex.locked()
+
+    async def test_estimate_wait(self):
+        """Tests estimating when a number of requests could be admitted."""
+        assert self.limiter.estimate_wait("character-request-limit") is None
+
+        await self.limiter.parse_headers(make_headers("3:10:0,28:300:0"))
+        assert self.limiter.estimate_wait("character-request-limit", 2) == 0
+        # The third request waits for the 300 second window to free up.
+        wait = self.limiter.estimate_wait("character-request-limit", 3)
+        assert wait == pytest.approx(300, abs=1)
+
+        await self.limiter.parse_headers(make_headers("1:10:0,1:300:300"))
+        wait = self.limiter.estimate_wait("character-request-limit", 1)
+        assert wait == pytest.approx(300, abs=1)
+        wait = self.limiter.estimate_wait("character-request-limit", 6)
+        assert wait == pytest.approx(300, abs=1)
+
+    async def test_reserve(self):
+        """Tests that reserved slots go to the requests of the reservation."""
+        await self.limiter.parse_headers(make_headers("3:10:0,3:300:0"))
+        windows = self.limiter.policies["character-request-limit/Account"]
+
+        reservation = self.limiter.reserve("character-request-limit", 2)
+        assert reservation.wait == 0
+        assert self.limiter.headroom("character-request-limit") == 0
+        assert self.limiter.predicted_wait("character-request-limit") == 11
+        assert not self.limiter.predicted_wait(
+            "character-request-limit",
+            reservation,
+        )
+        wait = self.limiter.estimate_wait("character-request-limit", 1)
+        assert wait == pytest.approx(10, abs=1)
+
+        assert await self.limiter.get_semaphore(
+            "character-request-limit",
+            reservation=reservation,
+        )
+        assert reservation.remaining == 1
+        assert windows["10"].state.current_hits == 4
+        assert windows["10"].reserved == 1
+
+        reservation.release()
+        assert windows["10"].reserved == 0
+        assert self.limiter.headroom("character-request-limit") == 1
+        assert self.limiter.estimate_wait("character-request-limit", 1) == 0
+
+    async def test_reservations_apart(self):
+        """Tests that a reservation doesn't use the slots of another one."""
+        await self.limiter.parse_headers(make_headers("3:10:0,3:300:0"))
+        first = self.limiter.reserve("character-request-limit", 2)
+        second = self.limiter.reserve("character-request-limit", 1)
+
+        # Only the slots of the first reservation are free.
+        assert self.limiter.predicted_wait("character-request-limit", second) == 11
+        with pytest.raises(DeadlineExceeded):
+            await self.limiter.get_semaphore(
+                "character-request-limit",
+                time.monotonic() + 5,
+                second,
+            )
+        assert await self.limiter.get_semaphore(
+            "character-request-limit",
+            time.monotonic() + 5,
+            first,
+        )
+        assert first.remaining == 1
+        assert second.remaining == 1
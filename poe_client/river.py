@@ -0,0 +1,291 @@
+"""Staged processing of the public stash river, with backpressure.
+
+Pages are fetched one after the other, since each page holds the id of the next,
+and flow through the stages over bounded queues. When a stage falls behind, the
+queue in front of it fills up, the stages before it wait to hand off their
+results, and eventually fetching waits too, so memory stays bounded by the queue
+sizes instead of growing with the lag of the slowest stage.
+"""
+
+import asyncio
+import inspect
+import time
+from concurrent.futures import Executor
+from functools import partial
+from typing import (
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    List,
+    NoReturn,
+    Optional,
+    Sequence,
+    TypeVar,
+    cast,
+)
+
+from poe_client.client import PoEClient
+from poe_client.stash_filter import StashFilter
+
+StageInput = TypeVar("StageInput", contravariant=True)
+StageOutput = TypeVar("StageOutput", covariant=True)
+
+# Passed down the queues once there's nothing more to process.
+_DONE = object()
+
+
+class Stage(Generic[StageInput, StageOutput]):
+    """A processing step of a pipeline.
+
+    func is called with every result of the previous stage, or every page for the
+    first stage, and its result is passed to the next stage. Results which are
+    None are dropped. func can be a coroutine function; otherwise it's called in
+    the executor of the pipeline if cpu is set, or on the event loop if not.
+
+    Stages with more than one worker process values concurrently, so they may
+    pass them on in a different order.
+    """
+
+    name: str
+    func: Callable[[StageInput], Optional[StageOutput]]
+    workers: int
+    cpu: bool
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[StageInput], Optional[StageOutput]],
+        workers: int = 1,
+        cpu: bool = False,
+    ) -> None:
+        """Initialize a stage."""
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.cpu = cpu
+
+
+# Any stage, whatever it takes and returns. Each stage takes what the one before it
+# returns, which the types of a list of stages can't express.
+SomeStage = Stage[NoReturn, object]
+
+
+class StageStats(object):
+    """Throughput and queue depth of a stage."""
+
+    name: str
+    processed: int
+    busy: float
+    blocked: float
+    max_depth: int
+    started: float
+
+    # The queue in front of the stage, if any.
+    _queue: Optional["asyncio.Queue[object]"]
+
+    def __init__(self, name: str, queue: Optional["asyncio.Queue[object]"]) -> None:
+        """Initialize stats for a stage reading from queue."""
+        self.name = name
+        self.processed = 0
+        self.busy = 0
+        self.blocked = 0
+        self.max_depth = 0
+        self.started = time.monotonic()
+        self._queue = queue
+
+    @property
+    def depth(self) -> int:
+        """Values waiting in front of the stage."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def as_dict(self) -> Dict[str, float]:
+        """Every stat as a dict.
+
+        processed is the values the stage processed, per_second its throughput,
+        busy the seconds its workers spent processing, blocked the seconds they
+        waited for room in the next queue, and depth and max_depth the values
+        waiting in front of it, now and at most.
+        """
+        elapsed = time.monotonic() - self.started
+        return {
+            "processed": self.processed,
+            "per_second": self.processed / elapsed if elapsed else 0,
+            "busy": self.busy,
+            "blocked": self.blocked,
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+        }
+
+
+class RiverPipeline(object):
+    """Fetches public stash pages and passes them through stages.
+
+    Every stage reads from a queue holding at most queue_size values. The first
+    stage gets the pages as returned by get_public_stash_tabs, and the last one is
+    the sink, whose results are dropped.
+
+        pipeline = RiverPipeline(
+            client,
+            [
+                Stage("build", PublicStash.parse_obj, workers=2, cpu=True),
+                Stage("store", store),
+            ],
+            next_change_id=change_id,
+        )
+        change_id = await pipeline.run()
+    """
+
+    stages: List[SomeStage]
+    next_change_id: Optional[str]
+    stats: Dict[str, StageStats]
+
+    _client: PoEClient
+    _queue_size: int
+    _stash_filter: Optional[StashFilter]
+    _executor: Optional[Executor]
+    _poll_interval: float
+    _queues: List["asyncio.Queue[object]"]
+    _stopping: bool
+
+    def __init__(  # noqa: WPS211
+        self,
+        client: PoEClient,
+        stages: Sequence[SomeStage],
+        next_change_id: Optional[str] = None,
+        queue_size: int = 4,
+        stash_filter: Optional[StashFilter] = None,
+        executor: Optional[Executor] = None,
+        poll_interval: float = 1,
+    ) -> None:
+        """Initialize a new pipeline.
+
+        Args:
+            client: Client to fetch the pages with.
+            stages: The stages, in order. There must be at least one.
+            next_change_id: Change id of the first page to fetch.
+            queue_size: Values each queue holds before the stage in front of it
+                has to wait.
+            stash_filter: If set, passed to get_public_stash_tabs.
+            executor: Executor of the cpu stages. Defaults to the loop's default
+                executor, which is a thread pool; CPU bound stages only run in
+                parallel in a process pool, which needs picklable functions.
+            poll_interval: Seconds to wait before fetching again once the river
+                is caught up, which is when a page leads to itself.
+        """
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage.")
+        self.stages = list(stages)
+        self.next_change_id = next_change_id
+        self._client = client
+        self._queue_size = queue_size
+        self._stash_filter = stash_filter
+        self._executor = executor
+        self._poll_interval = poll_interval
+        self._queues = []
+        self._stopping = False
+        self.stats = {}
+
+    def stop(self) -> None:
+        """Stop fetching. run returns once the fetched pages went through."""
+        self._stopping = True
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Stats of every stage, starting with fetching, by stage name."""
+        return {name: stats.as_dict() for name, stats in self.stats.items()}
+
+    async def run(self, pages: Optional[int] = None) -> Optional[str]:
+        """Fetch and process pages until stopped, or until pages were fetched.
+
+        If a stage raises, everything is cancelled and the error is raised.
+
+        Returns:
+            The change id to continue from, once every fetched page was processed.
+        """
+        self._stopping = False
+        self._queues = [asyncio.Queue(self._queue_size) for _ in self.stages]
+        self.stats = {"fetch": StageStats("fetch", None)}
+        for stage, queue in zip(self.stages, self._queues):
+            self.stats[stage.name] = StageStats(stage.name, queue)
+
+        tasks = [asyncio.ensure_future(self._fetch(pages))]
+        tasks.extend(
+            asyncio.ensure_future(self._run_stage(index))
+            for index in range(len(self.stages))
+        )
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        return self.next_change_id
+
+    async def _fetch(self, pages: Optional[int]) -> None:
+        stats = self.stats["fetch"]
+        fetched = 0
+        while not self._stopping and (pages is None or fetched < pages):
+            started = time.monotonic()
+            page = await self._client.get_public_stash_tabs(
+                self.next_change_id,
+                stash_filter=self._stash_filter,
+            )
+            stats.busy += time.monotonic() - started
+            stats.processed += 1
+            fetched += 1
+
+            next_change_id = str(page["next_change_id"])
+            if next_change_id == self.next_change_id:
+                # Caught up, so the page has nothing new to process.
+                await asyncio.sleep(self._poll_interval)
+                continue
+            await self._put(0, stats, page)
+            self.next_change_id = next_change_id
+        await self._finish(0)
+
+    async def _run_stage(self, index: int) -> None:
+        stage = self.stages[index]
+        workers = [self._work(index) for _ in range(stage.workers)]
+        await asyncio.gather(*workers)
+        if index + 1 < len(self.stages):
+            await self._finish(index + 1)
+
+    async def _work(self, index: int) -> None:
+        stage = self.stages[index]
+        stats = self.stats[stage.name]
+        queue = self._queues[index]
+        while True:
+            value = await queue.get()
+            if value is _DONE:
+                return
+
+            started = time.monotonic()
+            result = await self._call(stage, value)
+            stats.busy += time.monotonic() - started
+            stats.processed += 1
+            if result is not None and index + 1 < len(self.stages):
+                await self._put(index + 1, stats, result)
+
+    async def _call(self, stage: SomeStage, value: object) -> object:
+        func = cast(Callable[[object], object], stage.func)
+        if inspect.iscoroutinefunction(func):
+            return await cast(Awaitable[object], func(value))
+        if stage.cpu:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, partial(func, value))
+        return func(value)
+
+    async def _put(self, index: int, stats: StageStats, value: object) -> None:
+        # Hand a value to a stage, counting the time spent waiting for room.
+        queue = self._queues[index]
+        started = time.monotonic()
+        await queue.put(value)
+        stats.blocked += time.monotonic() - started
+        receiver = self.stats[self.stages[index].name]
+        receiver.max_depth = max(receiver.max_depth, queue.qsize())
+
+    async def _finish(self, index: int) -> None:
+        # Tell every worker of a stage there's nothing more to come.
+        for _ in range(self.stages[index].workers):
+            await self._queues[index].put(_DONE)
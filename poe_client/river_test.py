@@ -0,0 +1,104 @@
+import asyncio
+from typing import List
+from unittest import IsolatedAsyncioTestCase, mock
+
+import pytest
+
+from poe_client.client import PoEClient
+from poe_client.mockserver import (
+    DEFAULT_POLICIES,
+    MockData,
+    MockServer,
+    Policy,
+    Rule,
+)
+from poe_client.river import RiverPipeline, Stage
+from poe_client.schemas import Raw
+from poe_client.schemas.stash import PublicStash
+
+
+def build(page: Raw) -> PublicStash:
+    """Build the model of a page."""
+    return PublicStash.parse_obj(page)
+
+
+class RiverPipelineTest(IsolatedAsyncioTestCase):
+    """Tests the river pipeline against the mock server."""
+
+    async def asyncSetUp(self) -> None:
+        """Starts a server with little data and generous limits."""
+        self.server = MockServer(
+            data=MockData(items_per_tab=2, stashes_per_page=5),
+            policies={
+                group: Policy(policy.name, (Rule.parse("Account", "100:10:60"),))
+                for group, policy in DEFAULT_POLICIES.items()
+            },
+        )
+        url = await self.server.start()
+        self.client = PoEClient("test user agent", "token", base_url=str(url))
+        await self.client.__aenter__()
+        return await super().asyncSetUp()
+
+    async def asyncTearDown(self) -> None:
+        """Stops the server."""
+        await self.client.__aexit__(None, None, None)
+        await self.server.stop()
+        return await super().asyncTearDown()
+
+    async def test_run(self):
+        """Tests that every page goes through every stage."""
+        stored = []
+
+        async def store(page):  # noqa: WPS430
+            await asyncio.sleep(0.02)
+            stored.append(page.next_change_id)
+
+        pipeline = RiverPipeline(
+            self.client,
+            [
+                Stage("build", build, workers=2, cpu=True),
+                Stage("drop", lambda page: page if page.stashes else None),
+                Stage("store", store),
+            ],
+            next_change_id="0",
+            queue_size=1,
+        )
+        assert await pipeline.run(pages=8) == "8"
+        assert sorted(stored, key=int) == [str(page) for page in range(1, 9)]
+
+        summary = pipeline.summary()
+        assert list(summary) == ["fetch", "build", "drop", "store"]
+        assert summary["fetch"]["processed"] == 8
+        assert summary["store"]["processed"] == 8
+        # The slow sink held back fetching, and no queue grew past its size.
+        assert summary["fetch"]["blocked"] > 0
+        assert all(stats["max_depth"] <= 1 for stats in summary.values())
+
+    async def test_caught_up(self):
+        """Tests that a page leading to itself isn't passed to the stages."""
+        river = mock.AsyncMock()
+        river.get_public_stash_tabs.side_effect = [
+            {"next_change_id": "2", "stashes": []},
+            {"next_change_id": "2", "stashes": []},
+            {"next_change_id": "3", "stashes": []},
+        ]
+        stored: List[object] = []
+        pipeline = RiverPipeline(
+            river,
+            [Stage("store", lambda page: stored.append(page["next_change_id"]))],
+            next_change_id="1",
+            poll_interval=0,
+        )
+
+        assert await pipeline.run(pages=3) == "3"
+        assert stored == ["2", "3"]
+
+    async def test_error(self):
+        """Tests that an error in a stage stops the pipeline."""
+
+        def fail(page):  # noqa: WPS430
+            raise RuntimeError("storage is down")
+
+        pipeline = RiverPipeline(self.client, [Stage("store", fail)])
+        with pytest.raises(RuntimeError, match="storage is down"):
+            await pipeline.run()
@@ -0,0 +1,287 @@
+"""Change driven polling of characters and stashes.
+
+The AdaptivePoller polls a set of targets and learns how often each of them
+changes. Targets which change often are polled more often, and idle targets less
+often, while the total request rate stays within a budget derived from the rate
+limit policies of the polled endpoints. Only responses which changed since the
+previous poll are published.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from typing import (
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Type,
+    Union,
+    cast,
+)
+
+from poe_client.client import Client
+from poe_client.schemas import Model, Raw
+from poe_client.schemas.character import Character
+from poe_client.schemas.stash import StashTab
+
+# Weight of the latest poll in the change rate of a target.
+_CHANGE_RATE_WEIGHT = 0.3
+
+
+class PollTarget(NamedTuple):
+    """Something to poll: an API path and the model its result is parsed into."""
+
+    key: str
+    path: str
+    path_format_args: Sequence[str]
+    model: Type[Model]
+    result_field: Optional[str]
+
+    @property
+    def generic_path(self) -> str:
+        """The path with its format args left empty, which its rate limits go by."""
+        return self.path.format(*("" for _ in self.path_format_args))
+
+
+def character_target(name: str) -> PollTarget:
+    """Target polling a character of the token's account, like get_character."""
+    return PollTarget(
+        key="character/{0}".format(name),
+        path="character/{0}",
+        path_format_args=(name,),
+        model=Character,
+        result_field="character",
+    )
+
+
+def stash_target(league: str, stash_id: str) -> PollTarget:
+    """Target polling a stash tab of the token's account, like get_stash."""
+    return PollTarget(
+        key="stash/{0}/{1}".format(league, stash_id),
+        path="stash/{0}/{1}",
+        path_format_args=(league, stash_id),
+        model=StashTab,
+        result_field="stash",
+    )
+
+
+class TargetState(object):
+    """What the poller has learned about a target."""
+
+    interval: float
+    next_poll: float
+    change_rate: float
+    last_hash: Optional[bytes]
+    polls: int
+    changes: int
+
+    def __init__(self, interval: float, next_poll: float) -> None:
+        """Initialize the state of a target which was never polled."""
+        self.interval = interval
+        self.next_poll = next_poll
+        # Start out assuming targets change on every poll, so they're polled
+        # eagerly until there's data to say otherwise.
+        self.change_rate = 1
+        self.last_hash = None
+        self.polls = 0
+        self.changes = 0
+
+
+ChangeCallback = Callable[[PollTarget, Model], Union[None, Awaitable[None]]]
+
+
+class AdaptivePoller(object):
+    """Polls targets at intervals adapted to how often each of them changes."""
+
+    min_interval: float
+    max_interval: float
+    budget_fraction: float
+    requests_per_second: Optional[float]
+    targets: Dict[str, PollTarget]
+    states: Dict[str, TargetState]
+
+    _client: Client
+    _on_change: ChangeCallback
+    # When the next request may be made, by generic path. Each path is paced on
+    # its own, so a target with a tight budget doesn't hold back the others.
+    _next_request: Dict[str, float]
+    _in_flight: Set["asyncio.Task[None]"]
+    _stopped: bool
+    _wakeup: Optional[asyncio.Event]
+
+    def __init__(  # noqa: WPS211
+        self,
+        client: Client,
+        on_change: ChangeCallback,
+        min_interval: float = 60,
+        max_interval: float = 3600,
+        budget_fraction: float = 0.8,
+        requests_per_second: Optional[float] = None,
+    ) -> None:
+        """Initialize a new poller.
+
+        Args:
+            client: The client used to poll. It must already be entered.
+            on_change: Called with the target and the parsed model whenever a
+                target's response changed. May be a coroutine function.
+            min_interval: Shortest time between two polls of one target, in seconds.
+            max_interval: Longest time between two polls of one target, in seconds.
+            budget_fraction: Fraction of the rate limit policy budget to use, leaving
+                the rest for other requests made with the same client.
+            requests_per_second: If set, overrides the budget derived from the rate
+                limit policies.
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.budget_fraction = budget_fraction
+        self.requests_per_second = requests_per_second
+        self.targets = {}
+        self.states = {}
+        self._client = client
+        self._on_change = on_change
+        self._next_request = {}
+        self._in_flight = set()
+        self._stopped = False
+        self._wakeup = None
+
+    def add(self, target: PollTarget) -> None:
+        """Start polling a target. It's polled as soon as the budget allows."""
+        self.targets[target.key] = target
+        self.states.setdefault(
+            target.key,
+            TargetState(self.min_interval, time.monotonic()),
+        )
+        self._wake()
+
+    def remove(self, key: str) -> None:
+        """Stop polling a target."""
+        self.targets.pop(key, None)
+        self.states.pop(key, None)
+
+    def stop(self) -> None:
+        """Make run return once the polls in flight are done."""
+        self._stopped = True
+        self._wake()
+
+    async def run(self) -> None:
+        """Poll targets until stop is called."""
+        self._stopped = False
+        self._wakeup = asyncio.Event()
+        while not self._stopped:
+            key = self._next_due()
+            now = time.monotonic()
+            if key is None:
+                wake_at = now + self.min_interval
+            else:
+                wake_at = self._due_at(key)
+            if wake_at > now:
+                await self._sleep(wake_at - now)
+                continue
+
+            assert key is not None  # noqa: S101
+            target = self.targets[key]
+            # Park the target until its poll finishes and reschedules it.
+            self.states[key].next_poll = float("inf")
+            self._next_request[target.generic_path] = now + 1 / self._budget(target)
+            task = asyncio.ensure_future(self._poll_safely(target))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+        if self._in_flight:
+            await asyncio.wait(list(self._in_flight))
+
+    async def poll(self, target: PollTarget) -> bool:
+        """Poll a target once, publishing its model if it changed.
+
+        Returns:
+            Whether the response changed since the previous poll.
+        """
+        body = await self._client.get_raw(
+            path=target.path,
+            path_format_args=list(target.path_format_args),
+        )
+        body_hash = hashlib.blake2b(body, digest_size=16).digest()
+
+        state = self.states.get(target.key)
+        if state is None:
+            state = TargetState(self.min_interval, time.monotonic())
+        changed = body_hash != state.last_hash
+        state.last_hash = body_hash
+        state.polls += 1
+        state.changes += int(changed)
+        state.change_rate += _CHANGE_RATE_WEIGHT * (int(changed) - state.change_rate)
+        state.interval = self._interval(state.change_rate)
+        state.next_poll = time.monotonic() + state.interval
+
+        if changed:
+            raw = cast(Raw, json.loads(body))
+            if target.result_field:
+                raw = cast(Raw, raw[target.result_field])
+            published = self._on_change(target, target.model.parse_obj(raw))
+            if published is not None:
+                await published
+        return changed
+
+    def _interval(self, change_rate: float) -> float:
+        # A target changing on every poll is polled every min_interval. The
+        # interval grows as the change rate drops, up to max_interval.
+        floor = self.min_interval / self.max_interval
+        return self.min_interval / max(change_rate, floor)
+
+    def _next_due(self) -> Optional[str]:
+        keys: List[str] = list(self.targets)
+        if not keys:
+            return None
+        return min(keys, key=self._due_at)
+
+    def _due_at(self, key: str) -> float:
+        # A target is due once its interval passed and its path's pacing allows.
+        path = self.targets[key].generic_path
+        return max(self.states[key].next_poll, self._next_request.get(path, 0))
+
+    def _budget(self, target: PollTarget) -> float:
+        if self.requests_per_second:
+            return self.requests_per_second
+        rate = self._client.rate(target.generic_path)
+        if rate is None:
+            # The policy isn't known until the first response comes back, so poll
+            # slowly until it is.
+            return 1 / self.min_interval
+        return rate * self.budget_fraction
+
+    async def _poll_safely(self, target: PollTarget) -> None:
+        try:
+            await self.poll(target)
+        except Exception:
+            logging.exception("Failed to poll {0}".format(target.key))
+            state = self.states.get(target.key)
+            if state is not None:
+                state.interval = min(state.interval * 2, self.max_interval)
+                state.next_poll = time.monotonic() + state.interval
+        finally:
+            # A cancelled poll never rescheduled the target, which run parked.
+            state = self.states.get(target.key)
+            if state is not None and state.next_poll == float("inf"):
+                state.next_poll = time.monotonic() + state.interval
+            # run may be asleep with every target in flight.
+            self._wake()
+
+    def _wake(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _sleep(self, delay: float) -> None:
+        # Sleeps until the delay passes, or targets or the stop flag change.
+        assert self._wakeup is not None  # noqa: S101
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            return
+        self._wakeup.clear()
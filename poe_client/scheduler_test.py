@@ -0,0 +1,141 @@
+import asyncio
+import json
+import time
+from typing import List, Tuple, cast
+from unittest import IsolatedAsyncioTestCase, mock
+
+from poe_client import client
+from poe_client.scheduler import AdaptivePoller, character_target, stash_target
+from poe_client.schemas import Model
+from poe_client.schemas.character import Character
+
+
+def make_character(level: int) -> bytes:
+    """Build the body of a get_character response."""
+    return json.dumps(
+        {
+            "character": {
+                "id": "1",
+                "name": "moowiz",
+                "class": "Witch",
+                "level": level,
+            },
+        },
+    ).encode()
+
+
+class AdaptivePollerTest(IsolatedAsyncioTestCase):
+    """Tests the adaptive poller."""
+
+    def setUp(self) -> None:
+        """Sets up the test."""
+        self.client = client.PoEClient("test user agent", "token")
+        self.client.get_raw = mock.AsyncMock()  # type: ignore
+        self.changes: List[Tuple[str, Model]] = []
+        self.poller = AdaptivePoller(
+            self.client,
+            lambda target, model: self.changes.append((target.key, model)),
+            min_interval=10,
+            max_interval=100,
+        )
+        return super().setUp()
+
+    async def test_poll(self):
+        """Tests that only changed responses are published."""
+        target = character_target("moowiz")
+        self.poller.add(target)
+        self.client.get_raw.side_effect = [  # type: ignore
+            make_character(1),
+            make_character(1),
+            make_character(2),
+        ]
+
+        assert await self.poller.poll(target)
+        assert not await self.poller.poll(target)
+        assert await self.poller.poll(target)
+
+        levels = [cast(Character, model).level for _, model in self.changes]
+        assert levels == [1, 2]
+        state = self.poller.states["character/moowiz"]
+        assert (state.polls, state.changes) == (3, 2)
+        self.client.get_raw.assert_called_with(  # type: ignore
+            path="character/{0}",
+            path_format_args=["moowiz"],
+        )
+
+    async def test_intervals(self):
+        """Tests that idle targets are polled less often."""
+        target = stash_target("Standard", "abc")
+        self.poller.add(target)
+        self.client.get_raw.return_value = json.dumps(  # type: ignore
+            {"stash": {"id": "abc", "name": "1", "type": "PremiumStash"}},
+        ).encode()
+
+        await self.poller.poll(target)
+        state = self.poller.states[target.key]
+        assert state.interval == 10
+
+        intervals = []
+        for _ in range(10):
+            await self.poller.poll(target)
+            intervals.append(state.interval)
+        assert intervals == sorted(intervals)
+        assert intervals[-1] > 10
+        assert self.poller._interval(0) == 100
+
+        self.poller.remove(target.key)
+        assert not self.poller.targets
+
+    async def test_run(self):
+        """Tests that run polls targets within the budget until stopped."""
+        self.poller.requests_per_second = 1000
+        self.poller.min_interval = 0.01
+        levels = iter(range(1, 10))
+        self.client.get_raw.side_effect = (  # type: ignore
+            lambda **kwargs: make_character(next(levels))
+        )
+        self.poller.add(character_target("moowiz"))
+        state = self.poller.states["character/moowiz"]
+
+        async def on_change(target, model):  # noqa: WPS430
+            if state.polls == 3:
+                self.poller.stop()
+
+        self.poller._on_change = on_change
+        await asyncio.wait_for(self.poller.run(), timeout=1)
+
+        assert state.polls == 3
+
+    async def test_failure(self):
+        """Tests that failing targets are backed off."""
+        self.poller.requests_per_second = 1000
+        self.client.get_raw.side_effect = ValueError("Invalid request")  # type: ignore
+        target = character_target("moowiz")
+        self.poller.add(target)
+
+        await self.poller._poll_safely(target)
+
+        assert self.poller.states[target.key].interval == 20
+        assert self.poller._budget(target) == 1000
+
+    async def test_cancel(self):
+        """Tests that a cancelled poll leaves the target scheduled."""
+        self.client.get_raw.side_effect = asyncio.CancelledError  # type: ignore
+        target = character_target("moowiz")
+        self.poller.add(target)
+        self.poller.states[target.key].next_poll = float("inf")
+
+        with self.assertRaises(asyncio.CancelledError):
+            await self.poller._poll_safely(target)
+
+        assert self.poller.states[target.key].next_poll < time.monotonic() + 11
+
+    async def test_pacing(self):
+        """Tests that every generic path is paced on its own."""
+        character = character_target("moowiz")
+        stash = stash_target("Standard", "abc")
+        self.poller.add(character)
+        self.poller.add(stash)
+        self.poller._next_request["character/"] = time.monotonic() + 100
+
+        assert self.poller._next_due() == stash.key
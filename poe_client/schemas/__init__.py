@@ -1,6 +1,11 @@
+from typing import Dict
+
 from humps import camelize
 from pydantic import BaseConfig, BaseModel, Extra
 
+# A JSON object as returned by the API, before any model is built from it.
+Raw = Dict[str, object]
+
 
 def to_camel(string):
     """Return a string as camel case."""
@@ -0,0 +1,106 @@
+"""Filters applied to raw public stash pages before any model is built."""
+
+from typing import Collection, List, Optional, cast
+
+from poe_client.schemas import Raw
+
+
+class StashFilter(object):
+    """Predicates run on the raw stashes of a public stash page.
+
+    Stash predicates (league, stash type, public) drop whole stashes. Item
+    predicates (category, base type) drop the non-matching items of the kept
+    stashes. A kept stash may end up with no items, which still tells consumers
+    that its previous contents are gone.
+
+    Counts of kept and dropped stashes and items accumulate over every page the
+    filter is applied to.
+    """
+
+    leagues: Optional[Collection[str]]
+    stash_types: Optional[Collection[str]]
+    public: Optional[bool]
+    categories: Optional[Collection[str]]
+    base_types: Optional[Collection[str]]
+
+    kept_stashes: int
+    dropped_stashes: int
+    kept_items: int
+    dropped_items: int
+
+    def __init__(  # noqa: WPS211
+        self,
+        leagues: Optional[Collection[str]] = None,
+        stash_types: Optional[Collection[str]] = None,
+        public: Optional[bool] = None,
+        categories: Optional[Collection[str]] = None,
+        base_types: Optional[Collection[str]] = None,
+    ) -> None:
+        """Initialize a new filter. Unset predicates match everything.
+
+        Args:
+            leagues: Keep stashes in one of these leagues.
+            stash_types: Keep stashes of one of these types, like "PremiumStash".
+            public: Keep stashes with this public flag.
+            categories: Keep items whose extended category is one of these.
+            base_types: Keep items with one of these base types.
+        """
+        self.leagues = frozenset(leagues) if leagues is not None else None
+        self.stash_types = frozenset(stash_types) if stash_types is not None else None
+        self.public = public
+        self.categories = frozenset(categories) if categories is not None else None
+        self.base_types = frozenset(base_types) if base_types is not None else None
+        self.kept_stashes = 0
+        self.dropped_stashes = 0
+        self.kept_items = 0
+        self.dropped_items = 0
+
+    def apply(self, page: Raw) -> Raw:
+        """Filter a raw public stash page in place, and return it."""
+        page["stashes"] = self.filter_stashes(cast(List[Raw], page["stashes"]))
+        return page
+
+    def filter_stashes(self, stashes: List[Raw]) -> List[Raw]:
+        """Filter a list of raw stashes, returning the kept ones."""
+        kept = []
+        for stash in stashes:
+            if not self.matches_stash(stash):
+                self.dropped_stashes += 1
+                self.dropped_items += len(_items(stash))
+                continue
+
+            self.kept_stashes += 1
+            if self.categories is not None or self.base_types is not None:
+                stash["items"] = self.filter_items(_items(stash))
+            else:
+                self.kept_items += len(_items(stash))
+            kept.append(stash)
+        return kept
+
+    def filter_items(self, items: List[Raw]) -> List[Raw]:
+        """Filter a list of raw items, returning the kept ones."""
+        kept = [item for item in items if self.matches_item(item)]
+        self.kept_items += len(kept)
+        self.dropped_items += len(items) - len(kept)
+        return kept
+
+    def matches_stash(self, stash: Raw) -> bool:
+        """Check the stash predicates against a raw stash."""
+        if self.public is not None and stash.get("public") != self.public:
+            return False
+        if self.leagues is not None and stash.get("league") not in self.leagues:
+            return False
+        return self.stash_types is None or stash.get("stashType") in self.stash_types
+
+    def matches_item(self, item: Raw) -> bool:  # noqa: WPS110
+        """Check the item predicates against a raw item."""
+        if self.base_types is not None and item.get("baseType") not in self.base_types:
+            return False
+        if self.categories is None:
+            return True
+        extended = cast(Optional[Raw], item.get("extended")) or {}
+        return extended.get("category") in self.categories
+
+
+def _items(stash: Raw) -> List[Raw]:
+    return cast(Optional[List[Raw]], stash.get("items")) or []
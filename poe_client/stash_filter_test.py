@@ -0,0 +1,69 @@
+from typing import List, cast
+from unittest import TestCase
+
+from poe_client.conftest import raw_change, raw_item
+from poe_client.schemas import Raw
+from poe_client.stash_filter import StashFilter
+
+
+def make_page() -> Raw:
+    """Build a raw page with stashes in two leagues."""
+    ring = raw_item("ring")
+    amulet = raw_item("amulet")
+    amulet["baseType"] = "Onyx Amulet"
+    amulet["extended"] = {"category": "accessories", "subcategories": ["amulet"]}
+
+    hardcore = raw_change("hc", [raw_item("other")])
+    hardcore["league"] = "Hardcore"
+    return {
+        "nextChangeId": "1",
+        "stashes": [raw_change("sc", [ring, amulet]), hardcore],
+    }
+
+
+def listed(raw: Raw, key: str) -> List[Raw]:
+    """Get a list of raw objects from a raw object."""
+    return cast(List[Raw], raw[key])
+
+
+class StashFilterTest(TestCase):
+    """Tests the stash filter."""
+
+    def test_no_predicates(self):
+        """Filters without predicates keep everything."""
+        stash_filter = StashFilter()
+        page = stash_filter.apply(make_page())
+
+        assert len(listed(page, "stashes")) == 2
+        assert (stash_filter.kept_stashes, stash_filter.kept_items) == (2, 3)
+
+    def test_stash_predicates(self):
+        """Stashes not matching every stash predicate are dropped."""
+        stash_filter = StashFilter(
+            leagues=["Hardcore", "Standard"],
+            stash_types=["PremiumStash"],
+            public=True,
+        )
+        assert len(listed(stash_filter.apply(make_page()), "stashes")) == 2
+
+        stash_filter = StashFilter(leagues=["Hardcore"])
+        page = stash_filter.apply(make_page())
+        assert [stash["id"] for stash in listed(page, "stashes")] == ["hc"]
+        assert (stash_filter.kept_stashes, stash_filter.dropped_stashes) == (1, 1)
+        assert (stash_filter.kept_items, stash_filter.dropped_items) == (1, 2)
+
+        stash_filter = StashFilter(public=False, stash_types=["PremiumStash"])
+        assert stash_filter.apply(make_page())["stashes"] == []
+
+    def test_item_predicates(self):
+        """Items not matching every item predicate are dropped from kept stashes."""
+        stash_filter = StashFilter(
+            categories=["accessories"], base_types=["Onyx Amulet"]
+        )
+        page = stash_filter.apply(make_page())
+
+        assert [
+            [item["id"] for item in listed(stash, "items")]
+            for stash in listed(page, "stashes")
+        ] == [["amulet"], []]
+        assert (stash_filter.kept_items, stash_filter.dropped_items) == (1, 2)
@@ -0,0 +1,135 @@
+"""Incremental sync of the private stash tabs of a league."""
+
+import json
+import time
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+from poe_client.client import PoEClient
+from poe_client.schemas.stash import StashTab
+
+
+class SyncResult(NamedTuple):
+    """What a single sync did."""
+
+    tabs: List[StashTab]
+    fetched: List[str]
+    reused: List[str]
+
+    @property
+    def requests(self) -> int:
+        """Number of requests the sync made, including listing the tabs."""
+        return len(self.fetched) + 1
+
+
+def _walk(tabs: List[StashTab]) -> Iterator[StashTab]:
+    for tab in tabs:
+        yield tab
+        yield from _walk(tab.children or [])
+
+
+class StashSync(object):
+    """Keeps a local copy of the stash tabs of a league up to date.
+
+    Every sync lists the tabs once with get_stashes, and only fetches the contents
+    of tabs whose metadata (item count, colour, folder) or index differ from the
+    local copy, or which haven't been fetched for longer than max_age.
+    """
+
+    league: str
+    max_age: Optional[float]
+    tabs: List[StashTab]
+    fetched_at: Dict[str, float]
+
+    def __init__(
+        self,
+        league: str,
+        max_age: Optional[float] = None,
+        tabs: Optional[List[StashTab]] = None,
+        fetched_at: Optional[Dict[str, float]] = None,
+    ) -> None:
+        """Initialize a new sync.
+
+        Args:
+            league: The league whose stash tabs are synced.
+            max_age: If set, tabs fetched more than this many seconds ago are
+                fetched again even if they look unchanged.
+            tabs: Local copy of the tabs, from a previous sync.
+            fetched_at: When each tab of the local copy was fetched, as a Unix time.
+        """
+        self.league = league
+        self.max_age = max_age
+        self.tabs = tabs or []
+        self.fetched_at = fetched_at or {}
+
+    @classmethod
+    def loads(cls, state: str, max_age: Optional[float] = None) -> "StashSync":
+        """Restore a sync from the string made by dumps."""
+        loaded = json.loads(state)
+        return cls(
+            league=loaded["league"],
+            max_age=max_age,
+            tabs=[StashTab(**tab) for tab in loaded["tabs"]],
+            fetched_at=loaded["fetched_at"],
+        )
+
+    def dumps(self) -> str:
+        """Serialize the local state to a string, to store between runs."""
+        return json.dumps(
+            {
+                "league": self.league,
+                "tabs": [json.loads(tab.json(by_alias=True)) for tab in self.tabs],
+                "fetched_at": self.fetched_at,
+            },
+        )
+
+    def is_unchanged(self, listed: StashTab, local: StashTab) -> bool:
+        """Check whether a listed tab can be served from the local copy."""
+        if listed.index != local.index or listed.metadata is None:
+            return False
+        if listed.metadata != local.metadata:
+            return False
+
+        fetched_at = self.fetched_at.get(local.id)
+        if fetched_at is None:
+            return False
+        if self.max_age is not None and time.time() - fetched_at > self.max_age:
+            return False
+
+        local_children = {child.id: child for child in local.children or ()}
+        return all(
+            child.id in local_children
+            and self.is_unchanged(child, local_children[child.id])
+            for child in listed.children or ()
+        )
+
+    async def sync(self, client: PoEClient) -> SyncResult:
+        """Bring the local copy up to date.
+
+        Args:
+            client: The client to sync with. It must already be entered.
+
+        Returns:
+            The synced tabs, and which tab ids were fetched or reused.
+        """
+        local = {tab.id: tab for tab in _walk(self.tabs)}
+        now = time.time()
+        tabs = await client.snapshot_stashes(
+            self.league,
+            previous=self.tabs,
+            unchanged=self.is_unchanged,
+        )
+
+        fetched = []
+        reused = []
+        fetched_at = {}
+        for tab in _walk(tabs):
+            if local.get(tab.id) is tab:
+                reused.append(tab.id)
+                fetched_at[tab.id] = self.fetched_at[tab.id]
+            else:
+                fetched.append(tab.id)
+                fetched_at[tab.id] = now
+
+        self.tabs = tabs
+        self.fetched_at = fetched_at
+        return SyncResult(tabs=tabs, fetched=fetched, reused=reused)
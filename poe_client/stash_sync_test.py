@@ -0,0 +1,65 @@
+import time
+from typing import List
+from unittest import IsolatedAsyncioTestCase, mock
+
+from poe_client import client
+from poe_client.conftest import make_tab
+from poe_client.schemas import Raw
+from poe_client.stash_sync import StashSync
+
+
+class StashSyncTest(IsolatedAsyncioTestCase):
+    """Tests the incremental stash sync."""
+
+    def setUp(self) -> None:
+        """Sets up the test."""
+        self.client = client.PoEClient("test user agent", "token")
+        self.client._get_json = mock.AsyncMock(side_effect=self.get_json)  # type: ignore
+        self.listed = [make_tab("a", 1), make_tab("b", 2)]
+        self.sync = StashSync("Standard")
+        return super().setUp()
+
+    async def get_json(
+        self,
+        path: str,
+        path_format_args: List[str],
+        **kwargs: object,
+    ) -> Raw:
+        """Serve stash tabs by path."""
+        if path == "stash/{0}":
+            return {"stashes": self.listed}
+        tab = next(tab for tab in self.listed if tab["id"] == path_format_args[1])
+        return {"stash": dict(tab, items=[])}
+
+    async def test_sync(self):
+        """Tests that only changed tabs are fetched."""
+        first = await self.sync.sync(self.client)
+        assert (first.fetched, first.requests) == (["a", "b"], 3)
+
+        unchanged = await self.sync.sync(self.client)
+        assert (unchanged.reused, unchanged.requests) == (["a", "b"], 1)
+
+        self.listed[1] = make_tab("b", 2, colour="ff0000")
+        self.listed[0] = dict(self.listed[0], index=3)
+        changed = await self.sync.sync(self.client)
+        assert changed.fetched == ["a", "b"]
+
+    async def test_stale(self):
+        """Tests that tabs older than max_age are fetched again."""
+        await self.sync.sync(self.client)
+        self.sync.max_age = 60
+        self.sync.fetched_at["a"] = time.time() - 120
+
+        result = await self.sync.sync(self.client)
+
+        assert (result.fetched, result.reused) == (["a"], ["b"])
+
+    async def test_dumps(self):
+        """Tests that the local state survives a round trip."""
+        await self.sync.sync(self.client)
+
+        restored = StashSync.loads(self.sync.dumps())
+        result = await restored.sync(self.client)
+
+        assert restored.league == "Standard"
+        assert result.reused == ["a", "b"]
@@ -0,0 +1,526 @@
+"""Batched persistence of parsed models, off the event loop.
+
+A StorageSink collects items, public stash changes, ladder entries and characters
+from async code, and hands them to a backend in batches, on a dedicated thread,
+so a slow database never blocks the loop. SQLiteBackend is the reference
+backend:
+
+    async with StorageSink(SQLiteBackend("river.db")) as sink:
+        for stash in page.stashes:
+            await sink.put(stash)
+"""
+
+import abc
+import asyncio
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from types import TracebackType
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Type, Union
+
+from poe_client.mods import ModParser, ModValue
+from poe_client.schemas.character import Character
+from poe_client.schemas.league import LadderEntry
+from poe_client.schemas.stash import Item, PublicStashChange
+
+Record = Union[Item, PublicStashChange, LadderEntry, Character]
+
+# A row of item_mods.
+_ModRow = Tuple[str, int, int, int, Optional[ModValue], str]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS stashes (
+    id TEXT PRIMARY KEY,
+    public INTEGER NOT NULL,
+    account_name TEXT,
+    last_character_name TEXT,
+    stash TEXT,
+    stash_type TEXT NOT NULL,
+    league TEXT
+);
+CREATE TABLE IF NOT EXISTS characters (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    class TEXT NOT NULL,
+    league TEXT,
+    level INTEGER NOT NULL,
+    experience INTEGER,
+    account_name TEXT
+);
+CREATE TABLE IF NOT EXISTS ladder_entries (
+    league TEXT NOT NULL,
+    character_id TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    dead INTEGER NOT NULL,
+    retired INTEGER NOT NULL,
+    PRIMARY KEY (league, character_id)
+);
+CREATE TABLE IF NOT EXISTS items (
+    id TEXT PRIMARY KEY,
+    stash_id TEXT,
+    character_id TEXT,
+    league TEXT,
+    name TEXT NOT NULL,
+    type_line TEXT NOT NULL,
+    base_type TEXT NOT NULL,
+    ilvl INTEGER NOT NULL,
+    identified INTEGER NOT NULL,
+    corrupted INTEGER,
+    frame_type INTEGER,
+    note TEXT,
+    x INTEGER,
+    y INTEGER
+);
+CREATE INDEX IF NOT EXISTS items_stash_id ON items (stash_id);
+CREATE INDEX IF NOT EXISTS items_character_id ON items (character_id);
+CREATE TABLE IF NOT EXISTS mod_templates (
+    id INTEGER PRIMARY KEY,
+    template TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS item_mods (
+    item_id TEXT NOT NULL,
+    field INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    template_id INTEGER NOT NULL,
+    value REAL,
+    all_values TEXT NOT NULL,
+    PRIMARY KEY (item_id, field, position)
+);
+CREATE INDEX IF NOT EXISTS item_mods_template_id ON item_mods (template_id, value);
+"""
+
+
+class StorageBackend(abc.ABC):
+    """Writes batches of records. Every method is called on the sink's thread."""
+
+    def open(self) -> None:  # noqa: B027
+        """Prepare for writing, like connecting and creating tables."""
+
+    @abc.abstractmethod
+    def write(self, records: List[Record]) -> None:
+        """Write a batch of records, in order, as a whole."""
+
+    def close(self) -> None:  # noqa: B027
+        """Release whatever open acquired."""
+
+
+class SQLiteBackend(StorageBackend):
+    """Writes records to a SQLite database, one transaction per batch.
+
+    Stashes, characters and ladder entries get a row each, replacing earlier rows
+    with the same key, except that a character keeps the league, experience and
+    account stored for it when a record comes without them, like the character of
+    a ladder entry, which gets the account of the entry. Items are keyed by id,
+    and items without one are skipped. A stash change or a character replaces
+    every item stored for it. Mods are kept in item_mods, one row per mod line of
+    the MOD_FIELDS, with the mod template in mod_templates, the first value in
+    value for range queries, and every value comma separated in all_values.
+    """
+
+    path: str
+
+    _connection: Optional[sqlite3.Connection]
+    _parser: ModParser
+    _templates_stored: int
+
+    def __init__(self, path: str) -> None:
+        """Initialize a new backend for the database file at path."""
+        self.path = path
+        self._connection = None
+        self._parser = ModParser()
+        self._templates_stored = 0
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """The database connection, once open."""
+        if self._connection is None:
+            raise RuntimeError("The backend isn't open.")
+        return self._connection
+
+    def open(self) -> None:
+        """Connect and create the tables."""
+        self._connection = sqlite3.connect(self.path)
+        self._connection.executescript(_SCHEMA)
+        # Parser template ids are the ids of the stored templates.
+        stored = self._connection.execute(
+            "SELECT template FROM mod_templates ORDER BY id",
+        )
+        for (template,) in stored:
+            self._parser.register(template)
+        self._templates_stored = len(self._parser.templates)
+
+    def write(self, records: List[Record]) -> None:
+        """Write a batch of records in a single transaction."""
+        stashes: Dict[str, PublicStashChange] = {}
+        characters: Dict[str, Character] = {}
+        entries: Dict[Tuple[str, str], LadderEntry] = {}
+        items: Dict[str, Tuple[Item, Optional[str], Optional[str]]] = {}
+        # Later records replace earlier ones with the same key.
+        for record in records:
+            if isinstance(record, PublicStashChange):
+                stashes[record.id] = record
+            elif isinstance(record, Character):
+                characters[record.id] = record
+            elif isinstance(record, LadderEntry):
+                league = record.character.league or ""
+                entries[(league, record.character.id)] = record
+                characters.setdefault(record.character.id, record.character)
+            elif isinstance(record, Item) and record.id:
+                items[record.id] = (record, None, None)
+
+        for stash in stashes.values():
+            for item in stash.items:
+                if item.id:
+                    items[item.id] = (item, stash.id, None)
+        for character in characters.values():
+            for owned in _character_items(character):
+                if owned.id:
+                    items[owned.id] = (owned, None, character.id)
+
+        self._commit(stashes, characters, entries, items)
+
+    def close(self) -> None:
+        """Close the connection."""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _commit(
+        self,
+        stashes: Dict[str, PublicStashChange],
+        characters: Dict[str, Character],
+        entries: Dict[Tuple[str, str], LadderEntry],
+        items: Dict[str, Tuple[Item, Optional[str], Optional[str]]],
+    ) -> None:
+        try:
+            with self.connection as connection:
+                self._write_owners(connection, stashes, characters, entries)
+                self._write_items(connection, items)
+        except sqlite3.Error:
+            # A failed commit can leave the transaction open.
+            self.connection.rollback()
+            raise
+        # Templates of a batch which was rolled back are written with the next one.
+        self._templates_stored = len(self._parser.templates)
+
+    def _write_owners(
+        self,
+        connection: sqlite3.Connection,
+        stashes: Dict[str, PublicStashChange],
+        characters: Dict[str, Character],
+        entries: Dict[Tuple[str, str], LadderEntry],
+    ) -> None:
+        connection.executemany(
+            "INSERT OR REPLACE INTO stashes VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    stash.id,
+                    stash.public,
+                    stash.account_name,
+                    stash.last_character_name,
+                    stash.stash,
+                    stash.stash_type,
+                    stash.league,
+                )
+                for stash in stashes.values()
+            ],
+        )
+        accounts = {
+            character_id: entry.account.name
+            for (_, character_id), entry in entries.items()
+            if entry.account
+        }
+        connection.executemany(
+            "INSERT INTO characters VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (id) DO UPDATE SET "
+            "name = excluded.name, "
+            "class = excluded.class, "
+            "league = COALESCE(excluded.league, league), "
+            "level = excluded.level, "
+            "experience = COALESCE(excluded.experience, experience), "
+            "account_name = COALESCE(excluded.account_name, account_name)",
+            [
+                (
+                    character.id,
+                    character.name,
+                    character.class_,
+                    character.league,
+                    character.level,
+                    character.experience,
+                    (
+                        character.account.name
+                        if character.account
+                        else accounts.get(character.id)
+                    ),
+                )
+                for character in characters.values()
+            ],
+        )
+        connection.executemany(
+            "INSERT OR REPLACE INTO ladder_entries VALUES (?, ?, ?, ?, ?)",
+            [
+                (league, character_id, entry.rank, entry.dead, entry.retired)
+                for (league, character_id), entry in entries.items()
+            ],
+        )
+
+        # Stash changes and characters carry every item they hold, so whatever
+        # else was stored for them is gone.
+        replaced = [
+            ("stash_id", [(stash_id,) for stash_id in stashes]),
+            (
+                "character_id",
+                [
+                    (character.id,)
+                    for character in characters.values()
+                    if _has_items(character)
+                ],
+            ),
+        ]
+        for column, owners in replaced:
+            connection.executemany(
+                "DELETE FROM item_mods WHERE item_id IN "
+                "(SELECT id FROM items WHERE {0} = ?)".format(column),
+                owners,
+            )
+            connection.executemany(
+                "DELETE FROM items WHERE {0} = ?".format(column),
+                owners,
+            )
+
+    def _write_items(
+        self,
+        connection: sqlite3.Connection,
+        items: Dict[str, Tuple[Item, Optional[str], Optional[str]]],
+    ) -> None:
+        connection.executemany(
+            "INSERT OR REPLACE INTO items VALUES "
+            "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    item_id,
+                    stash_id,
+                    character_id,
+                    item.league,
+                    item.name,
+                    item.type_line,
+                    item.base_type,
+                    item.ilvl,
+                    item.identified,
+                    item.corrupted,
+                    item.frame_type,
+                    item.note,
+                    item.x,
+                    item.y,
+                )
+                for item_id, (item, stash_id, character_id) in items.items()
+            ],
+        )
+        connection.executemany(
+            "DELETE FROM item_mods WHERE item_id = ?",
+            [(item_id,) for item_id in items],
+        )
+        connection.executemany(
+            "INSERT INTO item_mods VALUES (?, ?, ?, ?, ?, ?)",
+            self._mod_rows(items),
+        )
+
+        templates = self._parser.templates
+        connection.executemany(
+            "INSERT INTO mod_templates VALUES (?, ?)",
+            [
+                (template_id, templates[template_id])
+                for template_id in range(self._templates_stored, len(templates))
+            ],
+        )
+
+    def _mod_rows(
+        self,
+        items: Dict[str, Tuple[Item, Optional[str], Optional[str]]],
+    ) -> Iterable[_ModRow]:
+        for item_id, owned in items.items():
+            mods = self._parser.parse_item(owned[0])
+            for field, parsed in enumerate(mods):
+                for position, mod in enumerate(parsed):
+                    yield (
+                        item_id,
+                        field,
+                        position,
+                        mod.template_id,
+                        mod.values[0] if mod.values else None,
+                        ",".join(str(mod_value) for mod_value in mod.values),
+                    )
+
+
+def _character_items(character: Character) -> Iterable[Item]:
+    for items in (character.equipment, character.inventory, character.jewels):
+        yield from items or ()
+
+
+def _has_items(character: Character) -> bool:
+    # Characters from a ladder or a character list come without their items.
+    return any(
+        items is not None
+        for items in (character.equipment, character.inventory, character.jewels)
+    )
+
+
+class StorageSink(object):
+    """Buffers records from async code and writes them in batches on a thread.
+
+    A batch is written once batch_size records are buffered, and at least every
+    flush_interval seconds while records are buffered. Only one batch is written
+    at a time: records keep buffering while it's written, and put waits for the
+    write in progress once the next batch is full, so a slow backend slows down
+    producers instead of growing the buffer.
+    """
+
+    backend: StorageBackend
+    batch_size: int
+    flush_interval: float
+    written: int
+    batches: int
+
+    _buffer: List[Record]
+    # Error of a write in the background, raised once by the next call.
+    _error: Optional[Exception]
+    _executor: Optional[ThreadPoolExecutor]
+    # Held while handing the buffer to the writer.
+    _lock: asyncio.Lock
+    _timer: Optional["asyncio.Future[None]"]
+    _writing: Optional["asyncio.Future[None]"]
+
+    def __init__(
+        self,
+        backend: StorageBackend,
+        batch_size: int = 1000,
+        flush_interval: float = 1,
+    ) -> None:
+        """Initialize a new sink.
+
+        Args:
+            backend: Backend to write the batches with.
+            batch_size: Records to buffer before writing them.
+            flush_interval: Seconds buffered records wait at most to be written.
+        """
+        self.backend = backend
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.batches = 0
+        self._buffer = []
+        self._error = None
+        self._executor = None
+        self._lock = asyncio.Lock()
+        self._timer = None
+        self._writing = None
+
+    async def __aenter__(self) -> "StorageSink":
+        """Open the backend and start flushing on time."""
+        await self.start()
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[TracebackType],
+    ) -> None:
+        """Write what's buffered and close the backend."""
+        await self.close()
+
+    async def start(self) -> None:
+        """Start the writer thread, open the backend and start flushing on time."""
+        self._executor = ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix="poe_client.storage",
+        )
+        await self._run(self.backend.open)
+        self._timer = asyncio.ensure_future(self._flush_on_time())
+
+    async def close(self) -> None:
+        """Write what's buffered, close the backend and stop the writer thread."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        try:
+            await self.flush()
+        finally:
+            await self._wait_for_write()
+            try:
+                await self._run(self.backend.close)
+            finally:
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False)
+                    self._executor = None
+
+    async def put(self, record: Record) -> None:
+        """Buffer a record, handing the buffer to the writer once it's full.
+
+        Only waits when the buffer fills up while the previous batch is still
+        being written. Raises the error of a failed write, if any.
+        """
+        self._raise_error()
+        self._buffer.append(record)
+        if len(self._buffer) >= self.batch_size:
+            await self._hand_off(self.batch_size)
+            self._raise_error()
+
+    async def put_many(self, records: Iterable[Record]) -> None:
+        """Buffer several records, writing the buffer whenever it's full."""
+        for record in records:
+            await self.put(record)
+
+    async def flush(self) -> None:
+        """Write every buffered record, and wait until they're written.
+
+        Raises the error of a failed write, if any.
+        """
+        self._raise_error()
+        await self._hand_off(1)
+        await self._wait_for_write()
+        self._raise_error()
+
+    async def _hand_off(self, minimum: int) -> None:
+        # Start writing the buffer in the background if it holds at least minimum
+        # records, once the write in progress is done.
+        async with self._lock:
+            if len(self._buffer) < minimum:
+                return
+            await self._wait_for_write()
+            if self._error is not None:
+                return
+            batch = self._buffer
+            self._buffer = []
+            self._writing = asyncio.ensure_future(self._write(batch))
+
+    async def _wait_for_write(self) -> None:
+        # Waiting doesn't cancel the write if the caller is cancelled.
+        if self._writing is not None:
+            await asyncio.wait([self._writing])
+
+    async def _write(self, batch: List[Record]) -> None:
+        try:
+            await self._run(partial(self.backend.write, batch))
+        except Exception as error:
+            self._error = error
+            return
+        self.written += len(batch)
+        self.batches += 1
+
+    def _raise_error(self) -> None:
+        error = self._error
+        if error is not None:
+            self._error = None
+            raise error
+
+    async def _run(self, func: Callable[[], None]) -> None:
+        if self._executor is None:
+            raise RuntimeError("The sink isn't started.")
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, func)
+
+    async def _flush_on_time(self) -> None:
+        while True:  # noqa: WPS457
+            await asyncio.sleep(self.flush_interval)
+            await self._hand_off(1)
@@ -0,0 +1,195 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+import threading
+from typing import List, cast
+from unittest import IsolatedAsyncioTestCase
+
+import pytest
+
+from poe_client.mockserver import MockData
+from poe_client.schemas import Raw
+from poe_client.schemas.character import Character
+from poe_client.schemas.league import LadderEntry
+from poe_client.schemas.stash import PublicStash
+from poe_client.storage import Record, SQLiteBackend, StorageBackend, StorageSink
+
+
+class SlowBackend(StorageBackend):
+    """Keeps batches in memory, each write waiting until released."""
+
+    def __init__(self, fail: bool = False) -> None:
+        """Initialize a backend whose writes fail if fail is set."""
+        self.batches: List[List[Record]] = []
+        self.released = threading.Event()
+        self.fail = fail
+        self.closed = False
+
+    def write(self, records: List[Record]) -> None:
+        """Wait to be released, then keep the batch or fail."""
+        self.released.wait(5)
+        if self.fail:
+            raise RuntimeError("disk full")
+        self.batches.append(records)
+
+    def close(self) -> None:
+        """Remember being closed."""
+        self.closed = True
+
+
+class StorageSinkTest(IsolatedAsyncioTestCase):
+    """Tests the storage sink with the SQLite backend."""
+
+    def setUp(self) -> None:
+        """Generates records and a database path."""
+        self.data = MockData(items_per_tab=2, stashes_per_page=5, ladder_size=5)
+        self.stashes = [
+            stash
+            for page in ("0", "1")
+            for stash in PublicStash.parse_obj(
+                self.data.public_stash_page(page)
+            ).stashes
+        ]
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "test.db")
+        return super().setUp()
+
+    def count(self, table: str) -> int:
+        """Count the rows of a table."""
+        with sqlite3.connect(self.path) as connection:
+            query = "SELECT COUNT(*) FROM {0}".format(table)
+            return connection.execute(query).fetchone()[0]
+
+    async def test_write(self):
+        """Tests that every kind of record is written in batches."""
+        stashes = cast(List[Raw], self.data.public_stash_page("2")["stashes"])
+        character = Character.parse_obj(
+            dict(self.data.characters[0], equipment=stashes[0]["items"]),
+        )
+        entries = [LadderEntry.parse_obj(entry) for entry in self.data.ladder]
+
+        async with StorageSink(SQLiteBackend(self.path), batch_size=4) as sink:
+            await sink.put_many(self.stashes)
+            await sink.put_many(entries)
+            await sink.put(character)
+            await sink.put(self.stashes[0].items[0])
+
+        assert sink.written == 17
+        assert sink.batches == 5
+        assert self.count("stashes") == 10
+        assert self.count("ladder_entries") == 5
+        assert self.count("characters") == 6
+        assert self.count("items") == 22
+        assert self.count("item_mods") == 44
+        with sqlite3.connect(self.path) as connection:
+            stored = connection.execute(
+                "SELECT character_id FROM items WHERE character_id IS NOT NULL",
+            ).fetchall()
+        assert stored == [(character.id,), (character.id,)]
+
+    async def test_replace(self):
+        """Tests that a stash change replaces the items stored for the stash."""
+        async with StorageSink(SQLiteBackend(self.path)) as sink:
+            await sink.put_many(self.stashes)
+        templates = self.count("mod_templates")
+
+        changed = self.stashes[0].copy(update={"items": self.stashes[0].items[:1]})
+        async with StorageSink(SQLiteBackend(self.path)) as sink:
+            await sink.put(changed)
+
+        assert self.count("items") == 19
+        assert self.count("item_mods") == 38
+        assert self.count("mod_templates") == templates
+        with sqlite3.connect(self.path) as connection:
+            orphans = connection.execute(
+                "SELECT COUNT(*) FROM item_mods "
+                "LEFT JOIN mod_templates ON template_id = mod_templates.id "
+                "WHERE mod_templates.id IS NULL",
+            ).fetchone()[0]
+        assert not orphans
+
+    async def test_ladder_character(self):
+        """Tests that a ladder entry keeps what's stored for its character."""
+        entry = LadderEntry.parse_obj(self.data.ladder[0])
+        character = Character.parse_obj(
+            dict(entry.character.dict(by_alias=True), experience=None),
+        )
+        async with StorageSink(SQLiteBackend(self.path)) as sink:
+            await sink.put(entry)
+            await sink.flush()
+            await sink.put(character.copy(update={"level": 72}))
+
+        with sqlite3.connect(self.path) as connection:
+            stored = connection.execute(
+                "SELECT level, experience, account_name FROM characters",
+            ).fetchall()
+        assert stored == [(72, 71000000, "ladder_account_1")]
+
+    async def test_rolled_back_templates(self):
+        """Tests that mod templates of a failed commit are written with the next."""
+        backend = SQLiteBackend(self.path)
+        backend.open()
+        self.addCleanup(backend.close)
+        # A foreign key checked on commit makes the commit fail.
+        backend.connection.executescript(
+            """
+            PRAGMA foreign_keys = ON;
+            CREATE TABLE guard (
+                template_id INTEGER REFERENCES mod_templates (id)
+                DEFERRABLE INITIALLY DEFERRED
+            );
+            CREATE TRIGGER full AFTER INSERT ON mod_templates
+            BEGIN INSERT INTO guard VALUES (-1); END;
+            """,
+        )
+        with pytest.raises(sqlite3.IntegrityError):
+            backend.write(list(self.stashes))
+        assert not self.count("items")
+
+        backend.connection.execute("DROP TRIGGER full")
+        backend.write(list(self.stashes))
+        assert self.count("mod_templates") == len(backend._parser.templates)
+
+    async def test_flush_on_time(self):
+        """Tests that buffered records are written after the flush interval."""
+        sink = StorageSink(SQLiteBackend(self.path), flush_interval=0.01)
+        await sink.start()
+        try:
+            await sink.put(self.stashes[0])
+            assert sink.batches == 0
+            await asyncio.sleep(0.1)
+            assert sink.batches == 1
+        finally:
+            await sink.close()
+        assert self.count("stashes") == 1
+
+    async def test_background_write(self):
+        """Tests that put only waits once the next batch is full during a write."""
+        backend = SlowBackend()
+        async with StorageSink(backend, batch_size=2) as sink:
+            await asyncio.wait_for(sink.put_many(self.stashes[:3]), 1)
+            putting = asyncio.ensure_future(sink.put(self.stashes[3]))
+            await asyncio.sleep(0.05)
+            assert not putting.done()
+
+            backend.released.set()
+            await putting
+        assert [len(batch) for batch in backend.batches] == [2, 2]
+
+    async def test_error(self):
+        """Tests that a failed write is raised once, and the backend still closes."""
+        backend = SlowBackend(fail=True)
+        backend.released.set()
+        sink = StorageSink(backend, batch_size=1)
+        await sink.start()
+        await sink.put(self.stashes[0])
+        with pytest.raises(RuntimeError, match="disk full"):
+            await sink.flush()
+        await sink.flush()
+
+        await sink.put(self.stashes[1])
+        with pytest.raises(RuntimeError, match="disk full"):
+            await sink.close()
+        assert backend.closed
@@ -0,0 +1,241 @@
+"""Where the time of each request goes, phase by phase.
+
+Network phases come from aiohttp tracing hooks, and the client times waiting on
+the rate limiter, decoding the JSON and building the models itself.
+"""
+
+import time
+from types import SimpleNamespace
+from typing import Awaitable, Callable, Dict, List, Optional, TypeVar
+
+import aiohttp
+
+Arg = TypeVar("Arg")
+Result = TypeVar("Result")
+
+# Phases of a request, in the order they happen. total is the whole request,
+# from the limiter to the built model, so it's more than the sum of the others.
+PHASES = (
+    "limiter_wait",
+    "dns",
+    "connect",
+    "ttfb",
+    "download",
+    "decode",
+    "build",
+    "total",
+)
+
+
+class RequestTiming(object):
+    """Seconds spent in each phase of one request.
+
+    Phases the request didn't go through, like connecting on a reused connection,
+    stay at 0.
+    """
+
+    path: str
+    status: Optional[int]
+    started: float
+    limiter_wait: float
+    dns: float
+    connect: float
+    ttfb: float
+    download: float
+    decode: float
+    build: float
+    total: float
+
+    # Set by the trace hooks, to compute the phases from.
+    _sent: Optional[float]
+
+    def __init__(self, path: str = "") -> None:
+        """Start timing a request to a generic path."""
+        self.path = path
+        self.status = None
+        self.started = time.perf_counter()
+        self.limiter_wait = 0
+        self.dns = 0
+        self.connect = 0
+        self.ttfb = 0
+        self.download = 0
+        self.decode = 0
+        self.build = 0
+        self.total = 0
+        self._sent = None
+
+    def as_dict(self) -> Dict[str, object]:
+        """The path, status and every phase, as a dict."""
+        phases: Dict[str, object] = {phase: getattr(self, phase) for phase in PHASES}
+        return {"path": self.path, "status": self.status, **phases}
+
+    def measure(self, phase: str, func: Callable[[Arg], Result], arg: Arg) -> Result:
+        """Call func with arg, adding the time it took to a phase."""
+        started = time.perf_counter()
+        try:
+            return func(arg)
+        finally:
+            setattr(self, phase, getattr(self, phase) + time.perf_counter() - started)
+
+    async def read(
+        self,
+        resp: aiohttp.ClientResponse,
+        read: Callable[[aiohttp.ClientResponse], Awaitable[Result]],
+    ) -> Result:
+        """Read a response, timing the download and the decoding separately."""
+        started = time.perf_counter()
+        # The body is kept by the response, so read only decodes it.
+        await resp.read()
+        downloaded = time.perf_counter()
+        self.download += downloaded - started
+        try:
+            return await read(resp)
+        finally:
+            self.decode += time.perf_counter() - downloaded
+
+
+Observer = Callable[[RequestTiming], None]
+
+
+class EndpointTimings(object):
+    """Aggregated phase timings of the requests to one generic path."""
+
+    count: int
+    errors: int
+    sums: Dict[str, float]
+    maxima: Dict[str, float]
+
+    def __init__(self) -> None:
+        """Initialize with no requests."""
+        self.count = 0
+        self.errors = 0
+        self.sums = dict.fromkeys(PHASES, 0.0)
+        self.maxima = dict.fromkeys(PHASES, 0.0)
+
+    def add(self, timing: RequestTiming) -> None:
+        """Add the timings of a request."""
+        self.count += 1
+        if timing.status != 200:
+            self.errors += 1
+        for phase in PHASES:
+            spent = getattr(timing, phase)
+            self.sums[phase] += spent
+            if spent > self.maxima[phase]:
+                self.maxima[phase] = spent
+
+    def means(self) -> Dict[str, float]:
+        """Mean seconds spent in each phase."""
+        if not self.count:
+            return dict.fromkeys(PHASES, 0.0)
+        return {phase: spent / self.count for phase, spent in self.sums.items()}
+
+
+async def _on_dns_start(
+    session: aiohttp.ClientSession,
+    context: SimpleNamespace,
+    params: aiohttp.TraceDnsResolveHostStartParams,
+) -> None:
+    context.dns_started = time.perf_counter()
+
+
+async def _on_dns_end(
+    session: aiohttp.ClientSession,
+    context: SimpleNamespace,
+    params: aiohttp.TraceDnsResolveHostEndParams,
+) -> None:
+    timing = context.trace_request_ctx
+    if isinstance(timing, RequestTiming):
+        timing.dns += time.perf_counter() - context.dns_started
+
+
+async def _on_connection_start(
+    session: aiohttp.ClientSession,
+    context: SimpleNamespace,
+    params: aiohttp.TraceConnectionCreateStartParams,
+) -> None:
+    context.connection_started = time.perf_counter()
+
+
+async def _on_connection_end(
+    session: aiohttp.ClientSession,
+    context: SimpleNamespace,
+    params: aiohttp.TraceConnectionCreateEndParams,
+) -> None:
+    timing = context.trace_request_ctx
+    if isinstance(timing, RequestTiming):
+        # Connecting includes resolving the host, which is its own phase.
+        timing.connect += time.perf_counter() - context.connection_started - timing.dns
+
+
+async def _on_headers_sent(
+    session: aiohttp.ClientSession,
+    context: SimpleNamespace,
+    params: aiohttp.TraceRequestHeadersSentParams,
+) -> None:
+    timing = context.trace_request_ctx
+    if isinstance(timing, RequestTiming):
+        timing._sent = time.perf_counter()  # noqa: WPS437
+
+
+async def _on_request_end(
+    session: aiohttp.ClientSession,
+    context: SimpleNamespace,
+    params: aiohttp.TraceRequestEndParams,
+) -> None:
+    timing = context.trace_request_ctx
+    if isinstance(timing, RequestTiming) and timing._sent is not None:  # noqa: WPS437
+        timing.ttfb = time.perf_counter() - timing._sent  # noqa: WPS437
+
+
+class RequestTimings(object):
+    """Collects the phase timings of every request a client makes.
+
+    Each finished request is passed to the observers, and aggregated per generic
+    path, like "character/" for every "character/{0}" request.
+    """
+
+    observers: List[Observer]
+    endpoints: Dict[str, EndpointTimings]
+
+    def __init__(self, observers: Optional[List[Observer]] = None) -> None:
+        """Initialize with no requests.
+
+        Args:
+            observers: Called with the timing of every finished request.
+        """
+        self.observers = list(observers or [])
+        self.endpoints = {}
+
+    def subscribe(self, observer: Observer) -> None:
+        """Call observer with the timing of every finished request."""
+        self.observers.append(observer)
+
+    def unsubscribe(self, observer: Observer) -> None:
+        """Stop calling an observer."""
+        self.observers.remove(observer)
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        """Tracing hooks timing the network phases, for the client's session."""
+        trace_config = aiohttp.TraceConfig(trace_config_ctx_factory=SimpleNamespace)
+        trace_config.on_dns_resolvehost_start.append(_on_dns_start)
+        trace_config.on_dns_resolvehost_end.append(_on_dns_end)
+        trace_config.on_connection_create_start.append(_on_connection_start)
+        trace_config.on_connection_create_end.append(_on_connection_end)
+        trace_config.on_request_headers_sent.append(_on_headers_sent)
+        trace_config.on_request_end.append(_on_request_end)
+        return trace_config
+
+    def record(self, timing: RequestTiming) -> None:
+        """Finish timing a request, aggregating it and passing it to observers."""
+        timing.total = time.perf_counter() - timing.started
+        endpoint = self.endpoints.get(timing.path)
+        if endpoint is None:
+            endpoint = EndpointTimings()
+            self.endpoints[timing.path] = endpoint
+        endpoint.add(timing)
+        for observer in self.observers:
+            observer(timing)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Mean seconds spent in each phase, per generic path."""
+        return {path: endpoint.means() for path, endpoint in self.endpoints.items()}
@@ -0,0 +1,92 @@
+from typing import List
+from unittest import IsolatedAsyncioTestCase
+
+from poe_client.cache import ModelCache
+from poe_client.client import PoEClient
+from poe_client.mockserver import MockData, MockServer
+from poe_client.timing import PHASES, RequestTiming, RequestTimings
+
+
+class RequestTimingsTest(IsolatedAsyncioTestCase):
+    """Tests timing requests against the mock server."""
+
+    async def asyncSetUp(self) -> None:
+        """Starts a server with little data."""
+        self.server = MockServer(data=MockData(ladder_size=10, stash_tabs=1))
+        self.url = str(await self.server.start())
+        self.timings = RequestTimings()
+        self.seen: List[RequestTiming] = []
+        self.timings.subscribe(self.seen.append)
+        return await super().asyncSetUp()
+
+    async def asyncTearDown(self) -> None:
+        """Stops the server."""
+        await self.server.stop()
+        return await super().asyncTearDown()
+
+    async def test_phases(self):
+        """Tests that every request is timed and aggregated by generic path."""
+        client = PoEClient(
+            "test user agent",
+            "token",
+            base_url=self.url,
+            timings=self.timings,
+        )
+        async with client:
+            await client.get_characters()
+            characters = await client.get_characters()
+            await client.get_character(characters[0].name)
+            await client.get_public_stash_tabs()
+
+        assert [timing.path for timing in self.seen] == [
+            "character",
+            "character",
+            "character/",
+            "public-stash-tabs",
+        ]
+        first = self.seen[0]
+        assert first.status == 200
+        assert first.connect > 0
+        assert first.ttfb > 0
+        assert first.build > 0
+        assert first.total >= first.limiter_wait + first.ttfb + first.build
+        # The second request reuses the connection.
+        assert self.seen[1].connect == 0
+        # Raw JSON isn't built into models.
+        assert self.seen[3].build == 0
+        assert self.seen[3].decode > 0
+
+        assert self.timings.endpoints["character"].count == 2
+        summary = self.timings.summary()
+        assert set(summary) == {"character", "character/", "public-stash-tabs"}
+        assert set(summary["character"]) == set(PHASES)
+
+    async def test_model_cache(self):
+        """Tests that decoding is timed when the model cache decodes the body."""
+        client = PoEClient(
+            "test user agent",
+            "token",
+            model_cache=ModelCache(),
+            base_url=self.url,
+            timings=self.timings,
+        )
+        async with client:
+            await client.get_characters()
+
+        assert self.seen[0].decode > 0
+        assert self.seen[0].build > 0
+        assert self.seen[0].as_dict()["path"] == "character"
+
+    async def test_unsubscribe(self):
+        """Tests that unsubscribed observers aren't called."""
+        self.timings.unsubscribe(self.seen.append)
+        client = PoEClient(
+            "test user agent",
+            base_url=self.url,
+            timings=self.timings,
+        )
+        async with client:
+            await client.list_leagues()
+
+        assert not self.seen
+        assert self.timings.endpoints["league"].count == 1
@@ -0,0 +1,173 @@
+"""Tolerant parsing of large API responses.
+
+Models forbid unknown fields, so a single new field on a single item makes a
+whole PublicStash or Ladder fail to parse. The functions here validate each stash
+or ladder entry on its own instead. Records which only fail because of unknown
+fields are parsed again without those fields and kept, with the unknown fields
+counted. Records which still fail are quarantined along with their raw JSON, and
+the rest of the page is returned.
+"""
+
+import copy
+from collections import Counter, deque
+from typing import (
+    Deque,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+    cast,
+)
+
+from pydantic import ValidationError
+
+from poe_client.schemas import Model, Raw
+from poe_client.schemas.league import Ladder, LadderEntry
+from poe_client.schemas.stash import PublicStash, PublicStashChange
+
+RecordModel = TypeVar("RecordModel", bound=Model)
+PageModel = TypeVar("PageModel", bound=Model)
+# Where a validation error is, as field names and list indexes.
+Loc = Tuple[Union[int, str], ...]
+
+_EXTRA_FIELD_ERROR = "value_error.extra"
+
+
+class QuarantinedRecord(NamedTuple):
+    """A record which couldn't be parsed."""
+
+    model: str
+    error: ValidationError
+    raw: Raw
+
+
+class Quarantine(object):
+    """Sink for records which failed to parse.
+
+    Keeps the most recent max_records records, a count of every quarantined record
+    per model, and a count of every unknown field seen per model and field path.
+    Subclass and override put to send records elsewhere.
+    """
+
+    records: Deque[QuarantinedRecord]
+    quarantined: "Counter[str]"
+    unknown_fields: "Counter[str]"
+
+    def __init__(self, max_records: Optional[int] = 1000) -> None:
+        """Initialize an empty quarantine.
+
+        Args:
+            max_records: Number of records to keep. None keeps every record.
+        """
+        self.records = deque(maxlen=max_records)
+        self.quarantined = Counter()
+        self.unknown_fields = Counter()
+
+    def put(self, record: QuarantinedRecord) -> None:
+        """Store a record which failed to parse."""
+        self.quarantined[record.model] += 1
+        self.records.append(record)
+
+    def count_unknown_field(self, model: str, field_path: str) -> None:
+        """Count an unknown field which was dropped while parsing."""
+        self.unknown_fields["{0}.{1}".format(model, field_path)] += 1
+
+
+def parse_record(
+    model: Type[RecordModel],
+    raw: Raw,
+    quarantine: Quarantine,
+) -> Optional[RecordModel]:
+    """Parse a single record, quarantining it on failure.
+
+    Returns:
+        The parsed model, or None if the record was quarantined.
+    """
+    try:
+        return model.parse_obj(raw)
+    except ValidationError as error:
+        first_error = error
+
+    extra_fields = [
+        failure["loc"]
+        for failure in first_error.errors()
+        if failure["type"] == _EXTRA_FIELD_ERROR
+    ]
+    if len(extra_fields) == len(first_error.errors()):
+        try:
+            parsed = model.parse_obj(_without_fields(raw, extra_fields))
+        except (ValidationError, LookupError, TypeError):
+            parsed = None
+        if parsed is not None:
+            for loc in extra_fields:
+                quarantine.count_unknown_field(model.__name__, _field_path(loc))
+            return parsed
+
+    quarantine.put(QuarantinedRecord(model.__name__, first_error, raw))
+    return None
+
+
+def parse_records(
+    model: Type[RecordModel],
+    raw_records: Iterable[Raw],
+    quarantine: Quarantine,
+) -> List[RecordModel]:
+    """Parse several records, leaving out the quarantined ones."""
+    parsed = []
+    for raw in raw_records:
+        record = parse_record(model, raw, quarantine)
+        if record is not None:
+            parsed.append(record)
+    return parsed
+
+
+def parse_public_stash(raw: Raw, quarantine: Quarantine) -> PublicStash:
+    """Parse a raw public stash page, validating each stash on its own."""
+    return _parse_page(PublicStash, PublicStashChange, "stashes", raw, quarantine)
+
+
+def parse_ladder(raw: Raw, quarantine: Quarantine) -> Ladder:
+    """Parse a raw ladder, validating each entry on its own."""
+    return _parse_page(Ladder, LadderEntry, "entries", raw, quarantine)
+
+
+def _parse_page(
+    page_model: Type[PageModel],
+    record_model: Type[Model],
+    records_field: str,
+    raw: Raw,
+    quarantine: Quarantine,
+) -> PageModel:
+    # The page fields are still validated strictly; a broken page header means
+    # there's nothing sensible to return.
+    header = {key: field for key, field in raw.items() if key != records_field}
+    page = page_model.parse_obj({records_field: [], **header})
+    raw_records = cast(Iterable[Raw], raw.get(records_field, ()))
+    records = parse_records(record_model, raw_records, quarantine)
+    # copy doesn't validate the update, which the records already went through.
+    return page.copy(update={records_field: records})
+
+
+def _field_path(loc: Loc) -> str:
+    return ".".join("[]" if isinstance(part, int) else str(part) for part in loc)
+
+
+def _without_fields(raw: Raw, locs: Iterable[Loc]) -> Raw:
+    stripped = copy.deepcopy(raw)
+    for loc in locs:
+        *parents, field = loc
+        parent: object = stripped
+        for part in parents:
+            parent = _child(parent, part)
+        del cast(Raw, parent)[str(field)]  # noqa: WPS420
+    return stripped
+
+
+def _child(parent: object, part: Union[int, str]) -> object:
+    if isinstance(parent, list):
+        return parent[int(part)]
+    return cast(Raw, parent)[str(part)]
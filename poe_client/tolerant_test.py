@@ -0,0 +1,74 @@
+from typing import cast
+from unittest import TestCase
+
+from poe_client.conftest import raw_change, raw_item
+from poe_client.schemas import Raw
+from poe_client.tolerant import Quarantine, parse_ladder, parse_public_stash
+
+
+def raw_entry(rank: int, **kwargs: object) -> Raw:
+    """Build a raw ladder entry."""
+    entry: Raw = {
+        "rank": rank,
+        "character": {"id": str(rank), "name": "moowiz", "class": "Witch", "level": 1},
+    }
+    entry.update(kwargs)
+    return entry
+
+
+class TolerantParsingTest(TestCase):
+    """Tests tolerant parsing."""
+
+    def setUp(self) -> None:
+        """Sets up the test."""
+        self.quarantine = Quarantine()
+        return super().setUp()
+
+    def test_valid(self):
+        """Valid pages parse without touching the quarantine."""
+        page = parse_public_stash(
+            {"next_change_id": "1", "stashes": [raw_change("a", [raw_item("x")])]},
+            self.quarantine,
+        )
+
+        assert page.next_change_id == "1"
+        assert page.stashes[0].items[0].id == "x"
+        assert not self.quarantine.records
+        assert not self.quarantine.unknown_fields
+
+    def test_unknown_fields(self):
+        """Unknown fields are dropped and counted, and the record is kept."""
+        item = raw_item("x")
+        item["newField"] = True
+        change = raw_change("a", [raw_item("w"), item])
+        change["otherField"] = 1
+
+        page = parse_public_stash(
+            {"next_change_id": "1", "stashes": [change]},
+            self.quarantine,
+        )
+
+        assert [item.id for item in page.stashes[0].items] == ["w", "x"]
+        assert self.quarantine.unknown_fields == {
+            "PublicStashChange.items.[].newField": 1,
+            "PublicStashChange.otherField": 1,
+        }
+        assert not self.quarantine.records
+
+    def test_quarantined(self):
+        """Invalid records are quarantined and the rest of the page is returned."""
+        invalid = raw_entry(2, newField=True)
+        del cast(Raw, invalid["character"])["level"]  # noqa: WPS420
+
+        ladder = parse_ladder(
+            {"total": 2, "entries": [raw_entry(1), invalid]},
+            self.quarantine,
+        )
+
+        assert ladder.total == 2
+        assert [entry.rank for entry in ladder.entries] == [1]
+        assert self.quarantine.quarantined == {"LadderEntry": 1}
+        record = self.quarantine.records[0]
+        assert record.model == "LadderEntry"
+        assert record.raw is invalid
+        assert not self.quarantine.unknown_fields